@@ -1,4 +1,5 @@
 # Module Imports
+import hashlib
 import logging
 import jwt
 from jwt import PyJWTError
@@ -12,6 +13,7 @@ from schemas.database import engine, get_session
 from schemas.auth import ApiKey
 from schemas.users import User
 from services.users import get_or_create_user
+from services.ratelimit import hit_rate_limit
 
 # Logger
 logger = logging.getLogger("services")
@@ -94,3 +96,49 @@ def require_permission(permission_code: str):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Missing permission: {permission_code}")
         return current_user
     return wrapper
+
+# Limit how often an endpoint can be called, checked before any database work is done
+# Requests are counted per user and per api key, requests without credentials are counted per ip address
+class RateLimit:
+    def __init__(self, scope: str, limit: str):
+        self.scope = scope
+        self.limit = limit
+
+    def __call__(self,
+                 request: Request,
+                 jwt_token_cookie: str | None = Cookie(None, alias="access_token"),
+                 jwt_token: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+                 api_key: Optional[str] = Security(api_key_header),
+                 act_as_user: Optional[str] = act_as_user_header
+    ) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        # Work out which identities this request counts against
+        rate_limits: list[tuple[str, str]] = []
+        token = jwt_token.credentials if jwt_token else jwt_token_cookie
+        if token:
+            try:
+                rate_limits.append((self.limit, f"user:{decode_jwt_token(token).get('sub')}"))
+            except (PyJWTError, HTTPException):
+                pass
+
+        if api_key:
+            api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:32]
+            rate_limits.append((settings.RATE_LIMIT_API_KEY, f"api_key:{api_key_hash}"))
+            if act_as_user:
+                identity = f"discord:{act_as_user}" if len(act_as_user) > 7 else f"user:{act_as_user}"
+            else:
+                identity = f"api_key_user:{api_key_hash}"
+            rate_limits.append((self.limit, identity))
+
+        if not rate_limits:
+            rate_limits.append((self.limit, f"ip:{request.client.host if request.client else 'unknown'}"))
+
+        # Reject the request if any limit has been exceeded
+        for limit, identity in rate_limits:
+            retry_after = hit_rate_limit(limit, self.scope, identity)
+            if retry_after:
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                    detail=f"Too many requests, try again in {retry_after}s",
+                                    headers={"Retry-After": str(retry_after)})
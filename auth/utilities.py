@@ -1,7 +1,10 @@
 # Module Imports
-import requests
+import os
+import time
+import hashlib
 import jwt
 import logging
+from jwt.algorithms import get_default_algorithms
 from jwt.exceptions import ExpiredSignatureError
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
@@ -10,10 +13,16 @@ from sqlmodel import Session, select
 from config import settings
 from schemas.database import engine
 from schemas.auth import RefreshToken
+from services.cache import TTLCache
+from services.sweeper import sweep_expired_rows
+from services.metrics import http_session
 
 
 logger = logging.getLogger("services")
 
+# Verified tokens and their claims, entries are dropped once the token expires
+verified_tokens = TTLCache(maxsize=settings.JWT_CACHE_SIZE)
+
 # Get Discord access token from access code
 def get_discord_access_token(access_code: str, redirect_url: str):
     token_url = "https://discord.com/api/oauth2/token"
@@ -26,7 +35,7 @@ def get_discord_access_token(access_code: str, redirect_url: str):
         "scope": "identify guilds"
     }
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    response = requests.post(token_url, data=data, headers=headers)
+    response = http_session.post(token_url, data=data, headers=headers)
     
     if response.status_code != 200:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error getting access token")
@@ -35,7 +44,7 @@ def get_discord_access_token(access_code: str, redirect_url: str):
 # Get discord user information
 def get_discord_user_info(access_token: str):
     headers = {'Authorization': f"Bearer {access_token}"}
-    response = requests.get("https://discord.com/api/v10/users/@me", headers=headers)
+    response = http_session.get("https://discord.com/api/v10/users/@me", headers=headers)
 
     if response.status_code != 200:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error getting user information")
@@ -44,56 +53,105 @@ def get_discord_user_info(access_token: str):
 # Get discord user servers
 def get_discord_user_servers(access_token: str):
     headers = {'Authorization': f"Bearer {access_token}"}
-    response = requests.get("https://discord.com/api/v10/users/@me/guilds", headers=headers)
+    response = http_session.get("https://discord.com/api/v10/users/@me/guilds", headers=headers)
 
     if response.status_code != 200:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error getting user servers")
     return response.json()
 
+# Signing keys
+# Check if the configured algorithm uses a public/private key pair rather than a shared secret
+def is_asymmetric_algorithm() -> bool:
+    return not settings.JWT_ALGORITHM.startswith("HS")
+
+# Load a PEM key from settings, the setting can either contain the key itself or a path to it
+def load_pem_key(value: str) -> str:
+    if not value.lstrip().startswith("-----") and os.path.isfile(value):
+        with open(value, "r") as key_file:
+            return key_file.read()
+    return value.replace("\\n", "\n")
+
+# Load the keys used to sign and verify tokens
+def load_jwt_keys() -> tuple:
+    if not is_asymmetric_algorithm():
+        return settings.JWT_SECRET_KEY, settings.JWT_SECRET_KEY, None
+
+    algorithm = get_default_algorithms()[settings.JWT_ALGORITHM]
+    private_key = algorithm.prepare_key(load_pem_key(settings.JWT_PRIVATE_KEY)) if settings.JWT_PRIVATE_KEY else None
+    if settings.JWT_PUBLIC_KEY:
+        public_key = algorithm.prepare_key(load_pem_key(settings.JWT_PUBLIC_KEY))
+    elif private_key:
+        public_key = private_key.public_key()
+    else:
+        raise ValueError(f"JWT_PRIVATE_KEY or JWT_PUBLIC_KEY must be set when using {settings.JWT_ALGORITHM}")
+
+    # Key id is derived from the public key so that verifiers can match tokens to keys after rotation
+    public_jwk = algorithm.to_jwk(public_key, as_dict=True)
+    key_id = hashlib.sha256(str(sorted(public_jwk.items())).encode()).hexdigest()[:16]
+    public_jwk.update({"kid": key_id, "alg": settings.JWT_ALGORITHM, "use": "sig"})
+    return private_key, public_key, public_jwk
+
+jwt_signing_key, jwt_verifying_key, jwt_public_jwk = load_jwt_keys()
+
+# Get the public key set that other services can use to verify tokens
+def get_jwks() -> dict | None:
+    if not jwt_public_jwk:
+        return None
+    return {"keys": [jwt_public_jwk]}
+
 # Create JWT token
-def create_jwt_token(user_id: str, issued_at: datetime, expires_delta: timedelta):
+def create_jwt_token(user_id: str, issued_at: datetime, expires_delta: timedelta, jti: str | None = None):
     to_encode = {"sub": str(user_id),
                  "iat": issued_at,
                  "exp": issued_at + expires_delta}
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    if jti:
+        to_encode["jti"] = jti
+    if not jwt_signing_key:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="This instance cannot issue tokens")
+    headers = {"kid": jwt_public_jwk["kid"]} if jwt_public_jwk else None
+    encoded_jwt = jwt.encode(to_encode, jwt_signing_key, algorithm=settings.JWT_ALGORITHM, headers=headers)
     return encoded_jwt
 
-# Get payload from JWT token
+# Get payload from JWT token, tokens that have already been verified are served from cache until they expire
 def decode_jwt_token(jwt_token: HTTPAuthorizationCredentials):
+    cached_jwt = verified_tokens.get(jwt_token)
+    if cached_jwt is not None:
+        return dict(cached_jwt)
+
     try:
-        decoded_jwt = jwt.decode(jwt=jwt_token, key=settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        return decoded_jwt
+        decoded_jwt = jwt.decode(jwt=jwt_token, key=jwt_verifying_key, algorithms=[settings.JWT_ALGORITHM])
     except ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Expired token")
 
+    if "exp" in decoded_jwt:
+        verified_tokens.set(jwt_token, decoded_jwt, ttl=decoded_jwt["exp"] - time.time())
+    return dict(decoded_jwt)
+
 # Clear expired refresh tokens
 def clear_expired_refresh_tokens() -> None:
-    with Session(engine) as session:
-        db_tokens = session.exec(select(RefreshToken)).all()
-        now = datetime.now(timezone.utc)
-        kept: int = 0
-        deleted: int = 0
-        for token in db_tokens:
-            if now > token.expires_at.replace(tzinfo=timezone.utc):
-                session.delete(token)
-                deleted += 1
-            else:
-                kept += 1
-        session.commit()
-        logger.info(f"Deleted {deleted} expired refresh tokens, kept {kept}")
+    deleted = sweep_expired_rows(RefreshToken.expires_at)
+    logger.info(f"Deleted {deleted} expired refresh tokens")
 
 # Decode refresh token and check it against the db
 def get_db_refresh_token(refresh_token_payload: str) -> RefreshToken | None:
     with Session(engine) as session:
         # Get token data
         user_id = refresh_token_payload.get("sub")
-        issued_at = datetime.fromtimestamp(refresh_token_payload.get("iat"), tz=timezone.utc)
-        expires_at = datetime.fromtimestamp(refresh_token_payload.get("exp"), tz=timezone.utc)
+        jti = refresh_token_payload.get("jti")
+
+        # Search for token in database by its unique id
+        if jti:
+            db_refresh_token = session.exec(select(RefreshToken).where(RefreshToken.jti == jti)).first()
+            if db_refresh_token and str(db_refresh_token.subject) != str(user_id):
+                return None
 
-        # Search for token in database
-        db_refresh_token = session.exec(select(RefreshToken).where(RefreshToken.subject == user_id, 
-                                                                RefreshToken.issued_at == issued_at,
-                                                                RefreshToken.expires_at == expires_at)).first()
+        # Tokens issued before jti was added are matched on subject and timestamps
+        else:
+            issued_at = datetime.fromtimestamp(refresh_token_payload.get("iat"), tz=timezone.utc)
+            expires_at = datetime.fromtimestamp(refresh_token_payload.get("exp"), tz=timezone.utc)
+            db_refresh_token = session.exec(select(RefreshToken).where(RefreshToken.subject == user_id, 
+                                                                    RefreshToken.issued_at == issued_at,
+                                                                    RefreshToken.expires_at == expires_at)).first()
         
         # Return token or none
         if db_refresh_token:
@@ -2,6 +2,7 @@
 from logging.config import dictConfig
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import logging
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -14,6 +15,15 @@ class Settings(BaseSettings):
     APP_RUN_SCHEDULED_TASKS: bool
     APP_IN_PRODUCTION: bool
 
+    # Server Settings
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 80
+    SERVER_WORKERS: Optional[int] = None
+    # Defaults to DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW
+    SERVER_THREADPOOL_SIZE: Optional[int] = None
+    SERVER_KEEPALIVE_SECS: int = 5
+    SERVER_GRACEFUL_TIMEOUT_SECS: int = 30
+
     # Logging Settings
     LOG_LEVEL_WATCHFILES: str
     LOG_LEVEL_UVICORN: str
@@ -26,15 +36,29 @@ class Settings(BaseSettings):
     DB_USERNAME: str
     DB_PASSWORD: str
     DB_DATABASE: str
+    # Overrides the mysql url built from the settings above, e.g. a sqlite url for tests
+    DB_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECS: int = 30
+    DB_POOL_RECYCLE_SECS: int = 3600
 
     # Storage Bucket Settings
-    STORAGE_BUCKET_ENDPOINT: str
-    STORAGE_BUCKET_ACCESS_KEY: str
-    STORAGE_BUCKET_SECRET_KEY: str
+    STORAGE_BACKEND: str = "s3"
+    STORAGE_BUCKET_ENDPOINT: Optional[str] = None
+    STORAGE_BUCKET_ACCESS_KEY: Optional[str] = None
+    STORAGE_BUCKET_SECRET_KEY: Optional[str] = None
     STORAGE_BUCKET_NAME: str
     STORAGE_BUCKET_CACHE_TIMEOUT: int
     STORAGE_BUCKET_MEDIA_URL: str
-    STORAGE_BUCKET_REGION_NAME: str
+    STORAGE_BUCKET_REGION_NAME: Optional[str] = None
+    STORAGE_BUCKET_CHECK_ATTEMPTS: int = 5
+    STORAGE_BUCKET_CHECK_BACKOFF_SECS: float = 2
+    STORAGE_FILESYSTEM_ROOT: str = "media"
+    STORAGE_MULTIPART_THRESHOLD_MB: int = 8
+    STORAGE_MULTIPART_CHUNK_MB: int = 8
+    STORAGE_BULK_CONCURRENCY: int = 8
+    STORAGE_PRESIGNED_URL_EXPIRY_SECS: int = 3600
 
     # Dockerlink Settings
     DOCKERLINK_URL: str
@@ -58,6 +82,79 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str
     JWT_ACCESS_TOKEN_EXPIRY_MINS: int
     JWT_REFRESH_TOKEN_EXPIRY_MINS: int
+    JWT_PRIVATE_KEY: Optional[str] = None
+    JWT_PUBLIC_KEY: Optional[str] = None
+    JWT_CACHE_SIZE: int = 4096
+
+    # Rate Limit Settings
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+    RATE_LIMIT_API_KEY: str = "300/minute"
+    RATE_LIMIT_AUTH_CALLBACK: str = "10/minute"
+    RATE_LIMIT_WORK: str = "5/10seconds"
+    RATE_LIMIT_BLACKJACK: str = "20/10seconds"
+    RATE_LIMIT_GIFT: str = "5/10seconds"
+
+    # Economy Settings
+    ECONOMY_COOLDOWN_CACHE_SECONDS: int = 30
+    ECONOMY_COOLDOWN_CACHE_SIZE: int = 10000
+
+    # Exchange Rate Settings
+    ECONOMY_EXCHANGE_RATE_MODE: str = "normal"
+    ECONOMY_EXCHANGE_RATE_VOLATILITY: float = 0.04
+    ECONOMY_EXCHANGE_RATE_CORRELATION: float = 0.5
+    ECONOMY_EXCHANGE_RATE_REVERSION: float = 0.1
+    ECONOMY_EXCHANGE_RATE_MAX_INTERVALS: int = 1000
+
+    # Blackjack Settings
+    BLACKJACK_DECKS: int = 1
+    BLACKJACK_MAX_ACTIVE_GAMES: int = 10000
+
+    # Sweeper Settings
+    SWEEPER_CHUNK_SIZE: int = 1000
+    SWEEPER_INTERVAL_MINS: int = 15
+
+    # Random Selection Settings
+    RANDOM_ID_CACHE_SIZE: int = 256
+    RANDOM_ID_CACHE_TTL_SECS: int = 60
+
+    # Game Settings
+    GAME_TAG_CACHE_TTL_SECS: int = 300
+    GAME_SEARCH_INDEX_TTL_SECS: int = 300
+
+    # Response Cache Settings
+    RESPONSE_CACHE_SIZE: int = 1024
+    RESPONSE_CACHE_TTL_SECS: int = 300
+
+    # Idempotency Settings
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+
+    # Instrumentation Settings
+    INSTRUMENTATION_ENABLED: bool = True
+    INSTRUMENTATION_SERVER_TIMING: bool = True
+    INSTRUMENTATION_SLOW_QUERY_MS: int = 200
+
+    # Metrics Settings
+    METRICS_ENABLED: bool = True
+    METRICS_BEARER_TOKEN: Optional[str] = None
+
+    # Tracing Settings
+    TRACING_ENABLED: bool = False
+    TRACING_SERVICE_NAME: str = "api"
+    TRACING_EXPORTER: str = "otlp"
+    TRACING_OTLP_ENDPOINT: Optional[str] = None
+    TRACING_FILE_PATH: str = "logs/traces.jsonl"
+    TRACING_SAMPLE_RATE: float = 1.0
+
+    # Scheduler Settings
+    SCHEDULER_IO_THREADS: int = 4
+    SCHEDULER_CPU_THREADS: int = 2
+    SCHEDULER_MISFIRE_GRACE_SECS: int = 60
+
+    # Leader Election Settings
+    LEADER_ELECTION_BACKEND: str = "mysql"
+    LEADER_ELECTION_LOCK_NAME: Optional[str] = None
+    LEADER_ELECTION_INTERVAL_SECS: int = 15
 
     # Misc Settings
     MISC_PEOPLE_CONSTANT: int
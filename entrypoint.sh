@@ -3,4 +3,6 @@ set -e
 
 alembic upgrade head
 
-exec uvicorn main:app --host 0.0.0.0 --port 80
\ No newline at end of file
+# Runs a worker per cpu when RATE_LIMIT_STORAGE_URI is a shared store such as redis://, and a single worker on memory://
+# Setting SERVER_WORKERS above 1 on memory:// fails at startup, docker-compose.yml starts a redis server for this
+exec gunicorn main:app --config gunicorn.conf.py
\ No newline at end of file
@@ -0,0 +1,48 @@
+# Module Imports
+import os
+import sys
+import shutil
+import tempfile
+import multiprocessing
+
+# Metrics are written to files shared by all workers, this must be set before prometheus_client is imported by the app
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus_multiproc"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+from config import settings, log_config
+from services.ratelimit import storage_is_shared
+
+
+# Server
+bind = f"{settings.SERVER_HOST}:{settings.SERVER_PORT}"
+# Rate limits, cooldowns and response cache generations are kept in RATE_LIMIT_STORAGE_URI, which workers only share when it is
+# not memory://, so a worker per cpu is only the default with a shared store
+workers = settings.SERVER_WORKERS or (multiprocessing.cpu_count() if storage_is_shared else 1)
+worker_class = "uvicorn_worker.UvicornWorker"
+keepalive = settings.SERVER_KEEPALIVE_SECS
+logconfig_dict = log_config
+
+# The app is imported once before forking so workers share its memory and a broken app fails before any worker starts
+preload_app = True
+
+# On SIGTERM workers stop accepting connections and get graceful_timeout seconds to finish requests and run shutdown
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT_SECS
+
+# Hooks
+# Refuse to start several workers that would each keep their own rate limits, cooldowns and cache generations
+def on_starting(server):
+    if server.cfg.workers > 1 and not storage_is_shared:
+        server.log.error(f"Cannot run {server.cfg.workers} workers with RATE_LIMIT_STORAGE_URI={settings.RATE_LIMIT_STORAGE_URI}, "
+                         "use a shared store such as redis:// or run a single worker")
+        sys.exit(1)
+
+# Each worker opens its own database connections, any opened while preloading belong to the master and are left to it
+def post_fork(server, worker):
+    from schemas.database import engine
+    engine.dispose(close=False)
+
+# Remove the metrics of workers that have exited so their gauges are not reported
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Module Imports
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Images
+# Noisy images compress like photos rather than flat colours, so resizing and encoding cost about as much as real banners
+def generate_images(count: int, width: int, height: int, seed: int) -> list[bytes]:
+    from PIL import Image
+    rng = random.Random(seed)
+    images: list[bytes] = []
+    for _ in range(count):
+        img = Image.frombytes("RGB", (width // 8, height // 8), rng.randbytes((width // 8) * (height // 8) * 3)).resize((width, height))
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+# Serve the generated images locally so the pipeline downloads them the same way it downloads banner links
+def start_image_server(images: list[bytes]) -> ThreadingHTTPServer:
+    class ImageHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = images[int(self.path.strip("/").removesuffix(".png"))]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Benchmark
+# Time each stage of the banner pipeline: download and resize, upload one at a time, and upload as a batch
+def run_pipeline(urls: list[str]) -> dict[str, float]:
+    from services.games import generate_banner_image
+    from services.storage import storage
+
+    started = time.perf_counter()
+    banners = {f"benchmark/{index}.png": generate_banner_image(url).getvalue() for index, url in enumerate(urls)}
+    processed = time.perf_counter()
+    for key, banner in banners.items():
+        storage.upload(key, banner)
+    uploaded = time.perf_counter()
+    storage.upload_many(banners)
+    uploaded_many = time.perf_counter()
+    storage.delete_many(banners)
+
+    return {
+        "process": processed - started,
+        "upload": uploaded - processed,
+        "upload_many": uploaded_many - uploaded,
+        "megabytes": sum(len(banner) for banner in banners.values()) / 1024 / 1024,
+    }
+
+def print_results(runs: list[dict[str, float]], images: int) -> None:
+    megabytes = runs[0]["megabytes"]
+    print(f"{images} banners, {megabytes:.1f} MB after processing, median of {len(runs)} runs")
+    print(f"{'stage':<14}{'seconds':>10}{'images/s':>12}{'MB/s':>10}")
+    for stage in ["process", "upload", "upload_many"]:
+        seconds = statistics.median(run[stage] for run in runs)
+        print(f"{stage:<14}{seconds:>10.3f}{images / seconds:>12.1f}{megabytes / seconds:>10.1f}")
+
+# Command line
+# Runs offline against generated images, e.g. "python imagebench.py --backend filesystem" to time writing to disk,
+# or "--backend s3" with the bucket settings of a real deployment to time uploads to it
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark processing and uploading banner images")
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["memory", "filesystem", "s3"], help="Storage backend, defaults to STORAGE_BACKEND")
+    args = parser.parse_args()
+
+    # Settings are read when the services are first imported
+    if args.backend:
+        os.environ["STORAGE_BACKEND"] = args.backend
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    server = start_image_server(generate_images(args.images, args.width, args.height, args.seed))
+    urls = [f"http://127.0.0.1:{server.server_port}/{index}.png" for index in range(args.images)]
+    try:
+        print_results([run_pipeline(urls) for _ in range(args.runs)], args.images)
+    finally:
+        server.shutdown()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# Module Imports
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+# Import time
+# Import a module in a fresh interpreter and return each imported module's cumulative import time in microseconds
+def measure_import(module: str) -> dict[str, int]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    timings: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            timings[match.group(4)] = int(match.group(2))
+    return timings
+
+# Import a module several times, returns the median time for the module and for each module it imported
+def benchmark_import(module: str, runs: int) -> dict[str, float]:
+    samples = [measure_import(module) for _ in range(runs)]
+    names = set.intersection(*(set(timings) for timings in samples))
+    return {name: statistics.median(timings[name] for timings in samples) / 1000 for name in names}
+
+# Command line
+# Catch slower startups, e.g. "python importbench.py --max-ms 1500" exits with an error when importing main takes longer
+# or when a module that should only be loaded on first use, like numpy, PIL or boto3, is imported at startup
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark how long the app takes to import")
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest packages to list")
+    parser.add_argument("--max-ms", type=float, help="Fail when the median import time is above this")
+    parser.add_argument("--lazy", default="numpy,PIL,boto3,botocore", help="Comma separated modules that must not be imported at startup")
+    args = parser.parse_args()
+
+    timings = benchmark_import(args.module, args.runs)
+    total = timings[args.module]
+    packages = {name: timing for name, timing in timings.items() if "." not in name and name != args.module}
+    print(f"Importing {args.module} took {total:.1f}ms (median of {args.runs} runs)")
+    print(f"{'package':<30} {'ms':>8}")
+    for name, timing in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<30} {timing:>8.1f}")
+
+    failures = [f"{name} is imported at startup" for name in args.lazy.split(",") if name and name in timings]
+    if args.max_ms is not None and total > args.max_ms:
+        failures.append(f"import took {total:.1f}ms, above the limit of {args.max_ms:.1f}ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+# Module Imports
+import os
+import sys
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+import multiprocessing
+import httpx
+
+
+# Load
+# Send requests from concurrency clients for duration seconds, each client sends its next request once the last returns
+async def send_requests(url: str, headers: dict, concurrency: int, duration: float) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    async with httpx.AsyncClient(headers=headers, timeout=30, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def client_loop():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.status_code >= 400:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, errors
+
+def send_requests_in_process(arguments: tuple) -> tuple[list[float], int]:
+    return asyncio.run(send_requests(*arguments))
+
+# Load is generated from several processes so the load test itself is not limited to one core
+def run_load(url: str, headers: dict, concurrency: int, duration: float, processes: int) -> dict:
+    per_process = max(1, concurrency // processes)
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(send_requests_in_process, [(url, headers, per_process, duration)] * processes)
+    latencies = sorted(latency for process_latencies, _ in results for latency in process_latencies)
+    errors = sum(process_errors for _, process_errors in results)
+
+    def percentile(fraction: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000 if latencies else 0
+    return {"requests_per_sec": len(latencies) / duration, "p50_ms": percentile(0.5), "p95_ms": percentile(0.95), "p99_ms": percentile(0.99), "errors": errors}
+
+# Server
+# Start the production server with a number of workers and wait until it responds
+def start_server(workers: int, port: int, url: str, timeout: float = 60) -> subprocess.Popen:
+    env = {**os.environ, "SERVER_WORKERS": str(workers), "SERVER_PORT": str(port), "APP_RUN_SCHEDULED_TASKS": "false"}
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "main:app", "--config", "gunicorn.conf.py"], env=env)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server with {workers} workers exited with code {server.returncode} before accepting requests")
+        try:
+            httpx.get(url, timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    stop_server(server)
+    raise RuntimeError(f"Server with {workers} workers did not start within {timeout}s")
+
+# Several workers only share rate limits, cooldowns, cached responses and blackjack games through a redis RATE_LIMIT_STORAGE_URI,
+# gunicorn.conf.py refuses to start them on memory:// so check before starting any server
+def check_storage(workers: list[int]) -> None:
+    from limits.errors import ConfigurationError
+    from config import settings
+    try:
+        from services.ratelimit import storage, storage_is_shared
+    except ConfigurationError as error:
+        sys.exit(f"Cannot use RATE_LIMIT_STORAGE_URI={settings.RATE_LIMIT_STORAGE_URI}, install the redis extra with \"pip install .[redis]\" ({error})")
+    if max(workers) > 1 and not storage_is_shared:
+        sys.exit(f"Cannot start {max(workers)} workers with RATE_LIMIT_STORAGE_URI={settings.RATE_LIMIT_STORAGE_URI}, "
+                 "set it to a shared store such as redis://localhost:6379 (\"docker compose up redis\" starts one) or only test 1 worker")
+    if storage_is_shared and not storage.check():
+        sys.exit(f"Cannot reach RATE_LIMIT_STORAGE_URI={settings.RATE_LIMIT_STORAGE_URI}, start it before load testing")
+
+# Stop the server the same way a container runtime does, so graceful shutdown is exercised too
+def stop_server(server: subprocess.Popen) -> None:
+    server.send_signal(signal.SIGTERM)
+    server.wait()
+
+def print_results(rows: list[tuple[str, dict]]) -> None:
+    baseline = rows[0][1]["requests_per_sec"] or 1
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8}")
+    for name, result in rows:
+        print(f"{name:>8} {result['requests_per_sec']:>10.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7} {result['requests_per_sec'] / baseline:>7.2f}x")
+
+# Command line
+# Load test a running server, e.g. "python loadtest.py --url http://localhost:8000/api/games/tags"
+# or start the server with different worker counts to compare them, e.g. "python loadtest.py --workers 1,2,4 --port 8001"
+# More than one worker needs RATE_LIMIT_STORAGE_URI set to a redis server, e.g. "redis://localhost:6379"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the api and compare throughput across worker counts")
+    parser.add_argument("--url", help="Url to request, defaults to /api/games/tags on the started server")
+    parser.add_argument("--path", default="/api/games/tags", help="Path to request on the started server when --url is not given")
+    parser.add_argument("--header", action="append", default=[], help="Header to send as 'Name: value', e.g. an Authorization header")
+    parser.add_argument("--workers", help="Comma separated worker counts to start the server with, e.g. 1,2,4")
+    parser.add_argument("--port", type=int, default=8001, help="Port to start the server on")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--client-processes", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    args = parser.parse_args()
+
+    headers = dict(header.split(":", 1) for header in args.header)
+    headers = {name.strip(): value.strip() for name, value in headers.items()}
+    url = args.url or f"http://127.0.0.1:{args.port}{args.path}"
+
+    rows: list[tuple[str, dict]] = []
+    if not args.workers:
+        run_load(url, headers, args.concurrency, args.warmup, args.client_processes)
+        rows.append(("-", run_load(url, headers, args.concurrency, args.duration, args.client_processes)))
+    else:
+        worker_counts = [int(workers) for workers in args.workers.split(",")]
+        check_storage(worker_counts)
+        for workers in worker_counts:
+            server = start_server(workers, args.port, url)
+            try:
+                run_load(url, headers, args.concurrency, args.warmup, args.client_processes)
+                rows.append((str(workers), run_load(url, headers, args.concurrency, args.duration, args.client_processes)))
+            finally:
+                stop_server(server)
+    print_results(rows)
@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 
 # Module Imports
+import asyncio
 import logging
 import uvicorn
+from anyio import to_thread
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi_pagination import add_pagination
 from contextlib import asynccontextmanager
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from datetime import datetime, timezone
 from apscheduler.triggers.cron import CronTrigger
-from routers import auth, economy, games, servers, users
+from apscheduler.triggers.interval import IntervalTrigger
+from routers import auth, economy, games, metrics, servers, users
 from config import settings, log_config
 from schemas.database import setup_database
 from services.economy import randomize_exchange_rates
+from services.sweeper import sweep_all_expired_rows
+from services.response_cache import invalidate_after
+from services.instrumentation import InstrumentationMiddleware
+from services.metrics import timed_job, record_skipped_job, SKIPPED_JOB_EVENTS
+from services.tracing import setup_tracing, shutdown_tracing
+from services.scheduler import scheduler, blocking_job, cpu_executor, shutdown_scheduler
+from services.leader import leader_elector, leader_only
 from services.storage import *
 from services.games import *
 from services.servers import *
@@ -21,24 +31,30 @@ from services.servers import *
 # Tags metadata
 tags_metadata = [{"name": "Auth"}, {"name": "Economy"}, {"name": "Games"}, {"name": "Servers"}, {"name": "Users"}]
 
-# Task Scheduler
-scheduler = AsyncIOScheduler()
-
 # Startup logic
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     #setup_database()
-    create_bucket()
+    # Threads for sync routes, each one may hold a database connection so by default there is one per pooled connection
+    to_thread.current_default_thread_limiter().total_tokens = settings.SERVER_THREADPOOL_SIZE or settings.DB_POOL_SIZE + settings.DB_POOL_MAX_OVERFLOW
+    bucket_check = asyncio.create_task(ensure_bucket())
     if settings.APP_RUN_SCHEDULED_TASKS == True:
         scheduler.start()
-        scheduler.add_job(randomize_exchange_rates, trigger=CronTrigger(minute='0,15,30,45'), id='randomize_exchange_rates')
-        scheduler.add_job(update_last_updated_all, trigger=CronTrigger(minute='0,15,30,45'), id='update_last_updated_all')
-        scheduler.add_job(three_hourly_maintanence, trigger=CronTrigger(hour='0,3,6,9,12,15,18,21'), id='three_hourly_maintanence')
+        scheduler.add_listener(record_skipped_job, SKIPPED_JOB_EVENTS)
+        # Every replica runs the scheduler, jobs only run on the replica holding the leader lock
+        scheduler.add_job(leader_elector.check_async, trigger=IntervalTrigger(seconds=settings.LEADER_ELECTION_INTERVAL_SECS), next_run_time=datetime.now(timezone.utc), id='leader_election')
+        scheduler.add_job(leader_only(timed_job(invalidate_after(blocking_job(randomize_exchange_rates, cpu_executor), "currencies"))), trigger=CronTrigger(minute='0,15,30,45'), id='randomize_exchange_rates')
+        scheduler.add_job(leader_only(timed_job(invalidate_after(update_last_updated_all, "games", "servers"))), trigger=CronTrigger(minute='0,15,30,45'), id='update_last_updated_all')
+        scheduler.add_job(leader_only(timed_job(invalidate_after(three_hourly_maintanence, "games", "servers"))), trigger=CronTrigger(hour='0,3,6,9,12,15,18,21'), id='three_hourly_maintanence')
+        scheduler.add_job(leader_only(timed_job(blocking_job(sweep_all_expired_rows))), trigger=IntervalTrigger(minutes=settings.SWEEPER_INTERVAL_MINS), id='sweep_all_expired_rows')
         if settings.DOCKERLINK_ACTIVATED == True:
-            scheduler.add_job(update_server_statuses, trigger=CronTrigger(second='0'), id='update_server_statuses')
+            scheduler.add_job(leader_only(timed_job(invalidate_after(blocking_job(update_server_statuses), "servers"))), trigger=CronTrigger(second='0'), id='update_server_statuses')
     yield
+    bucket_check.cancel()
     if settings.APP_RUN_SCHEDULED_TASKS == True:
-        scheduler.shutdown
+        shutdown_scheduler()
+        leader_elector.release()
+    shutdown_tracing()
 
 # Create app
 if settings.APP_IN_PRODUCTION == True:
@@ -65,17 +81,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Setup tracing, does nothing unless TRACING_ENABLED is set
+setup_tracing(app)
+
+# Add database instrumentation middleware, added after CORS so it also times preflight requests
+app.add_middleware(InstrumentationMiddleware)
+
 # Setup static
 app.mount("/static", StaticFiles(directory="static"), name="static")
+# Files stored on disk are served the same way the bucket serves them, set STORAGE_BUCKET_MEDIA_URL to this server's /media
+if settings.STORAGE_BACKEND == "filesystem":
+    app.mount("/media", StaticFiles(directory=settings.STORAGE_FILESYSTEM_ROOT, check_dir=False), name="media")
 
-# Setup routers
-app.include_router(auth.router, prefix="/api/auth")
-app.include_router(economy.router, prefix="/api/economy")
-app.include_router(games.router, prefix="/api/games")
-app.include_router(servers.router, prefix="/api/servers")
-app.include_router(users.router, prefix="/api/users")
+# Setup routers, each router sets its own prefix so its routes hold their full path, which metrics are labelled with
+app.include_router(auth.router)
+app.include_router(economy.router)
+app.include_router(games.router)
+app.include_router(servers.router)
+app.include_router(users.router)
+app.include_router(metrics.router)
 
 # Run app
 if __name__ == "__main__":
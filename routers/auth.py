@@ -1,4 +1,5 @@
 # Module Imports
+import uuid
 import logging
 from typing import Optional
 from datetime import datetime
@@ -7,7 +8,7 @@ from fastapi.responses import RedirectResponse
 from sqlmodel import Session, select
 from config import settings
 from auth.utilities import *
-from auth.security import Authenticator
+from auth.security import Authenticator, RateLimit
 from schemas.database import get_session
 from schemas.auth import Tokens, RefreshToken
 from schemas.users import User
@@ -15,7 +16,7 @@ from services.users import get_or_create_user, generate_avatar_image, format_use
 from services.storage import *
 
 
-router = APIRouter()
+router = APIRouter(prefix="/api/auth")
 logger = logging.getLogger("services")
 
 # Redirect to discord login screen
@@ -23,8 +24,16 @@ logger = logging.getLogger("services")
 def discord_login() -> RedirectResponse:
     return RedirectResponse(url=settings.DISCORD_AUTHORIZE_URL)
 
+# Get the public keys used to sign tokens, so other services can verify tokens themselves
+@router.get("/jwks", tags=["auth"])
+def get_json_web_key_set() -> dict:
+    jwks = get_jwks()
+    if not jwks:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tokens are signed with a shared secret")
+    return jwks
+
 # Authenticate user once they login with discord
-@router.get("/discord/callback", tags=["auth"], response_model=Tokens)
+@router.get("/discord/callback", tags=["auth"], response_model=Tokens, dependencies=[Depends(RateLimit("auth_callback", settings.RATE_LIMIT_AUTH_CALLBACK))])
 def discord_callback(response: Response, code: str | None = None, redirect_url: str = settings.DISCORD_REDIRECT_URL, session: Session = Depends(get_session)):
     # Ensure access code is present
     if not code:
@@ -82,9 +91,10 @@ def discord_callback(response: Response, code: str | None = None, redirect_url:
     access_token_expires = issued_at + timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRY_MINS)
     access_token = create_jwt_token(user_id=user.id, issued_at=issued_at, expires_delta=timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRY_MINS))
 
+    refresh_token_jti = str(uuid.uuid4())
     refresh_token_expires = issued_at + timedelta(minutes=settings.JWT_REFRESH_TOKEN_EXPIRY_MINS)
-    refresh_token = create_jwt_token(user_id=user.id, issued_at=issued_at, expires_delta=timedelta(minutes=settings.JWT_REFRESH_TOKEN_EXPIRY_MINS))
-    db_refresh_token = RefreshToken(subject=user.id, issued_at=issued_at, expires_at=refresh_token_expires)
+    refresh_token = create_jwt_token(user_id=user.id, issued_at=issued_at, expires_delta=timedelta(minutes=settings.JWT_REFRESH_TOKEN_EXPIRY_MINS), jti=refresh_token_jti)
+    db_refresh_token = RefreshToken(jti=refresh_token_jti, subject=user.id, issued_at=issued_at, expires_at=refresh_token_expires)
     
     session.commit()
     session.add(db_refresh_token)
@@ -1,30 +1,55 @@
 # Module Imports
 import uuid
-import random
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Union
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from fastapi_filter import FilterDepends
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlmodel import Session, select
-from sqlalchemy import func
-from auth.security import require_permission
+from sqlalchemy import or_
+from auth.security import require_permission, RateLimit
+from config import settings
 from schemas.database import get_session
 from schemas.economy import *
 from schemas.users import User
-from services.economy import ensure_aware, add_cards_to_hand, calculate_blackjack_hand_value
+from services.economy import ensure_aware, calculate_work_pay, apply_balance_updates, lock_user_balances, lock_cooldown, claim_currency_exchange, get_cooldown, set_cooldown, clear_cooldown, get_exchange_rate_range, downsample_exchange_rates
+from services.response_cache import cached_response
+from services.sampling import get_cached_ids, choose_id
+from services.loading import eager_load
+from services.pagination import CursorPage, CursorParams, get_cursor_params, paginate_cursor
+from services.idempotency import get_idempotency_key, get_request_fingerprint, reserve_idempotency_key, save_idempotent_response
+from services.blackjack import start_game, save_game, claim_game, is_active_game, end_game
 from services.users import get_or_create_user
 
-router = APIRouter()
+router = APIRouter(prefix="/api/economy")
 
 # Get currencies
 @router.get("/currencies", tags=["economy"], dependencies=[Depends(require_permission("can_use_economy"))])
-def get_currencies(filter: CurrencyFilter = FilterDepends(CurrencyFilter), session: Session = Depends(get_session)) -> Page[CurrencyPublic]:
+def get_currencies(request: Request, filter: CurrencyFilter = FilterDepends(CurrencyFilter), session: Session = Depends(get_session)) -> Page[CurrencyPublic]:
     query = select(Currency)
     query = filter.filter(query)
     query = filter.sort(query)
-    return paginate(session, query)
+    return cached_response(request, "currencies", "can_use_economy", Page[CurrencyPublic], lambda: paginate(session, query))
+
+# Get exchange rate history for a currency
+@router.get("/currencies/{currency_id}/history", tags=["economy"], response_model=list[ExchangeRateHistoryPublic], dependencies=[Depends(require_permission("can_use_economy"))])
+def get_exchange_rate_history(currency_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = Query(1000, ge=1, le=10000), session: Session = Depends(get_session)):
+    start, end = get_exchange_rate_range(start, end)
+    query = select(ExchangeRateHistory.timestamp, ExchangeRateHistory.exchange_rate)
+    query = query.where(ExchangeRateHistory.currency_id == currency_id, ExchangeRateHistory.timestamp >= start, ExchangeRateHistory.timestamp < end)
+    query = query.order_by(ExchangeRateHistory.timestamp.desc()).limit(limit)
+    return [ExchangeRateHistoryPublic(timestamp=timestamp, exchange_rate=exchange_rate) for timestamp, exchange_rate in reversed(session.exec(query).all())]
+
+# Get exchange rate history for a currency, downsampled into open, high, low and close values
+@router.get("/currencies/{currency_id}/ohlc", tags=["economy"], response_model=list[ExchangeRateOHLC], dependencies=[Depends(require_permission("can_use_economy"))])
+def get_exchange_rate_ohlc(currency_id: int, interval: int = Query(3600, ge=900, le=604800, description="Interval length in seconds"), start: Optional[datetime] = None, end: Optional[datetime] = None, session: Session = Depends(get_session)):
+    start, end = get_exchange_rate_range(start, end, max_range=timedelta(seconds=interval * settings.ECONOMY_EXCHANGE_RATE_MAX_INTERVALS))
+    query = select(ExchangeRateHistory.timestamp, ExchangeRateHistory.exchange_rate)
+    query = query.where(ExchangeRateHistory.currency_id == currency_id, ExchangeRateHistory.timestamp >= start, ExchangeRateHistory.timestamp < end)
+    query = query.order_by(ExchangeRateHistory.timestamp.asc())
+    rows = session.exec(query).all()
+    return downsample_exchange_rates([row[0] for row in rows], [row[1] for row in rows], interval)
 
 # Start currency exchange
 @router.post("/currencies/exchange/start", tags=["economy"])
@@ -97,75 +122,84 @@ def start_currency_exchange(currency_exchange: CurrencyExchangeStart, current_us
 
 # Continue currency exchange
 @router.post("/currencies/exchange/continue", tags=["economy"])
-def continue_currency_exchange(currency_exchange: CurrencyExchangeContinue, current_user: User = Depends(require_permission("can_use_economy")), session: Session = Depends(get_session)):
-    current_user: User = session.merge(current_user)
-
+def continue_currency_exchange(currency_exchange: CurrencyExchangeContinue, current_user: User = Depends(require_permission("can_use_economy")), idempotency_key: Optional[str] = Depends(get_idempotency_key), session: Session = Depends(get_session)):
     # Get details from request
     currency_exchange: CurrencyExchangeContinue = CurrencyExchangeContinue(**currency_exchange.model_dump())
+
+    # Replay the response if this request has already been handled
+    db_idempotency_key = reserve_idempotency_key(session, current_user.id, idempotency_key, get_request_fingerprint("exchange", currency_exchange))
+    if db_idempotency_key:
+        return db_idempotency_key.response
     
     # Verify CurrencyExchange
     db_currency_exchange = session.exec(select(CurrencyExchange).where(CurrencyExchange.code == currency_exchange.code)).first()
     if not db_currency_exchange:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Currency exchange code is invalid")
 
-    # Verify that the exchange has not already finished
-    if db_currency_exchange.result:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This currency exchange has already finished")
-    
-    # Check that the exchange has not expired
-    if datetime.now(timezone.utc) > ensure_aware(db_currency_exchange.expires):
+    # Claim the exchange, this fails if it has already finished or expired, including when another request finished it first
+    action = "Confirmation" if currency_exchange.action == "Confirm" else "Cancellation"
+    if not claim_currency_exchange(session, currency_exchange.code, current_user.id, action):
+        session.refresh(db_currency_exchange)
+        if db_currency_exchange.result:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This currency exchange has already finished")
+        if db_currency_exchange.user_id != current_user.id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Currency exchange code is invalid")
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This currency exchange has expired")
 
     # Update user balances if action was confirmed
-    if currency_exchange.action == "Confirm":
-        # Get user balances
-        user_currency_from: UserCurrency = session.exec(select(UserCurrency).where(UserCurrency.user_id == current_user.id, UserCurrency.currency_id == db_currency_exchange.currency_from_id)).first()
-        user_currency_to: UserCurrency = session.exec(select(UserCurrency).where(UserCurrency.user_id == current_user.id, UserCurrency.currency_id == db_currency_exchange.currency_to_id)).first()
-
-        # Update user balances
-        user_currency_from.balance -= db_currency_exchange.currency_from_amount
-        user_currency_to.balance += db_currency_exchange.currency_to_amount
-        session.add(user_currency_from, user_currency_to)
-        session.commit()
-        session.refresh(user_currency_from, user_currency_to)
-
-        # Update CurrencyExchange
+    if action == "Confirmation":
+        # Lock user balances
+        balances = lock_user_balances(session, [current_user.id], [db_currency_exchange.currency_from_id, db_currency_exchange.currency_to_id])
+        user_currency_from: UserCurrency = balances[(current_user.id, db_currency_exchange.currency_from_id)]
+        user_currency_to: UserCurrency = balances[(current_user.id, db_currency_exchange.currency_to_id)]
         currency_from = user_currency_from.currency
         currency_from_amount = db_currency_exchange.currency_from_amount
         currency_to = user_currency_to.currency
         currency_to_amount = db_currency_exchange.currency_to_amount
 
-        db_currency_exchange.result = "Confirmation"
-        action = "Confirmation"
+        # Check that the user still has enough balance, it may have been spent since the exchange was started
+        if user_currency_from.balance < currency_from_amount:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Insufficent {currency_from.display_name} balance (have {currency_from.prefix}{user_currency_from.balance:.{currency_from.decimal_places}f}, need {currency_from.prefix}{currency_from_amount:.{currency_from.decimal_places}f})")
+
+        # Update user balances
+        user_currency_from.balance -= currency_from_amount
+        user_currency_to.balance += currency_to_amount
+        session.add(user_currency_from)
+        session.add(user_currency_to)
         response_text: list = [f"Converted {currency_from.prefix}{currency_from_amount:.{currency_from.decimal_places}f} {currency_from.display_name} to {currency_to.prefix}{currency_to_amount:.{currency_to.decimal_places}f} {currency_to.display_name}", f"Your {currency_from.display_name} balance is now {currency_from.prefix}{user_currency_from.balance:.{currency_from.decimal_places}f}", f"Your {currency_to.display_name} balance is now {currency_to.prefix}{user_currency_to.balance:.{currency_to.decimal_places}f}"]
     
         # Create transactions
-        db_transaction_from = Transaction(user_id=current_user.id, currency_id=currency_from.id, amount=-db_currency_exchange.currency_from_amount, timestamp=datetime.now(timezone.utc), note="Currency exchange")
-        db_transaction_to = Transaction(user_id=current_user.id, currency_id=currency_to.id, amount=db_currency_exchange.currency_to_amount, timestamp=datetime.now(timezone.utc), note="Currency exchange")
+        db_transaction_from = Transaction(user_id=current_user.id, currency_id=currency_from.id, amount=-currency_from_amount, timestamp=datetime.now(timezone.utc), note="Currency exchange")
+        db_transaction_to = Transaction(user_id=current_user.id, currency_id=currency_to.id, amount=currency_to_amount, timestamp=datetime.now(timezone.utc), note="Currency exchange")
         session.add(db_transaction_from)
         session.add(db_transaction_to)
     else:
-        db_currency_exchange.result = "Cancellation"
-        action = "Cancellation"
         response_text: list = ["Transaction Cancelled"]
 
     # Return
-    session.add(db_currency_exchange)
+    response = save_idempotent_response(session, current_user.id, idempotency_key, CurrencyExchangeContinueResponse(response_text=response_text, action=action))
     session.commit()
-    return CurrencyExchangeContinueResponse(response_text=response_text, action=action)
+    return response
     
 # Get balances
 @router.get("/balances", tags=["economy"], dependencies=[Depends(require_permission("can_use_economy"))])
 def get_balances(filter: UserCurrencyFilter = FilterDepends(UserCurrencyFilter), session: Session = Depends(get_session)) -> Page[UserCurrencyPublic]:
-    query = select(UserCurrency)
+    query = eager_load(select(UserCurrency), UserCurrencyPublic)
     query = filter.filter(query)
     query = filter.sort(query)
     return paginate(session, query)
 
+# Get balances using a cursor instead of page numbers
+@router.get("/balances/cursor", tags=["economy"], dependencies=[Depends(require_permission("can_use_economy"))])
+def get_balances_cursor(filter: UserCurrencyFilter = FilterDepends(UserCurrencyFilter), params: CursorParams = Depends(get_cursor_params), session: Session = Depends(get_session)) -> CursorPage[UserCurrencyPublic]:
+    query = eager_load(select(UserCurrency), UserCurrencyPublic)
+    query = filter.filter(query)
+    return paginate_cursor(session, query, [UserCurrency.id], params)
+
 # Get current user's balances
 @router.get("/balances/me", tags=["economy"])
 def get_current_user_balances(filter: UserCurrencyFilter = FilterDepends(UserCurrencyFilter), current_user: User = Depends(require_permission("can_use_economy")), session: Session = Depends(get_session)) -> Page[UserCurrencyPublic]:
-    query = select(UserCurrency)
+    query = eager_load(select(UserCurrency), UserCurrencyPublic)
     query = filter.filter(query)
     query = filter.sort(query)
     query = query.where(UserCurrency.user_id == current_user.id)
@@ -208,11 +242,52 @@ def modify_user_balance(user_currency_update: UserCurrencyUpdate, session: Sessi
     session.refresh(db_user_currency)
     return db_user_currency
 
+# Modify balances for many users at once, all updates are applied in one transaction
+@router.post("/balances/bulk", tags=["economy"], response_model=UserCurrencyBulkUpdateResponse, dependencies=[Depends(require_permission("can_manage_economy"))])
+def bulk_modify_user_balances(bulk_update: UserCurrencyBulkUpdate, session: Session = Depends(get_session)):
+    updates: list[UserCurrencyUpdate] = bulk_update.updates
+    if any(not update.discord_id and not update.user_id for update in updates):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Either a id or discord_id of a user must be provided for every update")
+
+    # Get target users in one query, discord_id is used over id when both are given
+    user_ids = {update.user_id for update in updates if not update.discord_id}
+    discord_ids = {update.discord_id for update in updates if update.discord_id}
+    db_users = session.exec(select(User.id, User.discord_id).where(or_(User.id.in_(user_ids), User.discord_id.in_(discord_ids)))).all()
+    found_user_ids = {db_user.id for db_user in db_users}
+    discord_user_ids = {db_user.discord_id: db_user.id for db_user in db_users if db_user.discord_id in discord_ids}
+
+    # Only discord ids that are not in the database need to be looked up
+    for discord_id in discord_ids - discord_user_ids.keys():
+        db_user: User = get_or_create_user(discord_id)
+        if not db_user:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"An invalid discord id was provided ({discord_id})")
+        discord_user_ids[discord_id] = db_user.id
+
+    missing_user_ids = user_ids - found_user_ids
+    if missing_user_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Users not found: {', '.join(str(user_id) for user_id in sorted(missing_user_ids))}")
+
+    # Validate currencies
+    currency_ids = {update.currency_id for update in updates}
+    missing_currency_ids = currency_ids - set(session.exec(select(Currency.id).where(Currency.id.in_(currency_ids))).all())
+    if missing_currency_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Currencies not found: {', '.join(str(currency_id) for currency_id in sorted(missing_currency_ids))}")
+
+    # Update balances and create transactions
+    transactions, balances = apply_balance_updates(session, [(discord_user_ids[update.discord_id] if update.discord_id else update.user_id, update) for update in updates])
+    session.commit()
+    return UserCurrencyBulkUpdateResponse(transactions=transactions, balances=[UserCurrencyBalance(user_id=user_id, currency_id=currency_id, balance=balance) for (user_id, currency_id), balance in balances.items()])
+
 # Gift Currency
-@router.post("/balances/gift", tags=["economy"])
-def send_gift(gift: Gift, current_user: User = Depends(require_permission("can_use_economy")), session: Session = Depends(get_session)):
+@router.post("/balances/gift", tags=["economy"], dependencies=[Depends(RateLimit("gift", settings.RATE_LIMIT_GIFT))])
+def send_gift(gift: Gift, current_user: User = Depends(require_permission("can_use_economy")), idempotency_key: Optional[str] = Depends(get_idempotency_key), session: Session = Depends(get_session)):
     current_user: User = session.merge(current_user)
 
+    # Replay the response if this request has already been handled
+    db_idempotency_key = reserve_idempotency_key(session, current_user.id, idempotency_key, get_request_fingerprint("gift", gift))
+    if db_idempotency_key:
+        return db_idempotency_key.response
+
     # Get target user using either discord_id or id
     if gift.discord_id:
         db_recieving_user: User = get_or_create_user(gift.discord_id)
@@ -232,9 +307,10 @@ def send_gift(gift: Gift, current_user: User = Depends(require_permission("can_u
     if not db_currency.can_exchange:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This currency cannot be gifted")
     
-    # Get user balances for currency being gifted
-    db_sending_user_currency: UserCurrency = session.exec(select(UserCurrency).where(UserCurrency.user_id == current_user.id, UserCurrency.currency_id == gift.currency_id)).first()
-    db_recieving_user_currency: UserCurrency = session.exec(select(UserCurrency).where(UserCurrency.user_id == db_recieving_user.id, UserCurrency.currency_id == gift.currency_id)).first()
+    # Lock user balances for currency being gifted until the gift is committed
+    balances = lock_user_balances(session, [current_user.id, db_recieving_user.id], [gift.currency_id])
+    db_sending_user_currency: UserCurrency = balances[(current_user.id, gift.currency_id)]
+    db_recieving_user_currency: UserCurrency = balances[(db_recieving_user.id, gift.currency_id)]
 
     # Check if enough currency
     if db_sending_user_currency.balance < gift.amount:
@@ -243,7 +319,8 @@ def send_gift(gift: Gift, current_user: User = Depends(require_permission("can_u
     # Change balances
     db_sending_user_currency.balance -= gift.amount
     db_recieving_user_currency.balance += gift.amount
-    session.add(db_sending_user_currency, db_recieving_user_currency)
+    session.add(db_sending_user_currency)
+    session.add(db_recieving_user_currency)
 
     # Create transactions
     db_transaction_sending = Transaction(user_id=current_user.id, currency_id=gift.currency_id, amount=-gift.amount, timestamp=datetime.now(timezone.utc), note=f"Sent gift to {db_recieving_user.display_name}")
@@ -251,41 +328,48 @@ def send_gift(gift: Gift, current_user: User = Depends(require_permission("can_u
     session.add(db_transaction_sending)
     session.add(db_transaction_recieving)
 
-    session.commit()
-    session.refresh(db_sending_user_currency, db_recieving_user_currency)
-
     # Return
-    return f"Successfully gifted {db_currency.prefix}{gift.amount:.{db_currency.decimal_places}f} {db_currency.display_name} to {db_recieving_user.display_name}. Your {db_currency.display_name} balance is now {db_currency.prefix}{db_sending_user_currency.balance:.{db_currency.decimal_places}f}. <@{db_recieving_user.discord_id}>'s {db_currency.display_name} balance is now {db_currency.prefix}{db_recieving_user_currency.balance:.{db_currency.decimal_places}f}."
+    response = save_idempotent_response(session, current_user.id, idempotency_key, f"Successfully gifted {db_currency.prefix}{gift.amount:.{db_currency.decimal_places}f} {db_currency.display_name} to {db_recieving_user.display_name}. Your {db_currency.display_name} balance is now {db_currency.prefix}{db_sending_user_currency.balance:.{db_currency.decimal_places}f}. <@{db_recieving_user.discord_id}>'s {db_currency.display_name} balance is now {db_currency.prefix}{db_recieving_user_currency.balance:.{db_currency.decimal_places}f}.")
+    session.commit()
+    return response
 
 # Get current user's transactions
 @router.get("/transactions/me", tags=["economy"])
 def get_current_user_transactions(filter: TransactionFilter = FilterDepends(TransactionFilter), current_user: User = Depends(require_permission("can_use_economy")), session: Session = Depends(get_session)) -> Page[TransactionPublic]:
-    query = select(Transaction)
+    query = eager_load(select(Transaction), TransactionPublic)
     query = filter.filter(query)
     query = filter.sort(query)
     query = query.where(Transaction.user_id == current_user.id)
     return paginate(session, query)
 
+# Get current user's transactions using a cursor, newest first by default
+@router.get("/transactions/me/cursor", tags=["economy"])
+def get_current_user_transactions_cursor(filter: TransactionFilter = FilterDepends(TransactionFilter), params: CursorParams = Depends(get_cursor_params), current_user: User = Depends(require_permission("can_use_economy")), session: Session = Depends(get_session)) -> CursorPage[TransactionPublic]:
+    query = eager_load(select(Transaction), TransactionPublic)
+    query = filter.filter(query)
+    query = query.where(Transaction.user_id == current_user.id)
+    return paginate_cursor(session, query, [Transaction.timestamp, Transaction.id], params, default_order="desc")
+
 # Get balances for a specific user
 @router.get("/balances/{user_id}", tags=["economy"], response_model=list[UserCurrencyPublic], dependencies=[Depends(require_permission("can_use_economy"))])
 def get_user_balances(user_id: int, session: Session = Depends(get_session)):
     db_user: User = session.exec(select(User).where(User.id == user_id)).first()
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return session.exec(select(UserCurrency).where(UserCurrency.user_id == user_id).order_by(UserCurrency.id.asc())).all()
+    return session.exec(eager_load(select(UserCurrency), UserCurrencyPublic).where(UserCurrency.user_id == user_id).order_by(UserCurrency.id.asc())).all()
 
 # Get jobs
 @router.get("/jobs", tags=["economy"], dependencies=[Depends(require_permission("can_use_economy"))])
-def get_jobs(filter: JobFilter = FilterDepends(JobFilter), session: Session = Depends(get_session)) -> Page[JobPublic]:
+def get_jobs(request: Request, filter: JobFilter = FilterDepends(JobFilter), session: Session = Depends(get_session)) -> Page[JobPublic]:
     query = select(Job)
     query = filter.filter(query)
     query = filter.sort(query)
-    return paginate(session, query)
+    return cached_response(request, "jobs", "can_use_economy", Page[JobPublic], lambda: paginate(session, query))
 
 # Get user jobs
 @router.get("/jobs/users", tags=["economy"], dependencies=[Depends(require_permission("can_use_economy"))])
 def get_user_jobs(filter: UserJobFilter = FilterDepends(UserJobFilter), session: Session = Depends(get_session)) -> Page[UserJobPublic]:
-    query = select(UserJob)
+    query = eager_load(select(UserJob), UserJobPublic)
     query = filter.filter(query)
     query = filter.sort(query)
     return paginate(session, query)
@@ -295,7 +379,7 @@ def get_user_jobs(filter: UserJobFilter = FilterDepends(UserJobFilter), session:
 def get_current_user_job(current_user: User = Depends(require_permission("can_use_economy")), session: Session = Depends(get_session)):
     current_user: User = session.merge(current_user)
 
-    db_user_job = session.exec(select(UserJob).where(UserJob.user_id == current_user.id)).first()
+    db_user_job = session.exec(eager_load(select(UserJob), UserJobPublic, "joined").where(UserJob.user_id == current_user.id)).first()
 
     # If job exists, return it
     if db_user_job:
@@ -303,10 +387,10 @@ def get_current_user_job(current_user: User = Depends(require_permission("can_us
     
     # If job does not exist, return a cooldown for when the user can apply for another one
     else:
-        for cooldown in current_user.cooldowns:
-            if cooldown.cooldown_type == "job_change" and ensure_aware(cooldown.expires) > datetime.now(timezone.utc):
-                expires_in = ensure_aware(cooldown.expires) - datetime.now(timezone.utc)
-                raise HTTPException(status_code=status.HTTP_200_OK, detail=f"You do not currently have a job. You can apply for another job in {expires_in.seconds}s")
+        cooldown_expires = get_cooldown(current_user.id, "job_change")
+        if cooldown_expires:
+            expires_in = cooldown_expires - datetime.now(timezone.utc)
+            raise HTTPException(status_code=status.HTTP_200_OK, detail=f"You do not currently have a job. You can apply for another job in {expires_in.seconds}s")
         raise HTTPException(status_code=status.HTTP_200_OK, detail="You do not currently have a job")
     
 # Apply for job
@@ -318,18 +402,22 @@ def apply_for_job(current_user: User = Depends(require_permission("can_use_econo
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"You already have a job")
     
     # Check cooldown
-    for cooldown in current_user.cooldowns:
-        if cooldown.cooldown_type == "job_change" and ensure_aware(cooldown.expires) > datetime.now(timezone.utc):
-            expires_in = ensure_aware(cooldown.expires) - datetime.now(timezone.utc)
-            raise HTTPException(status_code=status.HTTP_200_OK, detail=f"You can apply for another job in {expires_in.seconds}s")
-        session.delete(cooldown)
-
-    # Generate random job
-    db_random_job: Job = session.exec(select(Job).order_by(func.random())).first()
+    cooldown_expires = get_cooldown(current_user.id, "job_change")
+    if cooldown_expires:
+        expires_in = cooldown_expires - datetime.now(timezone.utc)
+        raise HTTPException(status_code=status.HTTP_200_OK, detail=f"You can apply for another job in {expires_in.seconds}s")
+
+    # Generate random job, ids are cached so only the chosen job is loaded
+    job_id = choose_id(get_cached_ids(session, "jobs", select(Job.id)))
+    db_random_job: Job = session.get(Job, job_id) if job_id else None
+    if not db_random_job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="There are no jobs available")
     if db_random_job.overridden_currency:
         currency_id = db_random_job.overridden_currency_id
     else:
-        currency_id = session.exec(select(Currency).where(Currency.can_work_for == True).order_by(func.random())).first().id
+        currency_id = choose_id(get_cached_ids(session, "work_currencies", select(Currency.id).where(Currency.can_work_for == True)))
+        if not currency_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="There are no currencies that can be worked for")
     db_user_job = UserJob(user_id=current_user.id, currency_id=currency_id, job_id=db_random_job.id)
 
     # Return job
@@ -348,13 +436,10 @@ def quit_job(current_user: User = Depends(require_permission("can_use_economy"))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You do not have a job you can quit")
     
     # Create cooldown
-    db_change_job_cooldown: Cooldown = Cooldown(user_id=current_user.id, expires=datetime.now(timezone.utc) + timedelta(seconds=300), cooldown_type="job_change")
-    session.add(db_change_job_cooldown)
+    set_cooldown(session, current_user.id, "job_change", datetime.now(timezone.utc) + timedelta(seconds=300))
 
     # Remove old work cooldown
-    for cooldown in current_user.cooldowns:
-        if cooldown.cooldown_type == "work":
-            session.delete(cooldown)
+    clear_cooldown(session, current_user.id, "work")
     
     # Delete job
     old_job_name = current_user.job.job.display_name
@@ -363,24 +448,34 @@ def quit_job(current_user: User = Depends(require_permission("can_use_economy"))
     return {"detail": f"You quit your previous job of {old_job_name}. You can apply for another job in 300s"}
 
 # Work Job
-@router.post("/jobs/work", tags=["economy"])
-def work_job(current_user: User = Depends(require_permission("can_use_economy")), session: Session = Depends(get_session)):
+@router.post("/jobs/work", tags=["economy"], dependencies=[Depends(RateLimit("work", settings.RATE_LIMIT_WORK))])
+def work_job(current_user: User = Depends(require_permission("can_use_economy")), idempotency_key: Optional[str] = Depends(get_idempotency_key), session: Session = Depends(get_session)):
+    # Replay the response if this request has already been handled, this is checked first as the retry would otherwise be on cooldown
+    db_idempotency_key = reserve_idempotency_key(session, current_user.id, idempotency_key, get_request_fingerprint("work"))
+    if db_idempotency_key:
+        return db_idempotency_key.response
+
+    # Check cooldown, this is usually answered from cache so repeated requests do not touch the database
+    cooldown_expires = get_cooldown(current_user.id, "work")
+    if cooldown_expires:
+        expires_in = cooldown_expires - datetime.now(timezone.utc)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"You can work again in {expires_in.seconds}s")
+
     current_user: User = session.merge(current_user)
     # Check job
     if not current_user.job:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"You cannot work without a job")
-    
-    # Check cooldown
-    for cooldown in current_user.cooldowns:
-        if cooldown.cooldown_type == "work" and ensure_aware(cooldown.expires) > datetime.now(timezone.utc):
-            expires_in = ensure_aware(cooldown.expires) - datetime.now(timezone.utc)
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"You can work again in {expires_in.seconds}s")
-        session.delete(cooldown)
+
+    # Lock the balance being paid, then check the cooldown again so concurrent requests cannot both be paid
+    balance: UserCurrency = lock_user_balances(session, [current_user.id], [current_user.job.currency_id])[(current_user.id, current_user.job.currency_id)]
+    cooldown_expires = lock_cooldown(session, current_user.id, "work")
+    if cooldown_expires:
+        expires_in = cooldown_expires - datetime.now(timezone.utc)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"You can work again in {expires_in.seconds}s")
 
     # Pay user
     job: Job = current_user.job.job
-    pay_amount: float = (random.uniform(job.min_pay, job.max_pay)) / current_user.job.currency.value_multiplier
-    balance = session.exec(select(UserCurrency).where(UserCurrency.user_id == current_user.id, UserCurrency.currency_id == current_user.job.currency_id)).first()
+    pay_amount: float = float(calculate_work_pay(job.min_pay, job.max_pay, current_user.job.currency.value_multiplier))
     balance.balance = balance.balance + pay_amount
     session.add(balance)
 
@@ -389,9 +484,7 @@ def work_job(current_user: User = Depends(require_permission("can_use_economy"))
     session.add(db_transaction)
 
     # Create cooldown
-    work_cooldown: Cooldown = Cooldown(user_id=current_user.id, expires=datetime.now(timezone.utc) + timedelta(seconds=current_user.job.job.cooldown), cooldown_type="work")
-    session.add(work_cooldown)
-    session.commit()
+    set_cooldown(session, current_user.id, "work", datetime.now(timezone.utc) + timedelta(seconds=current_user.job.job.cooldown))
 
     # Generate response string
     currency_paid = current_user.job.currency
@@ -399,22 +492,20 @@ def work_job(current_user: User = Depends(require_permission("can_use_economy"))
     response_string = f"You went to work and were paid {currency_prefix}{pay_amount:.{currency_paid.decimal_places}f} {currency_paid.display_name}. You may work again in {job.cooldown:.0f}s."
 
     # Send response
+    save_idempotent_response(session, current_user.id, idempotency_key, response_string)
+    session.commit()
     return response_string
 
 # Blackjack
-@router.post("/gambling/blackjack", tags=["economy"], response_model=BlackjackGameResponse)
+@router.post("/gambling/blackjack", tags=["economy"], response_model=BlackjackGameResponse, dependencies=[Depends(RateLimit("blackjack", settings.RATE_LIMIT_BLACKJACK))])
 def blackjack(request_blackjack_game: Union[BlackjackGameStart, BlackjackGameContinue], current_user: User = Depends(require_permission("can_use_economy")), session: Session = Depends(get_session)):
     current_user: User = session.merge(current_user)
+    action: Optional[str] = None
 
     # If the game is just starting
     if type(request_blackjack_game) == BlackjackGameStart:
         blackjack_game: BlackjackGameStart = BlackjackGameStart(**request_blackjack_game.model_dump())
 
-        # Check that the user does not have any unfinished games
-        db_unexpired_game = session.exec(select(BlackjackGame).where(BlackjackGame.user_id == current_user.id).where(BlackjackGame.result == None)).first()
-        if db_unexpired_game and datetime.now(timezone.utc) < ensure_aware(db_unexpired_game.expires):
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You already have an active blackjack game that has not been finished or expired")
-
         # Check that the currency is valid
         db_currency: Currency = session.get(Currency, blackjack_game.currency_id)
         if not db_currency:
@@ -425,128 +516,78 @@ def blackjack(request_blackjack_game: Union[BlackjackGameStart, BlackjackGameCon
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This currency cannot be gambled")
         
         # Check that the user has enough to bet
-        db_user_currency: UserCurrency = session.exec(select(UserCurrency).where(UserCurrency.id == db_currency.id)).first()
+        db_user_currency: UserCurrency = session.exec(select(UserCurrency).where(UserCurrency.user_id == current_user.id, UserCurrency.currency_id == db_currency.id)).first()
         if db_user_currency.balance < blackjack_game.bet:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Insufficent {db_currency.display_name} balance (have {db_currency.prefix}{db_user_currency.balance:.{db_currency.decimal_places}f}, need {db_currency.prefix}{blackjack_game.bet:.{db_currency.decimal_places}f})")
 
-        # Create BlackjackGame
-        expires = datetime.now(timezone.utc) + timedelta(minutes=5)
-        db_blackjack_game = BlackjackGame(code=str(uuid.uuid4()), user_id=current_user.id, currency_id=db_currency.id, bet=blackjack_game.bet, expires=expires)
-
-        # Draw cards
-        db_blackjack_game.user_hand = add_cards_to_hand([], 2)
-        db_blackjack_game.dealer_hand = add_cards_to_hand([], 2)
+        # Create game and draw cards, this fails if the user has any unfinished games
+        game = start_game(current_user.id, db_currency.id, blackjack_game.bet)
+        if not game:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You already have an active blackjack game that has not been finished or expired")
 
     # If game is already ongoing
     else:
         blackjack_game: BlackjackGameContinue = BlackjackGameContinue(**request_blackjack_game.model_dump())
 
-        # Verify BlackjackGame
-        db_blackjack_game = session.exec(select(BlackjackGame).where(BlackjackGame.code == blackjack_game.code)).first()
-        if not db_blackjack_game:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blackjack game code is invalid")
-        
-        # Verify that the game has not already finished
-        if db_blackjack_game.result:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This blackjack game has already finished")
-        
-        # Check that the exchange has not expired
-        if datetime.now(timezone.utc) > ensure_aware(db_blackjack_game.expires):
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This blackjack game has expired")
-
         # Verify that an action was given
         if not blackjack_game.action:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Action must either be 'Hit' or 'Stand'")
-        
-        # If user has hit, draw a card. Dealer hits only if their hand is worth less than 17
-        if blackjack_game.action == "Hit":
-            db_blackjack_game.user_hand = add_cards_to_hand(db_blackjack_game.user_hand, 1)
-
-            if calculate_blackjack_hand_value(db_blackjack_game.dealer_hand) < 17:
-                db_blackjack_game.dealer_hand = add_cards_to_hand(db_blackjack_game.dealer_hand, 1)
 
-        # If user has stood, dealer hits until their hand value is more than or equal to 17
-        if blackjack_game.action == "Stand":
-            while calculate_blackjack_hand_value(db_blackjack_game.dealer_hand) < 17:
-                db_blackjack_game.dealer_hand = add_cards_to_hand(db_blackjack_game.dealer_hand, 1)
+        # Claim the game, only one request can play an action on a game at a time and only finished games are stored in the database
+        game = claim_game(blackjack_game.code, current_user.id)
+        if not game:
+            if is_active_game(blackjack_game.code, current_user.id):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This blackjack game is already being played by another request")
+            if session.exec(select(BlackjackGame.id).where(BlackjackGame.code == blackjack_game.code, BlackjackGame.user_id == current_user.id)).first():
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This blackjack game has already finished")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blackjack game code is invalid or has expired")
+        
+        # Draw cards for the user and dealer
+        action = blackjack_game.action
+        game.play(action)
 
         # Get bet currency
-        db_currency = db_blackjack_game.currency
+        db_currency: Currency = session.get(Currency, game.currency_id)
         
     # Determine if the game has finished
-    user_hand_value = calculate_blackjack_hand_value(db_blackjack_game.user_hand)
-    dealer_hand_value = calculate_blackjack_hand_value(db_blackjack_game.dealer_hand)
-
-    db_blackjack_game.user_hand_value = user_hand_value
-    db_blackjack_game.dealer_hand_value = dealer_hand_value
+    game_outcome = game.determine_outcome(action)
+    response_text = None
 
-    game_outcome = None
-
-    if user_hand_value > 21:
-        game_outcome = "Lose"
-    elif user_hand_value == 21:
-        if dealer_hand_value == 21:
-            game_outcome = "Tie"
-        else:
-            game_outcome = "Win"
-    else:
-        if dealer_hand_value > 21:
-            game_outcome = "Win"
-        elif dealer_hand_value == 21:
-            game_outcome = "Lose"
-        else:
-            if type(request_blackjack_game) == BlackjackGameContinue:
-                if dealer_hand_value > user_hand_value and blackjack_game.action == "Stand":
-                    game_outcome = "Lose"
-                elif user_hand_value > dealer_hand_value and blackjack_game.action == "Stand" and dealer_hand_value >= 17:
-                    game_outcome = "Win"
-                elif user_hand_value == dealer_hand_value and blackjack_game.action == "Stand":
-                    game_outcome = "Tie"
-
-    # If the game ended, set result and update balances
+    # If the game ended, settle the bet against the locked balance
     if game_outcome != None:
-        db_user_currency = session.exec(select(UserCurrency).where(UserCurrency.user_id == current_user.id, UserCurrency.currency_id == db_blackjack_game.currency_id)).first()
-        db_blackjack_game.result = game_outcome
-        
+        balance_key = (current_user.id, game.currency_id)
         if game_outcome == "Win":
-            response_text = [f"You won {db_currency.prefix}{db_blackjack_game.bet:.{db_currency.decimal_places}f} {db_currency.display_name}", f"Your {db_currency.display_name} balance is now {db_currency.prefix}{(db_user_currency.balance + db_blackjack_game.bet):.{db_currency.decimal_places}f}"]
+            _, new_balances = apply_balance_updates(session, [(current_user.id, UserCurrencyUpdate(currency_id=game.currency_id, mode="Add", amount=game.bet, note="Blackjack win"))])
+            response_text = [f"You won {db_currency.prefix}{game.bet:.{db_currency.decimal_places}f} {db_currency.display_name}", f"Your {db_currency.display_name} balance is now {db_currency.prefix}{new_balances[balance_key]:.{db_currency.decimal_places}f}"]
         elif game_outcome == "Lose":
-            response_text = [f"You lost {db_currency.prefix}{db_blackjack_game.bet:.{db_currency.decimal_places}f} {db_currency.display_name}", f"Your {db_currency.display_name} balance is now {db_currency.prefix}{(db_user_currency.balance - db_blackjack_game.bet):.{db_currency.decimal_places}f}"]
+            _, new_balances = apply_balance_updates(session, [(current_user.id, UserCurrencyUpdate(currency_id=game.currency_id, mode="Subtract", amount=game.bet, note="Blackjack loss"))])
+            response_text = [f"You lost {db_currency.prefix}{game.bet:.{db_currency.decimal_places}f} {db_currency.display_name}", f"Your {db_currency.display_name} balance is now {db_currency.prefix}{new_balances[balance_key]:.{db_currency.decimal_places}f}"]
         else:
-            response_text = [f"You were refunded {db_currency.prefix}{db_blackjack_game.bet:.{db_currency.decimal_places}f} {db_currency.display_name}", f"Your {db_currency.display_name} balance is {db_currency.prefix}{db_user_currency.balance:.{db_currency.decimal_places}f}"]
-
-        # Update balances, create transactions
-        for user_currency in current_user.balances:
-            if user_currency.id == 1:
-                user_currency.balance += 10
-                session.add(user_currency)
-
-            if user_currency.id == db_currency.id:
-                if game_outcome == "Win":
-                    user_currency.balance += db_blackjack_game.bet
-                    db_transaction = Transaction(user_id=current_user.id, currency_id=db_blackjack_game.currency_id, amount=db_blackjack_game.bet, timestamp=datetime.now(timezone.utc), note="Blackjack win")
-                    session.add(db_transaction)
-                
-                elif game_outcome == "Lose":
-                    user_currency.balance -= db_blackjack_game.bet
-                    db_transaction = Transaction(user_id=current_user.id, currency_id=db_blackjack_game.currency_id, amount=-db_blackjack_game.bet, timestamp=datetime.now(timezone.utc), note="Blackjack loss")
-                    session.add(db_transaction)
-                session.add(user_currency)
-    else:
-        response_text = None
+            balance = lock_user_balances(session, [current_user.id], [game.currency_id])[balance_key].balance
+            response_text = [f"You were refunded {db_currency.prefix}{game.bet:.{db_currency.decimal_places}f} {db_currency.display_name}", f"Your {db_currency.display_name} balance is {db_currency.prefix}{balance:.{db_currency.decimal_places}f}"]
 
-    # Commit game to database
-    session.add(db_blackjack_game)
-    session.commit()
-    session.refresh(db_blackjack_game)
+        # Commit game to database
+        session.add(game.to_db_model())
+        session.commit()
+        end_game(game)
+    else:
+        save_game(game)
 
     # Censor dealer cards if the game has not finished
+    dealer_hand = game.dealer_hand.formatted()
+    dealer_hand_value = game.dealer_hand.value
     if not game_outcome:
-        db_blackjack_game.dealer_hand_value = 0
-        censored_dealer_hand = [db_blackjack_game.dealer_hand[0]]
-        for i in range(1, len(db_blackjack_game.dealer_hand), 1):
-            censored_dealer_hand.append("[?]")
-        db_blackjack_game.dealer_hand = censored_dealer_hand
+        dealer_hand = [dealer_hand[0]] + ["[?]"] * (len(dealer_hand) - 1)
+        dealer_hand_value = 0
 
     # Return
-    return BlackjackGameResponse(game=db_blackjack_game, response_text=response_text)
+    public_game = BlackjackGamePublic(code=game.code,
+                                      user=current_user,
+                                      user_hand=game.user_hand.formatted(),
+                                      user_hand_value=game.user_hand.value,
+                                      dealer_hand=dealer_hand,
+                                      dealer_hand_value=dealer_hand_value,
+                                      currency=db_currency,
+                                      bet=game.bet,
+                                      result=game.result)
+    return BlackjackGameResponse(game=public_game, response_text=response_text)
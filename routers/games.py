@@ -1,23 +1,28 @@
 # Module Imports
 import logging
-from typing import TypeVar
+from typing import Optional, TypeVar
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from fastapi_filter import FilterDepends
-from fastapi_pagination import Page, Params
+from fastapi_pagination import Page, Params, create_page
 from fastapi_pagination.ext.sqlalchemy import paginate
 from fastapi_pagination.customization import CustomizedPage, UseParamsFields
 from sqlmodel import Session, select
-from sqlalchemy import func
 from auth.security import require_permission
 from schemas.database import get_session
 from schemas.games import *
 from schemas.users import User
 from services.games import *
+from services.response_cache import cached_response, invalidate_responses
+from services.search import search_games, invalidate_game_search_index
+from services.sampling import get_cached_ids, sample_ids, clear_cached_ids
+from services.serialization import ColumnSerializer, get_fields, media_urls, paginate_columns
+from services.loading import eager_load
+from services.pagination import CursorPage, CursorParams, get_cursor_params, paginate_cursor
 from services.storage import *
 
 
-router = APIRouter()
+router = APIRouter(prefix="/api/games")
 logger = logging.getLogger("services")
 
 # Increase max size for certain requests
@@ -27,28 +32,42 @@ LargePage = CustomizedPage[
     UseParamsFields(size=Query(50, ge=1, le=1000),)
 ]
 
-# Get games
+# Get games, only the public columns are selected and serialized straight to json as pages can be up to 1000 games
+# fields limits both the columns selected and the fields returned, e.g. fields=id,name,banner_image
+game_serializer = ColumnSerializer(Game, GamePublic, {"banner_image": media_urls, "servers_image": media_urls})
+
 @router.get("", tags=["games"], dependencies=[Depends(require_permission("can_view_games"))])
-def get_games(filter: GameFilter = FilterDepends(GameFilter), session: Session = Depends(get_session)) -> Page[GamePublic]:
+def get_games(request: Request, filter: GameFilter = FilterDepends(GameFilter), fields: Optional[list[str]] = Depends(get_fields), session: Session = Depends(get_session)) -> LargePage[GamePublic]:
     query = select(Game)
     query = filter.filter(query)
     query = filter.sort(query)
-    return paginate(session, query)
+    serializer = game_serializer.project(fields)
+    return cached_response(request, "games", "can_view_games", LargePage[GamePublic], lambda: paginate_columns(session, query, serializer))
 
-# Get random games
+# Get random games, matching ids are cached so each request only loads the games it returns
 @router.get("/random", tags=["games"], dependencies=[Depends(require_permission("can_view_games"))])
-def get_random_games(session: Session = Depends(get_session)) -> Page[GamePublic]:
-    query = select(Game)
-    query = query.order_by(func.rand())
-    return paginate(session, query)
+def get_random_games(filter: GameFilter = FilterDepends(GameFilter), params: Params = Depends(), session: Session = Depends(get_session)) -> Page[GamePublic]:
+    query = select(Game.id)
+    query = filter.filter(query)
+    ids = get_cached_ids(session, ("games", filter.model_dump_json(exclude={"order_by"})), query)
+
+    # Load sampled games and keep them in the sampled order
+    sampled_ids = sample_ids(ids, params.size)
+    db_games = {db_game.id: db_game for db_game in session.exec(select(Game).where(Game.id.in_(sampled_ids))).all()}
+    return create_page([db_games[id] for id in sampled_ids if id in db_games], total=len(ids), params=params)
+
+# Search games by name, platform and tags, the index is kept in memory so this is cheap enough for autocomplete
+@router.get("/search", tags=["games"], response_model=list[GameSearchResult], dependencies=[Depends(require_permission("can_view_games"))])
+def search_for_games(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=50)):
+    return search_games(q, limit)
 
 # Get game tags
 @router.get("/tags", tags=["games"])
-def get_game_tags(filter: GameTagFilter = FilterDepends(GameTagFilter), session: Session = Depends(get_session)) -> Page[GameTag]:
+def get_game_tags(request: Request, filter: GameTagFilter = FilterDepends(GameTagFilter), session: Session = Depends(get_session)) -> Page[GameTag]:
     query = select(GameTag)
     query = filter.filter(query)
     query = filter.sort(query)
-    return paginate(session, query)
+    return cached_response(request, "game_tags", "public", Page[GameTag], lambda: paginate(session, query))
 
 # Get game ratings
 @router.get("/ratings", tags=["games"], dependencies=[Depends(require_permission("can_view_games"))])
@@ -58,10 +77,17 @@ def get_game_ratings(filter: GameRatingFilter = FilterDepends(GameRatingFilter),
     query = filter.sort(query)
     return paginate(session, query)
 
+# Get game ratings using a cursor instead of page numbers
+@router.get("/ratings/cursor", tags=["games"], dependencies=[Depends(require_permission("can_view_games"))])
+def get_game_ratings_cursor(filter: GameRatingFilter = FilterDepends(GameRatingFilter), params: CursorParams = Depends(get_cursor_params), session: Session = Depends(get_session)) -> CursorPage[GameRating]:
+    query = select(GameRating)
+    query = filter.filter(query)
+    return paginate_cursor(session, query, [GameRating.id], params)
+
 # Get a user's ratings
 @router.get("/ratings/user", tags=["games"])
 def get_user_game_ratings(filter: GameRatingFilter = FilterDepends(GameRatingFilter), current_user: User =  Depends(require_permission("can_view_games")), session: Session = Depends(get_session)) -> LargePage[GameRatingPublic]:
-    query = select(GameRating)
+    query = eager_load(select(GameRating), GameRatingPublic)
     query = filter.filter(query)
     query = filter.sort(query)
     query = query.where(GameRating.user_id == current_user.id)
@@ -96,6 +122,7 @@ def update_game_rating(rating: GameRatingUpdate, current_user: User =  Depends(r
     # Update game's average rating and popularity score
     update_average_rating(db_game.id)
     update_popularity_score(db_game.id)
+    invalidate_responses("games")
     return db_rating
 
 # Add game
@@ -123,9 +150,10 @@ def add_game(game: GameCreate, current_user: User =  Depends(require_permission(
     # Set date added
     db_game.date_added = datetime.now(timezone.utc)
 
-    # Add game to session to get id
+    # Add game to session to get id, then link its tags
     session.add(db_game)
     session.flush()
+    set_game_tag_links(session, db_game)
 
     # Set banner image
     banner_image_file_name = f"game_banner_images/{str(db_game.id).zfill(4)}.png"
@@ -139,6 +167,9 @@ def add_game(game: GameCreate, current_user: User =  Depends(require_permission(
     # Commit game to db and return
     session.commit()
     session.refresh(db_game)
+    clear_cached_ids()
+    invalidate_game_search_index()
+    invalidate_responses("games", "servers")
 
     # Populate ratings for the game
     populate_game_ratings(db_game.id)
@@ -179,10 +210,15 @@ def edit_game(id: int, game: GameUpdate, current_user: User =  Depends(require_p
     update_banner_image(db_game.id)
     update_last_updated(db_game.id)
 
-    # Commit game to db and return
+    # Update tag links and commit game to db and return, links are written last as they lock the game row
+    if "tags" in game_updates:
+        set_game_tag_links(session, db_game)
     session.add(db_game)
     session.commit()
     session.refresh(db_game)
+    clear_cached_ids()
+    invalidate_game_search_index()
+    invalidate_responses("games", "servers")
     return db_game
 
 # Delete game
@@ -203,4 +239,7 @@ def delete_game(id: int, current_user: User =  Depends(require_permission("can_d
     # Commit deletion
     session.delete(db_game)
     session.commit()
+    clear_cached_ids()
+    invalidate_game_search_index()
+    invalidate_responses("games", "servers")
     return
@@ -0,0 +1,33 @@
+# Module Imports
+import os
+import hmac
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Header, Response
+from prometheus_client import generate_latest, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST
+from prometheus_client.multiprocess import MultiProcessCollector
+from config import settings
+from services.metrics import PoolCollector
+
+
+router = APIRouter()
+logger = logging.getLogger("services")
+
+# Get metrics in the prometheus text format, a bearer token is required when METRICS_BEARER_TOKEN is set
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.METRICS_BEARER_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {settings.METRICS_BEARER_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(content=generate_latest(get_registry()), media_type=CONTENT_TYPE_LATEST)
+
+# With several workers each one writes its metrics to PROMETHEUS_MULTIPROC_DIR and they are combined when scraped
+# Pool stats are collected live and are for the worker that handled the scrape
+def get_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    registry.register(PoolCollector())
+    return registry
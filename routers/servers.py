@@ -1,37 +1,46 @@
 # Module Imports
 import logging
-import requests
-from typing import Union
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional, Union
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi_filter import FilterDepends
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlmodel import Session, select
-from sqlalchemy.orm import selectinload
 from auth.security import require_permission
 from config import settings
 from schemas.database import get_session
 from schemas.servers import *
+from services.response_cache import cached_response, invalidate_responses
+from services.metrics import http_session
+from services.loading import eager_load, get_loader_options
+from services.serialization import ColumnSerializer, get_fields, media_urls, paginate_columns
 
 
-router = APIRouter()
+router = APIRouter(prefix="/api/servers")
 logger = logging.getLogger("services")
 
-# Get servers
+# Get servers, the category and game are selected from the joined tables instead of being loaded as separate objects
+# fields limits both the columns selected and the fields returned, e.g. fields=id,name,domain
+server_serializer = ColumnSerializer(Server, ServerPublic, {"banner_image": media_urls}, {
+    "category": ColumnSerializer(ServerCategory, ServerCategoryPublic, {"servers_icon": media_urls}),
+    "game": ColumnSerializer(Game, GamePublicForServers, {"servers_image": media_urls}),
+})
+
 @router.get("", tags=["servers"], dependencies=[Depends(require_permission("can_view_servers"))])
-def get_servers(filter: ServerFilter = FilterDepends(ServerFilter), session: Session = Depends(get_session)) -> Page[ServerPublic]:
+def get_servers(request: Request, filter: ServerFilter = FilterDepends(ServerFilter), fields: Optional[list[str]] = Depends(get_fields), session: Session = Depends(get_session)) -> Page[ServerPublic]:
     query = select(Server).join(Game).join(ServerCategory)
     query = filter.filter(query)
     query = filter.sort(query)
-    return paginate(session, query)
+    serializer = server_serializer.project(fields)
+    return cached_response(request, "servers", "can_view_servers", Page[ServerPublic], lambda: paginate_columns(session, query, serializer))
     
 # Get server categories
 @router.get("/categories", tags=["servers"], dependencies=[Depends(require_permission("can_view_servers"))])
-def get_server_categories(filter: ServerCategoryFilter = FilterDepends(ServerCategoryFilter), session: Session = Depends(get_session)) -> Page[ServerCategoryPublic]:
+def get_server_categories(request: Request, filter: ServerCategoryFilter = FilterDepends(ServerCategoryFilter), session: Session = Depends(get_session)) -> Page[ServerCategoryPublic]:
     query = select(ServerCategory)
     query = filter.filter(query)
     query = filter.sort(query)
-    return paginate(session, query)
+    return cached_response(request, "server_categories", "can_view_servers", Page[ServerCategoryPublic], lambda: paginate(session, query))
 
 # Add server category
 @router.post("/categories/add/", tags=["servers"], response_model=ServerCategoryPublic, dependencies=[Depends(require_permission("can_manage_servers"))], status_code=201)
@@ -50,6 +59,7 @@ def add_server_category(category: ServerCategoryCreate, session: Session = Depen
     session.add(db_category)
     session.commit()
     session.refresh(db_category)
+    invalidate_responses("server_categories")
     return db_category
     
 # Get server category
@@ -80,10 +90,11 @@ def edit_server_category(id: int, category: ServerCategoryUpdate, session: Sessi
         db_category.icon = None
         db_category.minecraft_color = None
 
-    # Commit category to db and return
+    # Commit category to db and return, servers include their category so their responses are invalidated too
     session.add(db_category)
     session.commit()
     session.refresh(db_category)
+    invalidate_responses("server_categories", "servers")
     return db_category
 
 # Start server
@@ -104,7 +115,7 @@ def start_server(id: Union[int, str], session: Session = Depends(get_session)):
     url: str = f"{settings.PTERODACTYL_DOMAIN}/api/client/servers/{db_server.uuid}/power"
     headers: dict = {'Authorization': f'Bearer {settings.PTERODACTYL_CLIENT_API_KEY}'}
     body: dict = {'signal': 'start'}
-    response = requests.post(url=url, headers=headers, json=body)
+    response = http_session.post(url=url, headers=headers, json=body)
 
     # Send response
     if response.status_code == 204:
@@ -127,15 +138,16 @@ def add_server(server: ServerCreate, session: Session = Depends(get_session)):
     session.add(db_server)
     session.commit()
     session.refresh(db_server)
+    invalidate_responses("servers")
     return db_server
 
 # Get server
 @router.get("/{id}", tags=["servers"], response_model=ServerPublic, dependencies=[Depends(require_permission("can_view_servers"))])
 def get_server(id: Union[int, str], session: Session = Depends(get_session)) -> Server:
     # Check that the server exists
-    db_server = session.get(Server, id)
+    db_server = session.get(Server, id, options=get_loader_options(Server, ServerPublic, "joined"))
     if not db_server:
-        db_server = session.exec(select(Server).where(Server.name == id).options(selectinload(Server.game)).options(selectinload(Server.category))).first()
+        db_server = session.exec(eager_load(select(Server), ServerPublic, "joined").where(Server.name == id)).first()
         if not db_server:
             raise HTTPException(status_code=404, detail="Server not found")
 
@@ -167,6 +179,7 @@ def edit_server(id: Union[int, str], server: ServerUpdate, session: Session = De
     session.add(db_server)
     session.commit()
     session.refresh(db_server)
+    invalidate_responses("servers")
     return db_server
 
 # Delete server
@@ -182,4 +195,5 @@ def delete_server(id: Union[int, str], session: Session = Depends(get_session)):
     # Commit deletion
     session.delete(db_server)
     session.commit()
+    invalidate_responses("servers")
     return
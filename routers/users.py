@@ -1,25 +1,36 @@
 # Module Imports
 import logging
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from fastapi_filter import FilterDepends
 from fastapi_pagination import Page
-from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlmodel import Session, select
 from auth.security import require_permission, Authenticator
 from schemas.database import get_session
 from schemas.users import *
+from services.serialization import ColumnSerializer, get_fields, media_urls, paginate_columns
+from services.pagination import CursorPage, CursorParams, get_cursor_params, paginate_cursor
 
-router = APIRouter()
+router = APIRouter(prefix="/api/users")
 logger = logging.getLogger("services")
 
-# Get users
+# Get users, fields limits both the columns selected and the fields returned, e.g. fields=id,display_name,avatar_image
+user_serializer = ColumnSerializer(User, UserPublic, {"avatar_image": media_urls})
+
 @router.get("", tags=["users"], dependencies=[Depends(require_permission("can_view_users"))])
-def get_users(filter: UserFilter = FilterDepends(UserFilter), session: Session = Depends(get_session)) -> Page[UserPublic]:
+def get_users(filter: UserFilter = FilterDepends(UserFilter), fields: Optional[list[str]] = Depends(get_fields), session: Session = Depends(get_session)) -> Page[UserPublic]:
     query = select(User)
     query = filter.filter(query)
     query = filter.sort(query)
-    return paginate(session, query)
+    return Response(content=paginate_columns(session, query, user_serializer.project(fields)), media_type="application/json")
+
+# Get users using a cursor instead of page numbers
+@router.get("/cursor", tags=["users"], dependencies=[Depends(require_permission("can_view_users"))])
+def get_users_cursor(filter: UserFilter = FilterDepends(UserFilter), params: CursorParams = Depends(get_cursor_params), session: Session = Depends(get_session)) -> CursorPage[UserPublic]:
+    query = select(User)
+    query = filter.filter(query)
+    return paginate_cursor(session, query, [User.id], params)
 
 # Create user
 @router.post("/create", tags=["users"], response_model=UserPublic, dependencies=[Depends(require_permission("can_manage_users"))], status_code=201)
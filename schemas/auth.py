@@ -25,6 +25,8 @@ class RefreshToken(SQLModel, table=True):
     __tablename__ = "refresh_tokens"
     id: Optional[int] = Field(primary_key=True, index=True)
 
+    jti: Optional[str] = Field(default=None, index=True, unique=True, max_length=36)
+
     subject: int = Field(foreign_key="users.id", index=True)
     user: "User" = Relationship(back_populates="refresh_tokens")
 
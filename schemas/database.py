@@ -5,8 +5,8 @@ from config import settings
 from sqlmodel import SQLModel, create_engine, Session
 from sqlalchemy import func
 from schemas.auth import ApiKey, RefreshToken
-from schemas.economy import Currency, UserCurrency, Job, UserJob, Cooldown, BlackjackGame, Transaction, CurrencyExchange
-from schemas.games import Game, GameTag, GameRating
+from schemas.economy import Currency, UserCurrency, Job, UserJob, Cooldown, BlackjackGame, Transaction, CurrencyExchange, ExchangeRateHistory, IdempotencyKey
+from schemas.games import Game, GameTag, GameTagLink, GameRating
 from schemas.servers import Server, ServerCategory
 from schemas.users import User, Permission, UserPermission
 
@@ -14,8 +14,14 @@ from schemas.users import User, Permission, UserPermission
 logger = logging.getLogger("services")
 
 # Database setup
-DATABASE_URL = f"mysql+mysqlconnector://{settings.DB_USERNAME}:{quote_plus(settings.DB_PASSWORD)}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_DATABASE}"
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = settings.DB_URL or f"mysql+mysqlconnector://{settings.DB_USERNAME}:{quote_plus(settings.DB_PASSWORD)}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_DATABASE}"
+# Each worker process has its own pool, so the most connections used is workers * (pool size + max overflow)
+engine = create_engine(DATABASE_URL,
+                       pool_size=settings.DB_POOL_SIZE,
+                       max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+                       pool_timeout=settings.DB_POOL_TIMEOUT_SECS,
+                       pool_recycle=settings.DB_POOL_RECYCLE_SECS,
+                       pool_pre_ping=True)
 
 def setup_database():
     SQLModel.metadata.create_all(engine)
@@ -1,7 +1,7 @@
 # Module Imports
 import logging
 from datetime import datetime, timezone
-from typing import TYPE_CHECKING, Optional, List, Literal
+from typing import TYPE_CHECKING, Any, Optional, List, Literal
 from sqlmodel import SQLModel, Float, Field, Relationship
 from fastapi_filter.contrib.sqlalchemy import Filter
 import sqlalchemy as sa
@@ -38,6 +38,7 @@ class Currency(SQLModel, table=True):
     user_jobs: Optional[list["UserJob"]] = Relationship(back_populates="currency")
     blackjack_games: Optional[list["BlackjackGame"]] = Relationship(back_populates="currency")
     transactions: Optional[list["Transaction"]] = Relationship(back_populates="currency")
+    exchange_rate_history: Optional[list["ExchangeRateHistory"]] = Relationship(back_populates="currency")
 
 
 class CurrencyPublic(SQLModel):
@@ -73,6 +74,39 @@ class CurrencyFilter(Filter):
         model = Currency
 
 
+# ExchangeRateHistory
+class ExchangeRateHistory(SQLModel, table=True):
+    __tablename__ = "exchange_rate_history"
+    __table_args__ = (sa.Index("ix_exchange_rate_history_currency_id_timestamp", "currency_id", "timestamp"),)
+    id: Optional[int] = Field(sa_column=sa.Column(sa.BigInteger, primary_key=True, autoincrement=True))
+
+    currency_id: int = Field(sa_column=sa.Column(sa.Integer, sa.ForeignKey("currencies.id", ondelete="CASCADE"), nullable=False))
+    currency: "Currency" = Relationship(back_populates="exchange_rate_history")
+
+    timestamp: datetime = Field(sa_column=sa.Column(sa.DateTime, nullable=False))
+    exchange_rate: float = Field(sa_column=sa.Column(Float(), nullable=False))
+
+
+class ExchangeRateHistoryPublic(SQLModel):
+    timestamp: datetime
+    exchange_rate: float
+
+    @field_serializer("timestamp")
+    def validate_timestamp(self, dt: datetime):
+        if dt:
+            if dt.tzinfo is None:
+                return dt.replace(tzinfo=timezone.utc)
+            return dt.astimezone(timezone.utc)
+
+
+class ExchangeRateOHLC(SQLModel):
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+
+
 # UserCurrency
 class UserCurrency(SQLModel, table=True):
     __tablename__ = "user_currencies"
@@ -108,6 +142,21 @@ class UserCurrencyUpdate(SQLModel):
     note: str
 
 
+class UserCurrencyBulkUpdate(SQLModel):
+    updates: list[UserCurrencyUpdate] = Field(min_length=1, max_length=1000)
+
+
+class UserCurrencyBalance(SQLModel):
+    user_id: int
+    currency_id: int
+    balance: float
+
+
+class UserCurrencyBulkUpdateResponse(SQLModel):
+    transactions: int
+    balances: list[UserCurrencyBalance]
+
+
 class UserCurrencyFilter(Filter):
     user_id: Optional[int] = None
     currency_id: Optional[int] = None
@@ -120,6 +169,7 @@ class UserCurrencyFilter(Filter):
 # Transaction
 class Transaction(SQLModel, table=True):
     __tablename__ = "transactions"
+    __table_args__ = (sa.Index("ix_transactions_user_id_timestamp_id", "user_id", "timestamp", "id"),)
     id: Optional[int] = Field(primary_key=True, index=True)
 
     user_id: int = Field(sa_column=sa.Column(sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE")))
@@ -226,12 +276,13 @@ class UserJobFilter(Filter):
 # Cooldown
 class Cooldown(SQLModel, table=True):
     __tablename__ = "cooldowns"
+    __table_args__ = (sa.Index("ix_cooldowns_user_id_cooldown_type", "user_id", "cooldown_type", unique=True),)
     id: Optional[int] = Field(primary_key=True, index=True)
 
     user_id: int = Field(sa_column=sa.Column(sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE")))
     user: "User" = Relationship(back_populates="cooldowns")
 
-    expires: datetime= Field(sa_column=sa.Column(sa.DateTime(timezone=True), nullable=False))
+    expires: datetime= Field(sa_column=sa.Column(sa.DateTime(timezone=True), nullable=False, index=True))
     cooldown_type: str = Field(index=True, max_length=30)
 
     @field_serializer("expires")
@@ -303,7 +354,7 @@ class Gift(SQLModel):
 class BlackjackGame(SQLModel, table=True):
     __tablename__ = "blackjack_games"
     id: Optional[int] = Field(primary_key=True, index=True)
-    code: str = Field(index=True, max_length=36)
+    code: str = Field(index=True, unique=True, max_length=36)
 
     user_id: int = Field(sa_column=sa.Column(sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE")))
     user: "User" = Relationship(back_populates="blackjack_games")
@@ -322,7 +373,6 @@ class BlackjackGame(SQLModel, table=True):
 
 
 class BlackjackGamePublic(SQLModel):
-    id: int
     code: str
     user: UserPublicShort
     user_hand: List[str]
@@ -347,3 +397,16 @@ class BlackjackGameContinue(SQLModel):
 class BlackjackGameResponse(SQLModel):
     game: BlackjackGamePublic
     response_text: Optional[list[str]]
+
+
+# Idempotency Key
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (sa.Index("ix_idempotency_keys_user_id_key", "user_id", "key", unique=True),)
+    id: Optional[int] = Field(sa_column=sa.Column(sa.BigInteger, primary_key=True, autoincrement=True))
+
+    user_id: int = Field(sa_column=sa.Column(sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False))
+    key: str = Field(sa_column=sa.Column(sa.String(64), nullable=False))
+    fingerprint: str = Field(sa_column=sa.Column(sa.String(64), nullable=False))
+    response: Optional[Any] = Field(default=None, sa_column=sa.Column(JSON, nullable=True))
+    expires: datetime = Field(index=True)
@@ -1,5 +1,4 @@
 # Module Imports
-import json
 import logging
 import validators
 from typing import TYPE_CHECKING, Optional, List
@@ -8,7 +7,7 @@ from datetime import datetime, timezone
 from sqlmodel import SQLModel, Field, Relationship
 from fastapi_filter.contrib.sqlalchemy import Filter
 import sqlalchemy as sa
-from sqlalchemy import or_, func
+from sqlalchemy import func, select
 from pydantic import field_validator, model_validator, field_serializer
 from config import settings
 
@@ -201,6 +200,7 @@ class GameFilter(Filter):
     max_party_size__lte: Optional[int] = None
     max_party_size__gte: Optional[int] = None
     tags__in: Optional[list[str]] = None
+    tags__all: Optional[list[str]] = None
     last_updated__isnull: Optional[bool] = None
     added_by_id: Optional[int] = None
     average_rating__gte: Optional[float] = None
@@ -213,22 +213,37 @@ class GameFilter(Filter):
 
     def filter(self, query):
         # Save tags so that they don't get written incorrectly to the query
-        tags = self.tags__in
+        tags_in = self.tags__in
+        tags_all = self.tags__all
         self.tags__in = None
+        self.tags__all = None
 
         # Apply filters
         query = super().filter(query)
 
-        # Filter tags
-        if tags:
-            conditions = [func.JSON_CONTAINS(Game.tags, json.dumps(tag)) for tag in tags]
-            query = query.where(or_(*conditions))
+        # Filter tags using the tag links table, tags__in matches games with any of the tags and tags__all games with every tag
+        if tags_in:
+            query = query.where(Game.id.in_(select(GameTagLink.game_id).join(GameTag, GameTag.id == GameTagLink.tag_id).where(GameTag.name.in_(tags_in))))
+        if tags_all:
+            tag_game_ids = select(GameTagLink.game_id).join(GameTag, GameTag.id == GameTagLink.tag_id).where(GameTag.name.in_(tags_all))
+            tag_game_ids = tag_game_ids.group_by(GameTagLink.game_id).having(func.count() == len(set(tags_all)))
+            query = query.where(Game.id.in_(tag_game_ids))
 
         # Return query
-        self.tags__in = tags
+        self.tags__in = tags_in
+        self.tags__all = tags_all
         return query
 
 
+class GameSearchResult(SQLModel):
+    id: int
+    name: str
+    platform: str
+    tags: List[str]
+    popularity_score: Optional[float]
+    score: float = 0
+
+
 # GameTag
 class GameTag(SQLModel, table=True):
     __tablename__ = "game_tags"
@@ -236,6 +251,15 @@ class GameTag(SQLModel, table=True):
     name: str = Field(index=True, default=None, max_length=50)
 
 
+# GameTagLink
+# Links games to their tags so tag filters can use indexes, Game.tags keeps a copy of the tag names for responses
+class GameTagLink(SQLModel, table=True):
+    __tablename__ = "game_tag_links"
+    __table_args__ = (sa.Index("ix_game_tag_links_tag_id_game_id", "tag_id", "game_id"),)
+    game_id: int = Field(sa_column=sa.Column(sa.Integer, sa.ForeignKey("games.id", ondelete="CASCADE"), primary_key=True))
+    tag_id: int = Field(sa_column=sa.Column(sa.Integer, sa.ForeignKey("game_tags.id", ondelete="CASCADE"), primary_key=True))
+
+
 class GameTagFilter(Filter):
     order_by: Optional[list[str]] = ["name"]
 
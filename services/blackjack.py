@@ -0,0 +1,304 @@
+# Module Imports
+import uuid
+import random
+import logging
+import orjson
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+from limits.storage import RedisStorage
+from config import settings
+from schemas.economy import BlackjackGame
+from services.cache import TTLCache
+from services.ratelimit import storage, storage_is_shared
+
+
+logger = logging.getLogger("services")
+
+# Cards are stored as integers from 0 to 51, the suit is card // 13 and the rank is card % 13
+SUITS = ["♠", "♥", "♦", "♣"]
+RANKS = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A"]
+RANK_VALUES = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11]
+ACE = 12
+GAME_DURATION = timedelta(minutes=5)
+
+# Services
+# Cards
+# Format a card for display, e.g. "♠A"
+def format_card(card: int) -> str:
+    return f"{SUITS[card // 13]}{RANKS[card % 13]}"
+
+# Shoe of one or more decks, shuffled lazily as cards are drawn so each draw is O(1)
+# and a game only pays for the cards it actually uses
+class Shoe:
+    __slots__ = ("decks", "cards", "remaining", "rng")
+
+    def __init__(self, decks: int = 1, rng: Optional[random.Random] = None):
+        self.decks = decks
+        self.rng = rng or random.Random()
+        self.cards: list[int] = list(range(52)) * decks
+        self.remaining: int = len(self.cards)
+
+    # Draw a random card from the undrawn part of the shoe and move it behind the draw point
+    def draw(self) -> int:
+        if not self.remaining:
+            self.remaining = len(self.cards)
+        index = self.rng.randrange(self.remaining)
+        self.remaining -= 1
+        cards = self.cards
+        cards[index], cards[self.remaining] = cards[self.remaining], cards[index]
+        return cards[self.remaining]
+
+    # Move a card that has already been dealt behind the draw point, so a shoe can be rebuilt from the hands of a stored game
+    def discard(self, card: int) -> None:
+        try:
+            index = self.cards.index(card, 0, self.remaining)
+        except ValueError:
+            return
+        self.remaining -= 1
+        cards = self.cards
+        cards[index], cards[self.remaining] = cards[self.remaining], cards[index]
+
+# Hand of cards, the total is updated as each card is added rather than recalculated
+class Hand:
+    __slots__ = ("cards", "value", "soft_aces")
+
+    def __init__(self):
+        self.cards: list[int] = []
+        self.value: int = 0
+        self.soft_aces: int = 0
+
+    # Add a card, aces count as 11 until the hand would bust, then as 1
+    def add(self, card: int) -> None:
+        rank = card % 13
+        self.cards.append(card)
+        self.value += RANK_VALUES[rank]
+        if rank == ACE:
+            self.soft_aces += 1
+        while self.value > 21 and self.soft_aces:
+            self.value -= 10
+            self.soft_aces -= 1
+
+    def formatted(self) -> list[str]:
+        return [format_card(card) for card in self.cards]
+
+# Game
+# State of a game that is still being played, kept in the active game store until the game finishes
+class BlackjackState:
+    __slots__ = ("code", "user_id", "currency_id", "bet", "expires", "shoe", "user_hand", "dealer_hand", "result")
+
+    def __init__(self, user_id: int, currency_id: int, bet: float, decks: int = 1, rng: Optional[random.Random] = None):
+        self.code: str = str(uuid.uuid4())
+        self.user_id = user_id
+        self.currency_id = currency_id
+        self.bet = bet
+        self.expires: datetime = datetime.now(timezone.utc) + GAME_DURATION
+        self.shoe = Shoe(decks, rng)
+        self.user_hand = Hand()
+        self.dealer_hand = Hand()
+        self.result: Optional[str] = None
+
+    # Convert to and from the json kept in the active game store, the shoe is rebuilt without the cards in either hand
+    def dumps(self) -> bytes:
+        return orjson.dumps({"code": self.code, "user_id": self.user_id, "currency_id": self.currency_id, "bet": self.bet,
+                             "expires": self.expires.timestamp(), "user_hand": self.user_hand.cards, "dealer_hand": self.dealer_hand.cards})
+
+    @classmethod
+    def loads(cls, data: bytes, decks: int = 1, rng: Optional[random.Random] = None) -> "BlackjackState":
+        values = orjson.loads(data)
+        game = cls(values["user_id"], values["currency_id"], values["bet"], decks, rng)
+        game.code = values["code"]
+        game.expires = datetime.fromtimestamp(values["expires"], tz=timezone.utc)
+        for hand, cards in ((game.user_hand, values["user_hand"]), (game.dealer_hand, values["dealer_hand"])):
+            for card in cards:
+                game.shoe.discard(card)
+                hand.add(card)
+        return game
+
+    # Deal two cards to each hand
+    def deal(self) -> None:
+        for _ in range(2):
+            self.user_hand.add(self.shoe.draw())
+            self.dealer_hand.add(self.shoe.draw())
+
+    # If user has hit, draw a card. Dealer hits only if their hand is worth less than 17
+    # If user has stood, dealer hits until their hand value is more than or equal to 17
+    def play(self, action: str) -> None:
+        if action == "Hit":
+            self.user_hand.add(self.shoe.draw())
+            if self.dealer_hand.value < 17:
+                self.dealer_hand.add(self.shoe.draw())
+
+        if action == "Stand":
+            while self.dealer_hand.value < 17:
+                self.dealer_hand.add(self.shoe.draw())
+
+    # Set the result of the game if it has finished, action is none when the game has just been dealt
+    def determine_outcome(self, action: Optional[str] = None) -> Optional[str]:
+        user_value = self.user_hand.value
+        dealer_value = self.dealer_hand.value
+
+        if user_value > 21:
+            self.result = "Lose"
+        elif user_value == 21:
+            self.result = "Tie" if dealer_value == 21 else "Win"
+        elif dealer_value > 21:
+            self.result = "Win"
+        elif dealer_value == 21:
+            self.result = "Lose"
+        elif action == "Stand":
+            if dealer_value > user_value:
+                self.result = "Lose"
+            elif user_value > dealer_value and dealer_value >= 17:
+                self.result = "Win"
+            elif user_value == dealer_value:
+                self.result = "Tie"
+        return self.result
+
+    # Create the database row for a finished game
+    def to_db_model(self) -> BlackjackGame:
+        return BlackjackGame(code=self.code,
+                             user_id=self.user_id,
+                             currency_id=self.currency_id,
+                             user_hand=self.user_hand.formatted(),
+                             user_hand_value=self.user_hand.value,
+                             dealer_hand=self.dealer_hand.formatted(),
+                             dealer_hand_value=self.dealer_hand.value,
+                             bet=self.bet,
+                             result=self.result,
+                             expires=self.expires)
+
+# Active Games
+# Stores hold bytes by key until their ttl passes, add only sets a key that does not exist and pop removes and returns
+# a key so that a game is only ever claimed by one request
+class MemoryGameStore:
+    def __init__(self, maxsize: int):
+        self.entries = TTLCache(maxsize=maxsize)
+
+    def get(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.entries.set(key, value, ttl=ttl)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return ttl > 0 and self.entries.add(key, value, ttl=ttl)
+
+    def pop(self, key: str) -> bytes | None:
+        return self.entries.pop(key)
+
+    def delete(self, key: str) -> None:
+        self.entries.delete(key)
+
+
+# Uses the redis client of the rate limit storage, so every worker and replica sees the same games
+class RedisGameStore:
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if ttl > 0:
+            self.client.set(key, value, px=max(1, int(ttl * 1000)))
+        else:
+            self.client.delete(key)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return ttl > 0 and bool(self.client.set(key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+    # GET and DEL run in one transaction so only one client receives the value
+    def pop(self, key: str) -> bytes | None:
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.get(key)
+        pipeline.delete(key)
+        value, _ = pipeline.execute()
+        return value
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+
+def get_game_store() -> MemoryGameStore | RedisGameStore:
+    if isinstance(storage, RedisStorage):
+        return RedisGameStore(storage.storage)
+    if storage_is_shared:
+        logger.warning("Active blackjack games are kept in this process as RATE_LIMIT_STORAGE_URI is not a redis server")
+    return MemoryGameStore(settings.BLACKJACK_MAX_ACTIVE_GAMES)
+
+active_games = get_game_store()
+
+def game_key(code: str) -> str:
+    return f"blackjack/game/{code}"
+
+def user_key(user_id: int) -> str:
+    return f"blackjack/user/{user_id}"
+
+def remaining_seconds(game: BlackjackState) -> float:
+    return (game.expires - datetime.now(timezone.utc)).total_seconds()
+
+# Start a new game and deal the first cards, returns none if the user already has a game that has not finished or expired
+def start_game(user_id: int, currency_id: int, bet: float) -> BlackjackState | None:
+    game = BlackjackState(user_id, currency_id, bet, decks=settings.BLACKJACK_DECKS)
+    if not active_games.add(user_key(user_id), game.code.encode(), remaining_seconds(game)):
+        return None
+    game.deal()
+    return game
+
+# Keep a game that has not finished until the next action, or until it expires
+def save_game(game: BlackjackState) -> None:
+    active_games.set(game_key(game.code), game.dumps(), remaining_seconds(game))
+
+# Take a game out of the store to play an action on it, a concurrent request for the same game gets none
+# Games belonging to another user are put back, expired games are dropped
+def claim_game(code: str, user_id: int) -> BlackjackState | None:
+    data = active_games.pop(game_key(code))
+    if data is None:
+        return None
+    game = BlackjackState.loads(data, decks=settings.BLACKJACK_DECKS)
+    if game.user_id != user_id:
+        save_game(game)
+        return None
+    if remaining_seconds(game) <= 0:
+        return None
+    return game
+
+# Whether a user's game is in the store or being played by another request
+def is_active_game(code: str, user_id: int) -> bool:
+    active_code = active_games.get(user_key(user_id))
+    return active_code is not None and active_code.decode() == code
+
+# Remove a game once it has finished so the user can start another
+def end_game(game: BlackjackState) -> None:
+    active_games.delete(game_key(game.code))
+    if is_active_game(game.code, game.user_id):
+        active_games.delete(user_key(game.user_id))
+
+# Simulation
+# Play a batch of games with a fixed strategy, the user hits until their hand is worth at least stand_on
+# Returns outcome counts and the house edge as the average fraction of the bet the user loses per game
+def simulate_games(games: int, decks: int = 1, stand_on: int = 17, seed: Optional[int] = None) -> dict:
+    rng = random.Random(seed)
+    outcomes = {"Win": 0, "Lose": 0, "Tie": 0}
+    for _ in range(games):
+        game = BlackjackState(0, 0, 1, decks=decks, rng=rng)
+        game.deal()
+        result = game.determine_outcome()
+        while result is None:
+            action = "Hit" if game.user_hand.value < stand_on else "Stand"
+            game.play(action)
+            result = game.determine_outcome(action)
+        outcomes[result] += 1
+
+    return {
+        "games": games,
+        "decks": decks,
+        "stand_on": stand_on,
+        "wins": outcomes["Win"],
+        "losses": outcomes["Lose"],
+        "ties": outcomes["Tie"],
+        "win_rate": outcomes["Win"] / games,
+        "loss_rate": outcomes["Lose"] / games,
+        "tie_rate": outcomes["Tie"] / games,
+        "house_edge": (outcomes["Lose"] - outcomes["Win"]) / games,
+    }
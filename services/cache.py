@@ -0,0 +1,81 @@
+# Module Imports
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+# Services
+# Thread safe in-process cache, entries are evicted least recently used first once maxsize is reached,
+# and are dropped once their ttl has passed. Each entry can be given its own ttl
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Get an entry, returns default if it does not exist or has expired
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, deadline = entry
+            if deadline is not None and time.monotonic() >= deadline:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    # Set an entry, ttl overrides the cache's default ttl for this entry
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            self.delete(key)
+            return
+        deadline = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # Set an entry only if it does not exist or has expired, returns whether it was set
+    def add(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or now < entry[1]):
+                return False
+            self._data[key] = (value, now + ttl if ttl is not None else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return True
+
+    # Remove and return an entry, only one caller gets an entry that is popped by several threads at once
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None or (entry[1] is not None and time.monotonic() >= entry[1]):
+            return default
+        return entry[0]
+
+    # Remove an entry
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    # Remove all entries
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,17 +1,32 @@
 # Module Imports
-import logging
-from numpy.random import normal
 import random
-from typing import Tuple
-from datetime import datetime, timezone
+import logging
+import functools
+from typing import Optional, TYPE_CHECKING
+from datetime import datetime, timezone, timedelta
+from fastapi import HTTPException, status
 from sqlmodel import Session, select
+from sqlalchemy import delete, update, case, func
+from sqlalchemy.dialects.mysql import insert
+from config import settings
 from schemas.database import engine
-from schemas.economy import Currency, UserCurrency
+from schemas.economy import Currency, UserCurrency, UserCurrencyUpdate, Transaction, Cooldown, CurrencyExchange, ExchangeRateHistory
 from schemas.users import User
+from services.cache import TTLCache
+from services.ratelimit import cooldown_store
+
+# numpy is imported by the functions that use it so it is only loaded once rates are generated or downsampled
+if TYPE_CHECKING:
+    import numpy as np
 
 
 logger = logging.getLogger("services")
 
+@functools.cache
+def get_default_generator() -> "np.random.Generator":
+    import numpy as np
+    return np.random.default_rng()
+
 # Services
 # User Currencies
 # Populate user currencies
@@ -32,72 +47,191 @@ def populate_all_user_currencies() -> None:
         for user in db_users:
             populate_user_currencies(user)
 
-# Blackjack
-# Generate a playing card
-def generate_card() -> str:
-    suit = random.choice(["♠", "♥", "♦", "♣"])
-    value = random.choice([2, 3, 4, 5, 6, 7, 8, 9, 10, "J", "Q", "K", "A"])
-    return f"{suit}{value}"
-
-# Add cards to a hand for blackjack
-def add_cards_to_hand(hand: list, number: int) -> list:
-    for i in range(1, number + 1, 1):
-        new_card = generate_card()
-        duplicate = True
-        while duplicate == True:
-            if new_card in hand:
-                new_card = generate_card()
-                continue
-            hand.append(new_card)
-            duplicate = False
-    return hand
-
-# Calculate the value of a hand, and how many aces are in the hand
-def calculate_hand_value(hand: list) -> Tuple[int, int]:
-    # Calculate hand values
-    card_values = []
-    aces = 0
-    for card in hand:
-        if card[1:] in ["J", "Q", "K", "A"]:
-            if card[1:] == "A":
-                aces +=1 
-            card_values.append(11)
-        else:
-            card_values.append(int(card[1:]))
-    return sum(card_values), aces
-
-# Calculate the value of a hand for blackjack (aces can be either 11 or 1)
-def calculate_blackjack_hand_value(hand: list) -> int:
-    hand_value, aces = calculate_hand_value(hand)
-    while True:
-        if hand_value > 21:
-            if aces > 0:
-                aces -= 1
-                hand_value -= 10
-            else:
-                break
-        else:
-            break
-    return hand_value
+# Balances
+# Lock balances in user and currency order so concurrent transfers cannot deadlock, rows stay locked until the transaction ends
+def lock_user_balances(session: Session, user_ids: list[int], currency_ids: list[int]) -> dict[tuple[int, int], UserCurrency]:
+    query = select(UserCurrency).where(UserCurrency.user_id.in_(user_ids), UserCurrency.currency_id.in_(currency_ids))
+    query = query.order_by(UserCurrency.user_id, UserCurrency.currency_id).with_for_update().execution_options(populate_existing=True)
+    return {(balance.user_id, balance.currency_id): balance for balance in session.exec(query).all()}
+
+# Apply updates to many balances in one transaction, updates are applied in order so several updates to the same balance
+# behave as if they were sent one after another. Balances are changed with one statement and transactions with one insert
+def apply_balance_updates(session: Session, updates: list[tuple[int, UserCurrencyUpdate]]) -> tuple[int, dict[tuple[int, int], float]]:
+    balances = lock_user_balances(session, list({user_id for user_id, _ in updates}), list({update.currency_id for _, update in updates}))
+
+    # Calculate new balances and the transaction for each update
+    new_balances: dict[tuple[int, int], float] = {}
+    transactions: list[dict] = []
+    timestamp = datetime.now(timezone.utc)
+    for user_id, balance_update in updates:
+        key = (user_id, balance_update.currency_id)
+        if key not in balances:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {user_id} does not have a balance for currency {balance_update.currency_id}")
+        current = new_balances.get(key, balances[key].balance)
+        match balance_update.mode:
+            case "Add":
+                new_balances[key] = current + balance_update.amount
+            case "Subtract":
+                new_balances[key] = current - balance_update.amount
+            case "Set":
+                new_balances[key] = balance_update.amount
+        transactions.append({"user_id": user_id, "currency_id": balance_update.currency_id, "amount": new_balances[key] - current, "timestamp": timestamp, "note": balance_update.note})
+
+    # Update balances and create transactions
+    ids = {balances[key].id: balance for key, balance in new_balances.items()}
+    table = UserCurrency.__table__
+    session.execute(update(table).where(table.c.id.in_(ids)).values(balance=case(ids, value=table.c.id)))
+    session.execute(insert(Transaction.__table__).values(transactions))
+    return len(transactions), new_balances
+
+# Jobs
+# Calculate pay for a shift, accepts single values or arrays so that simulations can pay many shifts at once
+# A single shift without a generator is drawn with the random module so paying a shift does not load numpy
+def calculate_work_pay(min_pay, max_pay, value_multiplier, generator: "np.random.Generator | None" = None, size=None):
+    if generator is None and size is None:
+        return random.uniform(min_pay, max_pay) / value_multiplier
+    return (generator or get_default_generator()).uniform(min_pay, max_pay, size) / value_multiplier
+
+# Cooldowns
+# Active cooldowns keyed by (user_id, cooldown_type), held for at most ECONOMY_COOLDOWN_CACHE_SECONDS in front of the
+# cooldown store so repeated checks skip the round trip, and changes made by other workers are picked up soon after
+active_cooldowns = TTLCache(maxsize=settings.ECONOMY_COOLDOWN_CACHE_SIZE)
+
+# Get when a user's cooldown ends, returns none if the cooldown is not active
+def get_cooldown(user_id: int, cooldown_type: str) -> datetime | None:
+    now = datetime.now(timezone.utc)
+    expires = active_cooldowns.get((user_id, cooldown_type))
+    if expires and expires > now:
+        return expires
+
+    # Active cooldowns are answered by the cooldown store without touching the database
+    timestamp = cooldown_store.get(user_id, cooldown_type)
+    if timestamp:
+        expires = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        cache_cooldown_locally(user_id, cooldown_type, expires)
+        return expires
+
+    with Session(engine) as session:
+        expires = session.exec(select(Cooldown.expires).where(Cooldown.user_id == user_id, Cooldown.cooldown_type == cooldown_type)).first()
+    if expires and ensure_aware(expires) > now:
+        cache_cooldown(user_id, cooldown_type, ensure_aware(expires))
+        return ensure_aware(expires)
+    return None
+
+# Get when a user's cooldown ends from the database, locking it so concurrent requests wait for this transaction
+def lock_cooldown(session: Session, user_id: int, cooldown_type: str) -> datetime | None:
+    expires = session.exec(select(Cooldown.expires).where(Cooldown.user_id == user_id, Cooldown.cooldown_type == cooldown_type).with_for_update()).first()
+    if expires and ensure_aware(expires) > datetime.now(timezone.utc):
+        return ensure_aware(expires)
+    return None
 
+# Create or replace a user's cooldown, there is only ever one row per user and cooldown type
+def set_cooldown(session: Session, user_id: int, cooldown_type: str, expires: datetime) -> None:
+    query = insert(Cooldown.__table__).values(user_id=user_id, cooldown_type=cooldown_type, expires=expires)
+    query = query.on_duplicate_key_update(expires=query.inserted.expires)
+    session.execute(query)
+    cache_cooldown(user_id, cooldown_type, expires)
+
+# Remove a user's cooldown
+def clear_cooldown(session: Session, user_id: int, cooldown_type: str) -> None:
+    session.execute(delete(Cooldown.__table__).where(Cooldown.user_id == user_id, Cooldown.cooldown_type == cooldown_type))
+    cooldown_store.delete(user_id, cooldown_type)
+    active_cooldowns.delete((user_id, cooldown_type))
+
+# Cache a cooldown in the cooldown store and in this process
+def cache_cooldown(user_id: int, cooldown_type: str, expires: datetime) -> None:
+    cooldown_store.set(user_id, cooldown_type, expires.timestamp())
+    cache_cooldown_locally(user_id, cooldown_type, expires)
+
+# Cache a cooldown in this process for at most ECONOMY_COOLDOWN_CACHE_SECONDS
+def cache_cooldown_locally(user_id: int, cooldown_type: str, expires: datetime) -> None:
+    remaining = (expires - datetime.now(timezone.utc)).total_seconds()
+    active_cooldowns.set((user_id, cooldown_type), expires, ttl=min(remaining, settings.ECONOMY_COOLDOWN_CACHE_SECONDS))
+
+# Currency Exchanges
+# Mark an unfinished exchange as finished, returns false if it has already finished, expired or belongs to another user
+# Only one request can claim an exchange as the update is conditional on the exchange not having a result
+def claim_currency_exchange(session: Session, code: str, user_id: int, result: str) -> bool:
+    query = update(CurrencyExchange).where(CurrencyExchange.code == code,
+                                           CurrencyExchange.user_id == user_id,
+                                           CurrencyExchange.result == None,
+                                           CurrencyExchange.expires > func.utc_timestamp())
+    return session.execute(query.values(result=result).execution_options(synchronize_session=False)).rowcount > 0
 
 # Exchange Rates
-# Generate a random exchange rate using normal distribution
-def generate_exchange_rate() -> float:
-    return normal(loc=1, scale=0.04, size=None)
+# Generate exchange rates for all currencies in a single draw
+# In "normal" mode each rate is drawn independently around the currency's value multiplier
+# In "walk" mode rates follow a correlated random walk in log space that reverts towards the value multiplier
+def generate_exchange_rates(value_multipliers: "np.ndarray", previous_rates: "np.ndarray | None" = None, generator: "np.random.Generator | None" = None) -> "np.ndarray":
+    import numpy as np
+    generator = generator or get_default_generator()
+    volatility = settings.ECONOMY_EXCHANGE_RATE_VOLATILITY
 
+    if settings.ECONOMY_EXCHANGE_RATE_MODE == "walk" and previous_rates is not None:
+        correlation = settings.ECONOMY_EXCHANGE_RATE_CORRELATION
+        shocks = np.sqrt(correlation) * generator.standard_normal() + np.sqrt(1 - correlation) * generator.standard_normal(len(value_multipliers))
+        log_previous = np.log(previous_rates)
+        reversion = settings.ECONOMY_EXCHANGE_RATE_REVERSION * (np.log(value_multipliers) - log_previous)
+        return np.exp(log_previous + reversion + volatility * shocks)
 
-# Randomize exchange rates
+    return generator.normal(loc=1, scale=volatility, size=len(value_multipliers)) * value_multipliers
+
+# Randomize exchange rates, currencies are updated in one statement and the new rates are added to the rate history
 def randomize_exchange_rates() -> None:
+    import numpy as np
     with Session(engine) as session:
-        db_currencies = session.exec(select(Currency)).all()
-        for currency in db_currencies:
-            currency.exchange_rate = generate_exchange_rate() * currency.value_multiplier
-            session.add(currency)
+        db_currencies = session.exec(select(Currency.id, Currency.value_multiplier, Currency.exchange_rate)).all()
+        if not db_currencies:
+            return
+        ids = [currency.id for currency in db_currencies]
+        value_multipliers = np.array([currency.value_multiplier for currency in db_currencies], dtype=float)
+        previous_rates = np.array([currency.exchange_rate or currency.value_multiplier for currency in db_currencies], dtype=float)
+        rates = generate_exchange_rates(value_multipliers, previous_rates).tolist()
+
+        # Update currencies and record history
+        timestamp = datetime.now(timezone.utc)
+        session.execute(update(Currency).where(Currency.id.in_(ids)).values(exchange_rate=case(dict(zip(ids, rates)), value=Currency.id)))
+        session.execute(insert(ExchangeRateHistory).values([{"currency_id": id, "timestamp": timestamp, "exchange_rate": rate} for id, rate in zip(ids, rates)]))
         session.commit()
-        logger.info(f"Randomized exchange rates for {len(db_currencies)} currencies")
-            
+        logger.info(f"Randomized exchange rates for {len(ids)} currencies")
+
+# Default exchange rate history to the last day, times without a timezone are read as utc and compared as naive utc like they are stored
+def get_exchange_rate_range(start: Optional[datetime], end: Optional[datetime], max_range: Optional[timedelta] = None) -> tuple[datetime, datetime]:
+    end = ensure_utc(end) if end else datetime.now(timezone.utc)
+    start = ensure_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+    if max_range and end - start > max_range:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"start and end must be at most {max_range} apart")
+    return start.replace(tzinfo=None), end.replace(tzinfo=None)
+
+# Downsample exchange rate history into open, high, low and close values for each interval
+# Timestamps must be sorted, each bucket starts at a multiple of interval seconds
+def downsample_exchange_rates(timestamps: list[datetime], rates: list[float], interval: int) -> list[dict]:
+    if not timestamps:
+        return []
+    import numpy as np
+    seconds = np.array([ensure_aware(timestamp).timestamp() for timestamp in timestamps])
+    values = np.array(rates, dtype=float)
+    buckets = (seconds // interval).astype(np.int64)
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(values)])) - 1
+    highs = np.maximum.reduceat(values, starts)
+    lows = np.minimum.reduceat(values, starts)
+
+    return [{"timestamp": datetime.fromtimestamp(int(bucket) * interval, tz=timezone.utc),
+             "open": float(open),
+             "high": float(high),
+             "low": float(low),
+             "close": float(close)}
+            for bucket, open, high, low, close in zip(buckets[starts], values[starts], highs, lows, values[ends])]
+
 # Misc
 # Ensure a datetime object has utc information
 def ensure_aware(time: datetime) -> datetime:
-    return time.replace(tzinfo=timezone.utc)
\ No newline at end of file
+    return time.replace(tzinfo=timezone.utc)
+
+# Convert a datetime object to utc, times without a timezone are already utc
+def ensure_utc(time: datetime) -> datetime:
+    return time.replace(tzinfo=timezone.utc) if time.tzinfo is None else time.astimezone(timezone.utc)
\ No newline at end of file
@@ -1,21 +1,27 @@
 # Module Imports
 import re
-import time
+import asyncio
 import logging
 import requests
 import copy
 from io import BytesIO
-from PIL import Image
 from datetime import datetime
 from fastapi import HTTPException, status
 from sqlmodel import Session, select
+from sqlalchemy import delete, insert
+from config import settings
 from schemas.database import engine
-from schemas.games import Game, GameRating, GameTag
+from schemas.games import Game, GameRating, GameTag, GameTagLink
 from schemas.users import User
+from services.cache import TTLCache
 from services.storage import *
+from services.metrics import http_session
+from services.tracing import start_span
+from services.scheduler import run_io, run_cpu
 
 
 logger = logging.getLogger("services")
+tag_whitelist = TTLCache(maxsize=1, ttl=settings.GAME_TAG_CACHE_TTL_SECS)
 
 # Services
 # Banner Links
@@ -31,7 +37,7 @@ def get_banner_link(link: str, platform: str) -> str | None:
             # Get banner link
             url: str = f"https://thumbnails.roblox.com/v1/games/multiget/thumbnails?universeIds={universe_id}&count=1&size=768x432&format=Png"
             try:
-                response = requests.get(url=url, timeout=5)
+                response = http_session.get(url=url, timeout=5)
                 if response.status_code != 200:
                     return None
                 return response.json()["data"][0]["thumbnails"][0]["imageUrl"]
@@ -70,20 +76,18 @@ def update_banner_link(game_id: int) -> bool:
             session.commit()
             return True
 
-# Update banner links for all games
-def update_banner_links() -> None:
-    with Session(engine) as session:
-        db_games = session.exec(select(Game).order_by(Game.id.asc())).all()
-        kept: int = 0
-        updated: int = 0
-        for db_game in db_games:
-            time.sleep(1)
-            result = update_banner_link(db_game.id)
-            if result:
-                updated += 1
-            else:
-                kept += 1
-        logger.info(f"Updated banner links for {updated} games, kept for {kept} games")
+# Update banner links for all games, games are updated a second apart and the wait does not hold a thread
+async def update_banner_links() -> None:
+    kept: int = 0
+    updated: int = 0
+    for game_id in await run_io(get_all_game_ids):
+        await asyncio.sleep(1)
+        result = await run_io(update_banner_link, game_id)
+        if result:
+            updated += 1
+        else:
+            kept += 1
+    logger.info(f"Updated banner links for {updated} games, kept for {kept} games")
 
 # Last Updated
 # Get when a game was last updated
@@ -98,7 +102,7 @@ def get_last_updated(link: str, platform: str) -> str | None:
             # Get last updated
             url: str = f"https://games.roblox.com/v1/games?universeIds={universe_id}"
             try:
-                response = requests.get(url=url, timeout=5)
+                response = http_session.get(url=url, timeout=5)
                 if response.status_code != 200:
                     return None
                 try:
@@ -135,47 +139,48 @@ def update_last_updated(game_id: int) -> bool:
             session.commit()
             return True
 
-# Update last updated for all games
-def update_last_updated_all() -> None:
-    with Session(engine) as session:
-        db_games = session.exec(select(Game).order_by(Game.id.asc())).all()
-        kept: int = 0
-        updated: int = 0
-        for db_game in db_games:
-            time.sleep(1)
-            result = update_last_updated(db_game.id)
-            if result:
-                updated += 1
-            else:
-                kept += 1
-        logger.info(f"Updated last updated for {updated} games, kept for {kept} games")
+# Update last updated for all games, games are updated a second apart and the wait does not hold a thread
+async def update_last_updated_all() -> None:
+    kept: int = 0
+    updated: int = 0
+    for game_id in await run_io(get_all_game_ids):
+        await asyncio.sleep(1)
+        result = await run_io(update_last_updated, game_id)
+        if result:
+            updated += 1
+        else:
+            kept += 1
+    logger.info(f"Updated last updated for {updated} games, kept for {kept} games")
 
 # Banner Images
 # Generate a banner image from a banner link
 def generate_banner_image(banner_link: str) -> BytesIO | None:
+    # PIL is only loaded once an image is processed
+    from PIL import Image
     try:
         # Get image from image link
-        response: requests.Response = requests.get(banner_link, timeout=5)
-        img: Image = Image.open(BytesIO(response.content))
-
-        # Resize and crop image
-        width, height = img.size
-        scale_factor = max(768 / width, 432 / height)
-        new_width = int(width * scale_factor)
-        new_height = int(height * scale_factor)
-        img = img.resize((new_width, new_height))
-
-        left = (new_width - 768) // 2
-        top = (new_height - 432) // 2
-        right = (new_width + 768) // 2
-        bottom = (new_height + 432) // 2
-        img = img.crop((left, top, right, bottom))
-
-        # Return contentfile
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-        return buffer
+        response: requests.Response = http_session.get(banner_link, timeout=5)
+        with start_span("process banner image", image_bytes=len(response.content)):
+            img: Image = Image.open(BytesIO(response.content))
+
+            # Resize and crop image
+            width, height = img.size
+            scale_factor = max(768 / width, 432 / height)
+            new_width = int(width * scale_factor)
+            new_height = int(height * scale_factor)
+            img = img.resize((new_width, new_height))
+
+            left = (new_width - 768) // 2
+            top = (new_height - 432) // 2
+            right = (new_width + 768) // 2
+            bottom = (new_height + 432) // 2
+            img = img.crop((left, top, right, bottom))
+
+            # Return contentfile
+            buffer = BytesIO()
+            img.save(buffer, format="PNG")
+            buffer.seek(0)
+            return buffer
     except Exception:
         return None
 
@@ -197,14 +202,13 @@ def update_banner_image(game_id: int) -> None:
         else:
             logger.warning(f"Error updating banner image for {db_game.name}")
 
-# Update banner image for all games
-def update_banner_images() -> None:
-    with Session(engine) as session:
-        db_games = session.exec(select(Game).order_by(Game.id.asc())).all()
-        for db_game in db_games:
-            time.sleep(1)
-            update_banner_image(db_game.id)
-        logger.info(f"Updated banner image for {len(db_games)} games")
+# Update banner image for all games, resizing and encoding images runs in the cpu pool
+async def update_banner_images() -> None:
+    game_ids = await run_io(get_all_game_ids)
+    for game_id in game_ids:
+        await asyncio.sleep(1)
+        await run_cpu(update_banner_image, game_id)
+    logger.info(f"Updated banner image for {len(game_ids)} games")
 
 # Ratings
 # Fill in ratings for each user for a game if they do not exist
@@ -347,7 +351,7 @@ def get_roblox_universe_id(link: str) -> str | None:
     # Get universe id
     url: str = f"https://apis.roblox.com/universes/v1/places/{place_id}/universe"
     try:
-        response = requests.get(url=url, timeout=5)
+        response = http_session.get(url=url, timeout=5)
         if response.status_code != 200:
             return None
         return response.json()["universeId"]
@@ -356,11 +360,16 @@ def get_roblox_universe_id(link: str) -> str | None:
         return None
 
 # Games maintanence tasks that run hourly
-def three_hourly_maintanence() -> None:
-    update_banner_links()
-    update_banner_images()
-    update_average_ratings()
-    update_popularity_scores()
+async def three_hourly_maintanence() -> None:
+    await update_banner_links()
+    await update_banner_images()
+    await run_io(update_average_ratings)
+    await run_io(update_popularity_scores)
+
+# Get the ids of all games, for jobs that update games one at a time
+def get_all_game_ids() -> list[int]:
+    with Session(engine) as session:
+        return list(session.exec(select(Game.id).order_by(Game.id.asc())).all())
 
 # Check if a game already exists
 def check_game_exists(name: str, platform: str, link: str) -> None:
@@ -387,17 +396,32 @@ def check_game_exists(name: str, platform: str, link: str) -> None:
                 }]
             )
 
+# Get tag ids keyed by name, the whitelist rarely changes so it is cached
+def get_tag_whitelist() -> dict[str, int]:
+    whitelist = tag_whitelist.get("tags")
+    if whitelist is None:
+        with Session(engine) as session:
+            whitelist = {name: id for id, name in session.exec(select(GameTag.id, GameTag.name)).all()}
+        tag_whitelist.set("tags", whitelist)
+    return whitelist
+
 # Check that all game tags are part of the tags whitelist
-def validate_tags(tags: list[GameTag]) -> None:
-    with Session(engine) as session:
-        for tag in tags:
-            db_tag = session.exec(select(GameTag).where(GameTag.name == tag)).first()
-            if not db_tag:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=[{
-                        "loc": ["body", "tags"],
-                        "msg": f"Tag '{tag}' is not in the tag whitelist",
-                        "type": "value_error",
-                    }]
-                )
+def validate_tags(tags: list[str]) -> None:
+    whitelist = get_tag_whitelist()
+    for tag in tags:
+        if tag not in whitelist:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=[{
+                    "loc": ["body", "tags"],
+                    "msg": f"Tag '{tag}' is not in the tag whitelist",
+                    "type": "value_error",
+                }]
+            )
+
+# Replace the tag links for a game with its current tags, tags must already be validated
+def set_game_tag_links(session: Session, game: Game) -> None:
+    whitelist = get_tag_whitelist()
+    session.execute(delete(GameTagLink).where(GameTagLink.game_id == game.id))
+    if game.tags:
+        session.execute(insert(GameTagLink).values([{"game_id": game.id, "tag_id": whitelist[tag]} for tag in set(game.tags)]))
@@ -0,0 +1,61 @@
+# Module Imports
+import hashlib
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Any, Optional
+from fastapi import HTTPException, status, Header
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import Session, SQLModel, select
+from sqlalchemy import update
+from sqlalchemy.dialects.mysql import insert
+from config import settings
+from schemas.economy import IdempotencyKey
+
+
+logger = logging.getLogger("services")
+
+# Services
+# Dependencies
+# Read the Idempotency-Key header, clients send the same key when retrying a request
+def get_idempotency_key(idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", min_length=1, max_length=64)) -> Optional[str]:
+    return idempotency_key
+
+# Keys
+# Fingerprint of a request so that a key reused for a different request is rejected
+def get_request_fingerprint(endpoint: str, body: Optional[SQLModel] = None) -> str:
+    payload = endpoint + (body.model_dump_json() if body is not None else "")
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+# Reserve a key inside the request's transaction, returns the stored response if the request has already been handled
+# The reservation is released if the transaction rolls back, so failed requests can be retried
+# A concurrent request with the same key blocks on the insert until the first request commits or rolls back
+def reserve_idempotency_key(session: Session, user_id: int, key: Optional[str], fingerprint: str) -> Optional[IdempotencyKey]:
+    if not key:
+        return None
+    now = datetime.now(timezone.utc)
+    expires = now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+    query = insert(IdempotencyKey.__table__).prefix_with("IGNORE").values(user_id=user_id, key=key, fingerprint=fingerprint, expires=expires)
+    if session.execute(query).rowcount:
+        return None
+
+    # Key already exists
+    db_idempotency_key = session.exec(select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key).with_for_update().execution_options(populate_existing=True)).first()
+
+    # Expired keys that have not been swept yet are reused
+    if db_idempotency_key.expires.replace(tzinfo=timezone.utc) <= now:
+        session.execute(update(IdempotencyKey).where(IdempotencyKey.id == db_idempotency_key.id).values(fingerprint=fingerprint, response=None, expires=expires))
+        return None
+
+    if db_idempotency_key.fingerprint != fingerprint:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="This idempotency key has already been used for a different request")
+    if db_idempotency_key.response is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A request with this idempotency key is still being processed")
+    logger.debug(f"Replaying response for idempotency key {key} of user {user_id}")
+    return db_idempotency_key
+
+# Store the response for a reserved key, must be called before the request's transaction commits
+def save_idempotent_response(session: Session, user_id: int, key: Optional[str], response: Any) -> Any:
+    if key:
+        session.execute(update(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key).values(response=jsonable_encoder(response)))
+    return response
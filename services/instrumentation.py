@@ -0,0 +1,140 @@
+# Module Imports
+import time
+import logging
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import settings
+
+
+logger = logging.getLogger("services")
+
+# Metrics
+REQUESTS = Counter("http_requests_total", "Number of requests responded to", ["method", "route", "status"])
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time taken to respond to requests", ["method", "route"])
+REQUEST_DB_DURATION = Histogram("http_request_db_duration_seconds", "Time spent running sql statements per request", ["method", "route"])
+REQUEST_DB_STATEMENTS = Histogram("http_request_db_statements", "Number of sql statements run per request", ["method", "route"],
+                                  buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144))
+REQUEST_DB_SESSIONS = Histogram("http_request_db_sessions", "Number of database sessions used per request", ["method", "route"],
+                                buckets=(0, 1, 2, 3, 4, 6, 8, 12))
+SLOW_STATEMENTS = Counter("db_slow_statements_total", "Number of sql statements slower than the slow query threshold", ["route"])
+
+# Stats
+# Database usage of a single request, statements run in the threadpool share it through the context of the request
+class RequestStats:
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.method: str = scope["method"]
+        self.status = 500
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.sessions: set[int] = set()
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    # The route is matched before the endpoint runs any statements, the router adds it to the scope shared with middleware
+    @property
+    def route(self) -> str:
+        return get_route(self.scope)
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+# Services
+# Database Events
+# Statement start times are kept on the connection, statements on one connection never overlap
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+        if elapsed > stats.slowest_time:
+            stats.slowest_time = elapsed
+            stats.slowest_statement = statement
+
+    # Log slow statements, including ones run by scheduled jobs outside of requests
+    if elapsed * 1000 >= settings.INSTRUMENTATION_SLOW_QUERY_MS:
+        route = stats.route if stats else "background"
+        SLOW_STATEMENTS.labels(route).inc()
+        logger.warning(f"Slow query took {elapsed * 1000:.1f}ms in {route}: {' '.join(statement.split())[:500]}")
+
+# Failed statements never reach after_cursor_execute, so their start time is removed here
+@event.listens_for(Engine, "handle_error")
+def handle_error(exception_context):
+    started = exception_context.connection.info.get("statement_started") if exception_context.connection is not None else None
+    if started:
+        started.pop()
+
+# Sessions are counted when they first use a connection, sessions that are opened but never query are not counted
+@event.listens_for(Session, "after_begin")
+def after_begin(session, transaction, connection):
+    stats = request_stats.get()
+    if stats is not None:
+        stats.sessions.add(id(session))
+
+# Middleware
+# Records the database usage of each request, adds it to the metrics and returns it in a Server-Timing header
+class InstrumentationMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.INSTRUMENTATION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = request_stats.set(stats)
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                stats.status = message["status"]
+                if settings.INSTRUMENTATION_SERVER_TIMING:
+                    message.setdefault("headers", []).append((b"server-timing", get_server_timing(stats).encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats.reset(token)
+            record_request(stats)
+
+# Routes are labelled by their full template, e.g. /api/games/{id}, so ids do not each get their own metrics
+# The route only holds the path below the app or mount it was matched in, which is kept in root_path,
+# and requests handled by a mounted app such as /static are labelled by the mount
+def get_route(scope: Scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path_format", None)
+    if path is not None:
+        return scope.get("root_path", "") + path
+    if scope.get("app_root_path") is not None and scope.get("root_path"):
+        return scope["root_path"] + "/{path}"
+    return "unmatched"
+
+def get_server_timing(stats: RequestStats) -> str:
+    return (f'db;dur={stats.db_time * 1000:.1f};desc="{stats.statements} statements, {len(stats.sessions)} sessions", '
+            f'db-slowest;dur={stats.slowest_time * 1000:.1f}, '
+            f'app;dur={(time.perf_counter() - stats.started) * 1000:.1f}')
+
+def record_request(stats: RequestStats) -> None:
+    route = stats.route
+    duration = time.perf_counter() - stats.started
+    REQUESTS.labels(stats.method, route, str(stats.status)).inc()
+    REQUEST_DURATION.labels(stats.method, route).observe(duration)
+    REQUEST_DB_DURATION.labels(stats.method, route).observe(stats.db_time)
+    REQUEST_DB_STATEMENTS.labels(stats.method, route).observe(stats.statements)
+    REQUEST_DB_SESSIONS.labels(stats.method, route).observe(len(stats.sessions))
+    if stats.statements:
+        logger.debug(f"{stats.method} {route} ran {stats.statements} statements in {len(stats.sessions)} sessions taking {stats.db_time * 1000:.1f}ms of {duration * 1000:.1f}ms, "
+                     f"slowest {stats.slowest_time * 1000:.1f}ms: {' '.join((stats.slowest_statement or '').split())[:200]}")
@@ -0,0 +1,144 @@
+# Module Imports
+import logging
+import functools
+import threading
+from typing import Callable, Optional
+from sqlalchemy import Engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from config import settings
+from schemas.database import engine
+from services.scheduler import run_io
+
+
+logger = logging.getLogger("services")
+
+# Services
+# Locks
+# MySQL named lock held by a dedicated connection. The server releases it as soon as that connection closes,
+# so when the leader's process exits or loses its connection another replica takes over on its next check
+class MySQLLeaderLock:
+    def __init__(self, engine: Engine, name: str):
+        self.engine = engine
+        self.name = name
+        self.connection: Optional[Connection] = None
+
+    def acquire(self) -> bool:
+        try:
+            if self.connection is None:
+                self.connection = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            if self.connection.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": self.name}).scalar() == 1:
+                return True
+            # Another replica holds the lock, this connection holds nothing and can go back to the pool
+            self.close()
+            return False
+        except DBAPIError:
+            logger.exception("Failed to acquire leader lock")
+        self.invalidate()
+        return False
+
+    # Checking the lock also keeps the connection from being closed for being idle
+    def is_held(self) -> bool:
+        if self.connection is None:
+            return False
+        try:
+            if self.connection.execute(text("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"), {"name": self.name}).scalar() == 1:
+                return True
+        except DBAPIError:
+            logger.exception("Failed to check leader lock")
+        self.invalidate()
+        return False
+
+    def release(self) -> None:
+        if self.connection is not None:
+            try:
+                self.connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": self.name})
+            except DBAPIError:
+                self.invalidate()
+        self.close()
+
+    def close(self) -> None:
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except DBAPIError:
+                pass
+            self.connection = None
+
+    # Discard the connection instead of returning it to the pool, closing it on the server drops any lock it may still hold
+    # so a failed check can never leave the lock with a pooled connection that other requests then use
+    def invalidate(self) -> None:
+        if self.connection is not None:
+            try:
+                self.connection.invalidate()
+            except DBAPIError:
+                pass
+        self.close()
+
+
+# Lock shared by every LocalLeaderLock in this process, for tests and for running a single process without mysql
+class LocalLeaderLock:
+    holders: dict[str, "LocalLeaderLock"] = {}
+    holders_lock = threading.Lock()
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def acquire(self) -> bool:
+        with self.holders_lock:
+            return self.holders.setdefault(self.name, self) is self
+
+    def is_held(self) -> bool:
+        return self.holders.get(self.name) is self
+
+    def release(self) -> None:
+        with self.holders_lock:
+            if self.holders.get(self.name) is self:
+                del self.holders[self.name]
+
+
+# Lock names are global to the mysql server, so the default includes the database name
+def get_leader_lock() -> MySQLLeaderLock | LocalLeaderLock:
+    name = settings.LEADER_ELECTION_LOCK_NAME or f"{settings.DB_DATABASE}.scheduler"
+    if settings.LEADER_ELECTION_BACKEND == "local":
+        return LocalLeaderLock(name)
+    return MySQLLeaderLock(engine, name)
+
+# Election
+# Every replica runs the scheduler and checks the lock every LEADER_ELECTION_INTERVAL_SECS, only the holder runs jobs
+class LeaderElector:
+    def __init__(self, lock: MySQLLeaderLock | LocalLeaderLock):
+        self.lock = lock
+        self.is_leader = False
+
+    # Keep the lock if it is still held, otherwise try to take it
+    def check(self) -> bool:
+        was_leader = self.is_leader
+        self.is_leader = self.lock.is_held() if was_leader else self.lock.acquire()
+        if self.is_leader and not was_leader:
+            logger.info(f"Became leader for scheduled jobs using lock {self.lock.name}")
+        elif was_leader and not self.is_leader:
+            logger.warning(f"Lost leader lock {self.lock.name}, scheduled jobs will run on another replica")
+        return self.is_leader
+
+    async def check_async(self) -> bool:
+        return await run_io(self.check)
+
+    def release(self) -> None:
+        if self.is_leader:
+            self.lock.release()
+            self.is_leader = False
+            logger.info(f"Released leader lock {self.lock.name}")
+
+
+leader_elector = LeaderElector(get_leader_lock())
+
+# Only run a scheduled coroutine job on the leader, runs on other replicas are skipped
+def leader_only(job: Callable, elector: LeaderElector = leader_elector) -> Callable:
+    @functools.wraps(job)
+    async def wrapper(*args, **kwargs):
+        if not elector.is_leader:
+            logger.debug(f"Skipping {job.__name__} as this replica is not the leader")
+            return None
+        return await job(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,47 @@
+# Module Imports
+import typing
+import logging
+import functools
+from typing import Any, Literal, Optional
+from pydantic import BaseModel
+from sqlmodel import SQLModel
+from sqlalchemy import Select, inspect
+from sqlalchemy.orm import selectinload, joinedload
+
+
+logger = logging.getLogger("services")
+
+# selectin loads each relationship for a whole page in one extra query and is used for lists
+# joined loads relationships in the same query and is used when a single row is returned
+LOADERS = {"selectin": selectinload, "joined": joinedload}
+
+# Services
+# Find the model in a field annotated with a model, an optional model or a list of models
+def get_nested_model(annotation: Any) -> Optional[type[BaseModel]]:
+    if typing.get_origin(annotation) is None and isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for argument in typing.get_args(annotation):
+        nested_model = get_nested_model(argument)
+        if nested_model:
+            return nested_model
+    return None
+
+# Loader options for every relationship needed to build a public model, found from its fields that are models themselves
+# e.g. UserCurrencyPublic needs UserCurrency.user and UserCurrency.currency, nested models get nested options
+@functools.cache
+def get_loader_options(model: type[SQLModel], public_model: type[BaseModel], strategy: Literal["selectin", "joined"] = "selectin") -> tuple:
+    relationships = inspect(model).relationships
+    options = []
+    for name, field in public_model.model_fields.items():
+        nested_model = get_nested_model(field.annotation)
+        if nested_model is None or name not in relationships:
+            continue
+        loader = LOADERS[strategy](getattr(model, name))
+        nested_options = get_loader_options(relationships[name].mapper.class_, nested_model, strategy)
+        options.append(loader.options(*nested_options) if nested_options else loader)
+    return tuple(options)
+
+# Load the relationships a public model needs along with the rows of a query, instead of lazy loading them once per row
+def eager_load(query: Select, public_model: type[BaseModel], strategy: Literal["selectin", "joined"] = "selectin") -> Select:
+    model = query.column_descriptions[0]["entity"]
+    return query.options(*get_loader_options(model, public_model, strategy))
@@ -0,0 +1,121 @@
+# Module Imports
+import time
+import inspect
+import logging
+import functools
+import requests
+from typing import Callable
+from urllib.parse import urlsplit
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from apscheduler.events import JobExecutionEvent, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+from schemas.database import engine
+from services.tracing import start_span
+
+
+logger = logging.getLogger("services")
+
+# Metrics
+JOB_DURATION = Histogram("scheduler_job_duration_seconds", "Time taken to run scheduled jobs", ["job"],
+                         buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+JOB_FAILURES = Counter("scheduler_job_failures_total", "Number of scheduled job runs that raised an exception", ["job"])
+JOB_SKIPPED = Counter("scheduler_job_skipped_total", "Number of scheduled job runs that were missed or skipped because the job was still running", ["job", "reason"])
+OUTBOUND_DURATION = Histogram("outbound_request_duration_seconds", "Time taken by requests to other services", ["host", "status"])
+OUTBOUND_ERRORS = Counter("outbound_request_errors_total", "Number of requests to other services that failed without a response", ["host"])
+SWEEPER_ROWS_DELETED = Counter("sweeper_rows_deleted_total", "Number of expired rows deleted by the sweeper", ["table"])
+SWEEPER_DURATION = Histogram("sweeper_duration_seconds", "Time taken to sweep expired rows from a table", ["table"],
+                             buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+SWEEPER_FAILURES = Counter("sweeper_failures_total", "Number of sweeps of a table that raised an exception", ["table"])
+
+# Services
+# Database Pool
+# Connection pool stats are read when metrics are collected rather than tracked on every checkout
+class PoolCollector:
+    def collect(self):
+        pool = engine.pool
+        for name, description, value in [
+            ("db_pool_size", "Number of connections the pool keeps open", pool.size()),
+            ("db_pool_checked_out", "Number of connections in use", pool.checkedout()),
+            ("db_pool_checked_in", "Number of idle connections in the pool", pool.checkedin()),
+            ("db_pool_overflow", "Number of connections open above the pool size", max(pool.overflow(), 0)),
+        ]:
+            yield GaugeMetricFamily(name, description, value=value)
+
+
+REGISTRY.register(PoolCollector())
+
+# Scheduler
+# Time and trace a scheduled job and count its failures, jobs are labelled by the name of the function
+def timed_job(job: Callable) -> Callable:
+    if inspect.iscoroutinefunction(job):
+        @functools.wraps(job)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with start_span(f"job {job.__name__}"):
+                    return await job(*args, **kwargs)
+            except Exception:
+                JOB_FAILURES.labels(job.__name__).inc()
+                raise
+            finally:
+                JOB_DURATION.labels(job.__name__).observe(time.perf_counter() - started)
+        return async_wrapper
+
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with start_span(f"job {job.__name__}"):
+                return job(*args, **kwargs)
+        except Exception:
+            JOB_FAILURES.labels(job.__name__).inc()
+            raise
+        finally:
+            JOB_DURATION.labels(job.__name__).observe(time.perf_counter() - started)
+    return wrapper
+
+# Scheduler listener for runs that never started, a job that keeps hitting max instances is taking longer than its interval
+def record_skipped_job(event: JobExecutionEvent) -> None:
+    reason = "missed" if event.code == EVENT_JOB_MISSED else "max_instances"
+    JOB_SKIPPED.labels(event.job_id, reason).inc()
+    logger.warning(f"Scheduled job {event.job_id} was skipped ({reason})")
+
+SKIPPED_JOB_EVENTS = EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+
+# Outbound Requests
+# Shared session for requests to Discord, Roblox, Pterodactyl, Dockerlink and image hosts
+# Connections are reused between requests to the same host and every request is timed by host
+class InstrumentedSession(requests.Session):
+    def request(self, method, url, *args, **kwargs):
+        host = urlsplit(url).hostname or "unknown"
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            OUTBOUND_ERRORS.labels(host).inc()
+            raise
+        OUTBOUND_DURATION.labels(host, str(response.status_code)).observe(time.perf_counter() - started)
+        return response
+
+
+http_session = InstrumentedSession()
+
+# Time calls made by a boto3 client, the start time is kept in the context botocore passes between events of a call
+def instrument_boto3_client(client) -> None:
+    host = urlsplit(client.meta.endpoint_url).hostname or "unknown"
+
+    def before_call(context, **kwargs):
+        context["metrics_started"] = time.perf_counter()
+
+    def after_call(context, http_response, **kwargs):
+        started = context.pop("metrics_started", None)
+        if started is not None:
+            OUTBOUND_DURATION.labels(host, str(http_response.status_code)).observe(time.perf_counter() - started)
+
+    def after_call_error(context, **kwargs):
+        if context.pop("metrics_started", None) is not None:
+            OUTBOUND_ERRORS.labels(host).inc()
+
+    client.meta.events.register("before-call.*.*", before_call)
+    client.meta.events.register("after-call.*.*", after_call)
+    client.meta.events.register("after-call-error.*.*", after_call_error)
@@ -0,0 +1,83 @@
+# Module Imports
+import json
+import base64
+import logging
+from datetime import datetime
+from typing import Generic, Literal, Optional, TypeVar
+from fastapi import HTTPException, status, Query
+from pydantic import BaseModel
+from sqlmodel import Session
+from sqlalchemy import Select, DateTime, TypeDecorator, func, select, tuple_
+
+
+logger = logging.getLogger("services")
+T = TypeVar("T")
+
+# Schemas
+# Page of results for keyset pagination, pass next_cursor back as cursor to get the following page
+class CursorPage(BaseModel, Generic[T]):
+    items: list[T]
+    size: int
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+# Query parameters for keyset pagination, the total is only counted when asked for as it is the slowest part of a page
+class CursorParams(BaseModel):
+    cursor: Optional[str] = None
+    size: int = 50
+    order: Optional[Literal["asc", "desc"]] = None
+    include_total: bool = False
+
+
+def get_cursor_params(cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+                      size: int = Query(50, ge=1, le=1000),
+                      order: Optional[Literal["asc", "desc"]] = Query(None),
+                      include_total: bool = Query(False, description="Count all matching rows")) -> CursorParams:
+    return CursorParams(cursor=cursor, size=size, order=order, include_total=include_total)
+
+# Services
+# Cursors
+# Cursors are the key columns of the last row on a page and the sort order, encoded so that clients treat them as opaque
+def encode_cursor(values: list, order: str) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps([order, payload], separators=(",", ":")).encode()).decode().rstrip("=")
+
+# Datetime columns may be wrapped in a type decorator, values for them are parsed back into datetimes
+def is_datetime_column(column) -> bool:
+    column_type = column.type.impl if isinstance(column.type, TypeDecorator) else column.type
+    return isinstance(column_type, DateTime) or isinstance(column_type, type) and issubclass(column_type, DateTime)
+
+def decode_cursor(cursor: str, columns: list) -> tuple[str, list]:
+    try:
+        order, payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if order not in ("asc", "desc") or len(payload) != len(columns):
+            raise ValueError
+        values = [datetime.fromisoformat(value) if is_datetime_column(column) else value for column, value in zip(columns, payload)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return order, values
+
+# Pagination
+# Paginate a query by its key columns, e.g. (Transaction.timestamp, Transaction.id), the last column must be unique
+# Each page seeks straight to the rows after the cursor using an index on the key columns instead of skipping an offset
+def paginate_cursor(session: Session, query: Select, columns: list, params: CursorParams, default_order: Literal["asc", "desc"] = "asc") -> CursorPage:
+    order = params.order or default_order
+    total = session.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar_one() if params.include_total else None
+
+    # Continue from the cursor, a cursor keeps the order it was created with
+    if params.cursor:
+        order, values = decode_cursor(params.cursor, columns)
+        keys = tuple_(*columns) if len(columns) > 1 else columns[0]
+        cursor_values = tuple_(*values) if len(columns) > 1 else values[0]
+        query = query.where(keys < cursor_values if order == "desc" else keys > cursor_values)
+
+    # Get one row more than the page size to know whether there is a next page
+    query = query.order_by(None).order_by(*[column.desc() if order == "desc" else column.asc() for column in columns]).limit(params.size + 1)
+    items = session.exec(query).all()
+    next_cursor = None
+    if len(items) > params.size:
+        items = items[:params.size]
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns], order)
+
+    return CursorPage(items=items, size=params.size, next_cursor=next_cursor, total=total)
@@ -0,0 +1,66 @@
+# Module Imports
+import math
+import time
+import logging
+from limits import parse, RateLimitItem
+from limits.storage import Storage, storage_from_string
+from limits.strategies import MovingWindowRateLimiter
+from config import settings
+
+
+logger = logging.getLogger("services")
+
+# Setup storage, "memory://" keeps state in this process only, "redis://host:port" shares it between workers
+storage = storage_from_string(settings.RATE_LIMIT_STORAGE_URI)
+storage_is_shared = not settings.RATE_LIMIT_STORAGE_URI.startswith("memory://")
+limiter = MovingWindowRateLimiter(storage)
+
+# Services
+# Rate Limits
+# Parse a rate limit string such as "5/10seconds", results are reused for each request
+parsed_limits: dict[str, RateLimitItem] = {}
+
+def get_rate_limit(limit: str) -> RateLimitItem:
+    if limit not in parsed_limits:
+        parsed_limits[limit] = parse(limit)
+    return parsed_limits[limit]
+
+# Register a hit for an identity, returns the number of seconds until another hit is allowed if the limit was exceeded
+def hit_rate_limit(limit: str, scope: str, identity: str) -> int | None:
+    item = get_rate_limit(limit)
+    if limiter.hit(item, scope, identity):
+        return None
+    reset_time = limiter.get_window_stats(item, scope, identity).reset_time
+    return max(1, math.ceil(reset_time - time.time()))
+
+# Cooldowns
+# Stores when cooldowns end using the same backend as rate limits, a key exists only while its cooldown is active
+# The storage can be passed in, so tests can use a local fake in place of a shared server
+class CooldownStore:
+    def __init__(self, prefix: str = "cooldown", backend: Storage | None = None):
+        self.prefix = prefix
+        self.storage = backend or storage
+
+    def key(self, user_id: int, cooldown_type: str) -> str:
+        return f"{self.prefix}/{cooldown_type}/{user_id}"
+
+    # Get the unix time a cooldown ends, or none if it is not active
+    def get(self, user_id: int, cooldown_type: str) -> float | None:
+        key = self.key(user_id, cooldown_type)
+        if self.storage.get(key) > 0:
+            return self.storage.get_expiry(key)
+        return None
+
+    # Set a cooldown to end at a given unix time
+    def set(self, user_id: int, cooldown_type: str, expires: float) -> None:
+        key = self.key(user_id, cooldown_type)
+        remaining = math.ceil(expires - time.time())
+        self.storage.clear(key)
+        if remaining > 0:
+            self.storage.incr(key, remaining)
+
+    # Remove a cooldown
+    def delete(self, user_id: int, cooldown_type: str) -> None:
+        self.storage.clear(self.key(user_id, cooldown_type))
+
+cooldown_store = CooldownStore()
@@ -0,0 +1,80 @@
+# Module Imports
+import hashlib
+import inspect
+import logging
+import functools
+from typing import Any, Callable
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from config import settings
+from services.cache import TTLCache
+from services.ratelimit import storage
+
+
+logger = logging.getLogger("services")
+
+# Cached response bodies keyed by namespace generation, route, query parameters and permission scope
+# Invalidating a namespace moves it to a new generation so its old entries are never read again and simply expire
+responses = TTLCache(maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL_SECS)
+GENERATION_EXPIRY = 86400
+
+# Services
+# Generations
+# Generations are kept in the rate limit storage, so with a shared backend a write in one worker invalidates every worker
+# gunicorn.conf.py refuses to start several workers on memory storage, where a write would only invalidate its own worker
+def get_generation(namespace: str) -> int:
+    return storage.get(f"response_cache/{namespace}")
+
+# Invalidate every cached response in the given namespaces
+def invalidate_responses(*namespaces: str) -> None:
+    for namespace in namespaces:
+        storage.incr(f"response_cache/{namespace}", GENERATION_EXPIRY)
+
+# Run a scheduled job and invalidate namespaces once it has finished
+def invalidate_after(job: Callable, *namespaces: str) -> Callable:
+    if inspect.iscoroutinefunction(job):
+        @functools.wraps(job)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await job(*args, **kwargs)
+            finally:
+                invalidate_responses(*namespaces)
+        return async_wrapper
+
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        try:
+            return job(*args, **kwargs)
+        finally:
+            invalidate_responses(*namespaces)
+    return wrapper
+
+# Responses
+@functools.cache
+def get_type_adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+# Return a cached response, running load to build it only when it is not cached
+# Responses carry a strong ETag, a request whose If-None-Match matches gets a 304 without the response being built
+# load may also return already serialized json bytes, which are used as the body without validating them against response_type
+def cached_response(request: Request, namespace: str, scope: str, response_type: Any, load: Callable[[], Any]) -> Response:
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    key = (namespace, get_generation(namespace), request.url.path, query, scope)
+    headers = {"Cache-Control": "private, no-cache"}
+
+    cached = responses.get(key)
+    if cached is None:
+        result = load()
+        if isinstance(result, bytes):
+            body = result
+        else:
+            adapter = get_type_adapter(response_type)
+            body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+        cached = (f'"{hashlib.sha256(body).hexdigest()[:32]}"', body)
+        responses.set(key, cached)
+
+    etag, body = cached
+    headers["ETag"] = etag
+    if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
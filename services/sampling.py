@@ -0,0 +1,35 @@
+# Module Imports
+import random
+import logging
+from typing import Hashable
+from sqlmodel import Session
+from sqlalchemy import Select
+from config import settings
+from services.cache import TTLCache
+
+
+logger = logging.getLogger("services")
+
+# Ids matching a query, keyed by the table and the filters used. Lists are rebuilt when they expire or are cleared
+id_lists = TTLCache(maxsize=settings.RANDOM_ID_CACHE_SIZE, ttl=settings.RANDOM_ID_CACHE_TTL_SECS)
+
+# Services
+# Get the ids matching a query that selects a single id column, the query only runs when the list is not cached
+def get_cached_ids(session: Session, key: Hashable, query: Select) -> list[int]:
+    ids = id_lists.get(key)
+    if ids is None:
+        ids = list(session.exec(query).all())
+        id_lists.set(key, ids)
+    return ids
+
+# Pick up to count ids at random without repeats, this only depends on count and not on the number of ids
+def sample_ids(ids: list[int], count: int) -> list[int]:
+    return random.sample(ids, min(count, len(ids)))
+
+# Pick a single id at random, returns none if there are no ids
+def choose_id(ids: list[int]) -> int | None:
+    return random.choice(ids) if ids else None
+
+# Remove cached id lists, used when rows are added or removed so they are picked straight away
+def clear_cached_ids() -> None:
+    id_lists.clear()
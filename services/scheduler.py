@@ -0,0 +1,53 @@
+# Module Imports
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from config import settings
+
+
+logger = logging.getLogger("services")
+
+# Executors
+# Scheduled jobs run on the event loop and hand blocking work to these pools, so waits between steps never hold a thread
+# and jobs never take threads from request handling. Image processing and numpy work get their own smaller pool
+# so a slow batch cannot hold up database and http work. Both are thread pools as jobs share the engine and caches
+io_executor = ThreadPoolExecutor(max_workers=settings.SCHEDULER_IO_THREADS, thread_name_prefix="jobs-io")
+cpu_executor = ThreadPoolExecutor(max_workers=settings.SCHEDULER_CPU_THREADS, thread_name_prefix="jobs-cpu")
+
+# Task Scheduler
+# A job only runs once at a time, runs missed while it was still running are merged into a single run
+scheduler = AsyncIOScheduler(job_defaults={
+    "coalesce": True,
+    "max_instances": 1,
+    "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_SECS,
+})
+
+# Services
+# Run a blocking function in a pool, the context is copied so tracing spans carry over to the thread
+async def run_in_executor(executor: Executor, function: Callable, *args, **kwargs) -> Any:
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(context.run, function, *args, **kwargs))
+
+async def run_io(function: Callable, *args, **kwargs) -> Any:
+    return await run_in_executor(io_executor, function, *args, **kwargs)
+
+async def run_cpu(function: Callable, *args, **kwargs) -> Any:
+    return await run_in_executor(cpu_executor, function, *args, **kwargs)
+
+# Schedule a blocking job as a coroutine that runs it in a pool, defaults to the io pool
+def blocking_job(job: Callable, executor: Executor = io_executor) -> Callable:
+    @functools.wraps(job)
+    async def wrapper(*args, **kwargs):
+        return await run_in_executor(executor, job, *args, **kwargs)
+    return wrapper
+
+# Stop scheduling jobs and drop queued work, jobs already running in a pool are left to finish
+def shutdown_scheduler() -> None:
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    io_executor.shutdown(wait=False, cancel_futures=True)
+    cpu_executor.shutdown(wait=False, cancel_futures=True)
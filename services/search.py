@@ -0,0 +1,139 @@
+# Module Imports
+import re
+import time
+import heapq
+import bisect
+import logging
+import threading
+import unicodedata
+from typing import Optional
+from sqlmodel import Session, select
+from config import settings
+from schemas.database import engine
+from schemas.games import Game, GameSearchResult
+
+
+logger = logging.getLogger("services")
+
+# Scores for how well a search term matches a word, typo matches are scaled by their trigram similarity
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+TYPO_SCORE = 0.6
+TYPO_MIN_SIMILARITY = 0.3
+POPULARITY_WEIGHT = 0.2
+
+# Services
+# Text
+# Lowercase, remove accents and split text into words
+def tokenize(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return re.findall(r"[a-z0-9]+", text)
+
+# Trigrams of a word padded with spaces so that the start and end of the word count for more
+def trigrams(word: str) -> set[str]:
+    padded = f"  {word} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+# Index
+# In-memory index of game names, platforms and tags. Words are kept sorted for prefix matches
+# and in a trigram index for matches with typos, so a search never touches the database
+class GameSearchIndex:
+    def __init__(self, games: list[GameSearchResult]):
+        self.games: dict[int, GameSearchResult] = {game.id: game for game in games}
+        self.word_games: dict[str, set[int]] = {}
+        for game in games:
+            for word in tokenize(" ".join([game.name, game.platform, *game.tags])):
+                self.word_games.setdefault(word, set()).add(game.id)
+
+        self.words: list[str] = sorted(self.word_games)
+        self.word_trigrams: dict[str, set[str]] = {word: trigrams(word) for word in self.words}
+        self.trigram_words: dict[str, list[str]] = {}
+        for word, word_trigrams in self.word_trigrams.items():
+            for trigram in word_trigrams:
+                self.trigram_words.setdefault(trigram, []).append(word)
+
+        # Popularity is scaled to between 0 and 1 so it only breaks ties between similar matches
+        scores = [game.popularity_score or 0 for game in games]
+        highest = max(scores, default=0) or 1
+        self.popularity: dict[int, float] = {game.id: (game.popularity_score or 0) / highest for game in games}
+
+    # Score each word that matches a search term
+    def match_term(self, term: str) -> dict[str, float]:
+        matches: dict[str, float] = {}
+
+        # Words starting with the term, the last term of an autocomplete query is usually only partly typed
+        index = bisect.bisect_left(self.words, term)
+        while index < len(self.words) and self.words[index].startswith(term):
+            word = self.words[index]
+            matches[word] = EXACT_SCORE if word == term else PREFIX_SCORE
+            index += 1
+
+        # Words sharing enough trigrams with the term
+        if len(term) >= 3:
+            term_trigrams = trigrams(term)
+            shared: dict[str, int] = {}
+            for trigram in term_trigrams:
+                for word in self.trigram_words.get(trigram, ()):
+                    shared[word] = shared.get(word, 0) + 1
+            for word, count in shared.items():
+                similarity = count / (len(term_trigrams) + len(self.word_trigrams[word]) - count)
+                if similarity >= TYPO_MIN_SIMILARITY:
+                    matches[word] = max(matches.get(word, 0), TYPO_SCORE * similarity)
+        return matches
+
+    # Games matching the most terms come first, then the best matches, then the most popular
+    def search(self, query: str, limit: int = 10) -> list[GameSearchResult]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        matched_terms: dict[int, int] = {}
+        scores: dict[int, float] = {}
+        for term in terms:
+            term_scores: dict[int, float] = {}
+            for word, score in self.match_term(term).items():
+                for game_id in self.word_games[word]:
+                    if score > term_scores.get(game_id, 0):
+                        term_scores[game_id] = score
+            for game_id, score in term_scores.items():
+                matched_terms[game_id] = matched_terms.get(game_id, 0) + 1
+                scores[game_id] = scores.get(game_id, 0) + score
+
+        ranked = heapq.nsmallest(limit, scores, key=lambda game_id: (-matched_terms[game_id], -(scores[game_id] / len(terms) + POPULARITY_WEIGHT * self.popularity[game_id])))
+        return [self.games[game_id].model_copy(update={"score": round(scores[game_id] / len(terms), 4)}) for game_id in ranked]
+
+# Load every game and build a new index
+def build_game_search_index() -> GameSearchIndex:
+    started = time.perf_counter()
+    with Session(engine) as session:
+        rows = session.exec(select(Game.id, Game.name, Game.platform, Game.tags, Game.popularity_score)).all()
+    index = GameSearchIndex([GameSearchResult(id=id, name=name, platform=platform, tags=tags, popularity_score=popularity_score) for id, name, platform, tags, popularity_score in rows])
+    logger.debug(f"Built game search index of {len(rows)} games in {(time.perf_counter() - started) * 1000:.1f}ms")
+    return index
+
+# Current index, rebuilt when it is older than GAME_SEARCH_INDEX_TTL_SECS or after games are changed
+game_search_index: Optional[GameSearchIndex] = None
+game_search_index_built: float = 0
+game_search_index_lock = threading.Lock()
+
+def get_game_search_index() -> GameSearchIndex:
+    global game_search_index, game_search_index_built
+    index = game_search_index
+    if index is None or time.monotonic() - game_search_index_built > settings.GAME_SEARCH_INDEX_TTL_SECS:
+        with game_search_index_lock:
+            # Another request may have rebuilt the index while this one waited
+            index = game_search_index
+            if index is None or time.monotonic() - game_search_index_built > settings.GAME_SEARCH_INDEX_TTL_SECS:
+                index = build_game_search_index()
+                game_search_index = index
+                game_search_index_built = time.monotonic()
+    return index
+
+# Rebuild the index on the next search
+def invalidate_game_search_index() -> None:
+    global game_search_index
+    game_search_index = None
+
+# Search games by name, platform and tags
+def search_games(query: str, limit: int = 10) -> list[GameSearchResult]:
+    return get_game_search_index().search(query, limit)
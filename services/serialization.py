@@ -0,0 +1,107 @@
+# Module Imports
+import math
+import logging
+import orjson
+from typing import Any, Callable, Optional
+from fastapi import HTTPException, Query, status
+from fastapi_pagination.api import resolve_params
+from sqlmodel import Session, SQLModel
+from sqlalchemy import Select, func, select
+from config import settings
+
+
+logger = logging.getLogger("services")
+
+# Datetimes are written like pydantic writes them, utc ones end in "Z" and naive ones have no suffix
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+MEDIA_URL_PREFIX = f"{settings.STORAGE_BUCKET_MEDIA_URL}/{settings.STORAGE_BUCKET_NAME}/"
+
+# Services
+# Transforms
+# Prefix stored object names with the media url, links that are already urls are kept
+def media_urls(values: list[Optional[str]]) -> list[Optional[str]]:
+    return [MEDIA_URL_PREFIX + value if value and not value.startswith("http") else value for value in values]
+
+# Serializers
+# Serializes rows selected as plain column tuples straight to json, skipping ORM objects and model validation
+# Columns are taken from the fields of a *Public model so the output matches it, transforms run once per column
+# Nested models such as a server's game are serialized from columns of joined tables, fields limits the columns selected
+# Field serializers of the public model, such as the ones marking datetimes as utc, are run on their columns
+class ColumnSerializer:
+    def __init__(self, model: type[SQLModel], public_model: type[SQLModel], transforms: Optional[dict[str, Callable[[list], list]]] = None,
+                 nested: Optional[dict[str, "ColumnSerializer"]] = None, fields: Optional[list[str]] = None):
+        self.model = model
+        self.public_model = public_model
+        self.transform_map: dict[str, Callable[[list], list]] = transforms or {}
+        self.nested_map: dict[str, ColumnSerializer] = nested or {}
+        self.field_serializers: dict[str, Callable] = {field: decorator.func for decorator in public_model.__pydantic_decorators__.field_serializers.values()
+                                                       for field in decorator.info.fields}
+
+        self.keys: list[str] = [key for key in public_model.model_fields if fields is None or key in fields]
+        self.column_keys: list[str] = [key for key in self.keys if key not in self.nested_map]
+        self.nested: list[tuple[str, ColumnSerializer]] = [(key, self.nested_map[key]) for key in self.keys if key in self.nested_map]
+        self.columns: list = [getattr(model, key) for key in self.column_keys] + [column for _, serializer in self.nested for column in serializer.columns]
+
+    # Serializer for only the requested fields, unknown fields are rejected rather than ignored
+    def project(self, fields: Optional[list[str]]) -> "ColumnSerializer":
+        if fields is None:
+            return self
+        if not fields or any(field not in self.public_model.model_fields for field in fields):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid fields, valid fields are: {', '.join(self.public_model.model_fields)}")
+        return ColumnSerializer(self.model, self.public_model, self.transform_map, self.nested_map, fields)
+
+    # Select the serialized columns with the filters, ordering and joins of an existing query
+    def select(self, query: Select) -> Select:
+        return query.with_only_columns(*self.columns, maintain_column_froms=True)
+
+    # Convert columns into lists of values by key, transforms are applied to whole columns rather than to each row
+    def column_values(self, columns: list[list]) -> dict[str, list]:
+        values = dict(zip(self.column_keys, columns))
+        for key, transform in self.transform_map.items():
+            if key in values:
+                values[key] = transform(values[key])
+        for key, serializer in self.field_serializers.items():
+            if key in values:
+                values[key] = [serializer(None, value) for value in values[key]]
+
+        # Nested models are built from the columns following this model's own, they are null when every column is null
+        offset = len(self.column_keys)
+        for key, serializer in self.nested:
+            width = len(serializer.columns)
+            nested_values = serializer.to_dicts(list(zip(*columns[offset:offset + width])))
+            values[key] = [None if all(value is None for value in item.values()) else item for item in nested_values]
+            offset += width
+        return values
+
+    # Convert rows into dictionaries with the fields in the order of the public model
+    def to_dicts(self, rows: list[tuple]) -> list[dict[str, Any]]:
+        if not rows:
+            return []
+        values = self.column_values([list(column) for column in zip(*rows)])
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in zip(*[values[key] for key in keys])]
+
+    def dumps(self, rows: list[tuple]) -> bytes:
+        return orjson.dumps(self.to_dicts(rows), option=ORJSON_OPTIONS)
+
+
+# Query parameter for sparse fieldsets, e.g. fields=id,name,banner_image
+def get_fields(fields: Optional[str] = Query(None, description="Comma separated fields to return, all fields are returned by default")) -> Optional[list[str]]:
+    if fields is None:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+# Pagination
+# Paginate a query into the same json as fastapi_pagination's Page, using the page parameters of the current request
+def paginate_columns(session: Session, query: Select, serializer: ColumnSerializer) -> bytes:
+    params = resolve_params()
+    raw_params = params.to_raw_params().as_limit_offset()
+    total = session.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar_one()
+    rows = session.execute(serializer.select(query).limit(raw_params.limit).offset(raw_params.offset)).all()
+    return orjson.dumps({
+        "items": serializer.to_dicts(rows),
+        "total": total,
+        "page": params.page,
+        "size": params.size,
+        "pages": math.ceil(total / params.size) if total else 0,
+    }, option=ORJSON_OPTIONS)
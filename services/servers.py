@@ -1,11 +1,11 @@
 # Module Imports
 import logging
-import requests
 from typing import Union
 from config import settings
 from sqlmodel import Session, select
 from schemas.servers import Server
 from schemas.database import engine
+from services.metrics import http_session
 from datetime import datetime, timezone
 
 
@@ -24,7 +24,7 @@ def update_server_statuses() -> None:
         # Get statuses
         url: str = f"{settings.DOCKERLINK_URL}/info"
         headers: dict = {"X-API-Key": settings.DOCKERLINK_AUTH_KEY}
-        response = requests.post(url=url, json=db_server_uuids, headers=headers)
+        response = http_session.post(url=url, json=db_server_uuids, headers=headers)
 
         if response.ok:
             # Update db entries
@@ -46,7 +46,7 @@ def update_server_statuses() -> None:
 def check_server_running(server: Server) -> Union[bool, None]:
     url: str = f"{settings.PTERODACTYL_DOMAIN}/api/client/servers/{server.uuid}/resources"
     headers: dict = {'Authorization': f'Bearer {settings.PTERODACTYL_CLIENT_API_KEY}'}
-    response = requests.get(url=url, headers=headers)
+    response = http_session.get(url=url, headers=headers)
     if response.status_code == 200:
         if response.json()["attributes"]["current_state"] == "running":
             return True
@@ -0,0 +1,228 @@
+# Module Imports
+import json
+import time
+import logging
+import argparse
+import numpy as np
+from typing import Optional
+from sqlmodel import Session, select
+from config import settings
+from schemas.database import engine
+from schemas.economy import Currency, Job
+from services.economy import calculate_work_pay, generate_exchange_rates
+from services.blackjack import simulate_games
+
+
+logger = logging.getLogger("services")
+
+# Exchange rates are randomized every 15 minutes
+RATE_UPDATES_PER_DAY = 96
+SECONDS_PER_DAY = 86400
+
+# Services
+# Parameters
+# Load job and currency parameters from the database, the result can also be saved as json and passed to the simulation
+def load_economy_parameters() -> dict:
+    with Session(engine) as session:
+        db_currencies = session.exec(select(Currency)).all()
+        db_jobs = session.exec(select(Job)).all()
+
+    return {
+        "currencies": [{"id": currency.id,
+                        "name": currency.name,
+                        "value_multiplier": currency.value_multiplier,
+                        "starting_value": currency.starting_value,
+                        "exchange_rate": currency.exchange_rate or currency.value_multiplier,
+                        "can_gamble": currency.can_gamble,
+                        "can_exchange": currency.can_exchange,
+                        "can_work_for": currency.can_work_for} for currency in db_currencies],
+        "jobs": [{"name": job.name,
+                  "min_pay": job.min_pay,
+                  "max_pay": job.max_pay,
+                  "cooldown": job.cooldown,
+                  "overridden_currency_id": job.overridden_currency_id} for job in db_jobs],
+    }
+
+# Simulation
+# Gini coefficient of a set of non-negative values, 0 is perfect equality and 1 is one player holding everything
+def gini(values: np.ndarray) -> float:
+    values = np.sort(np.clip(values, 0, None))
+    total = values.sum()
+    if not len(values) or total == 0:
+        return 0.0
+    ranks = np.arange(1, len(values) + 1)
+    return float((2 * ranks - len(values) - 1) @ values / (len(values) * total))
+
+# Summarise the wealth of every player, wealth is the value of all balances at the current exchange rates
+def wealth_distribution(wealth: np.ndarray) -> dict:
+    sorted_wealth = np.sort(wealth)
+    top_count = max(1, len(wealth) // 100)
+    total = sorted_wealth.sum()
+    return {
+        "mean": float(sorted_wealth.mean()),
+        "p10": float(np.percentile(sorted_wealth, 10)),
+        "p50": float(np.percentile(sorted_wealth, 50)),
+        "p90": float(np.percentile(sorted_wealth, 90)),
+        "p99": float(np.percentile(sorted_wealth, 99)),
+        "top_1_percent_share": float(sorted_wealth[-top_count:].sum() / total) if total else 0.0,
+        "gini": gini(sorted_wealth),
+    }
+
+# Simulate players working, gambling and exchanging for a number of days, all players are updated together each step
+# Each player keeps one job for the whole simulation and works up to work_sessions_per_day shifts, limited by the job cooldown
+# Gamblers bet a fraction of their balance on blackjack with outcomes drawn from simulated game results
+# Exchangers move a fraction of their balance into another currency at the current exchange rates
+def simulate_economy(parameters: dict,
+                     players: int = 10000,
+                     days: int = 30,
+                     work_sessions_per_day: int = 8,
+                     gamble_probability: float = 0.3,
+                     gamble_fraction: float = 0.1,
+                     gambles_per_day: int = 3,
+                     exchange_probability: float = 0.1,
+                     exchange_fraction: float = 0.25,
+                     blackjack_games: int = 100000,
+                     seed: Optional[int] = None) -> dict:
+    generator = np.random.default_rng(seed)
+    timings = {"work": 0.0, "gambling": 0.0, "exchange": 0.0, "exchange_rates": 0.0}
+
+    # Currencies
+    currencies = parameters["currencies"]
+    if not currencies or not parameters["jobs"]:
+        raise ValueError("At least one currency and one job are required")
+    currency_index = {currency["id"]: index for index, currency in enumerate(currencies)}
+    value_multipliers = np.array([currency["value_multiplier"] for currency in currencies], dtype=float)
+    rates = np.array([currency["exchange_rate"] for currency in currencies], dtype=float)
+    can_gamble = np.array([currency["can_gamble"] for currency in currencies], dtype=bool)
+    exchangeable = np.flatnonzero([currency["can_exchange"] for currency in currencies])
+    workable = np.flatnonzero([currency["can_work_for"] for currency in currencies])
+    balances = np.tile(np.array([currency["starting_value"] for currency in currencies], dtype=float), (players, 1))
+
+    # Jobs, players are given a random job and paid in the job's currency or a random currency that can be worked for
+    jobs = parameters["jobs"]
+    player_jobs = generator.integers(len(jobs), size=players)
+    min_pay = np.array([job["min_pay"] for job in jobs], dtype=float)[player_jobs]
+    max_pay = np.array([job["max_pay"] for job in jobs], dtype=float)[player_jobs]
+    cooldowns = np.array([job["cooldown"] for job in jobs], dtype=float)[player_jobs]
+    overridden = np.array([currency_index.get(job["overridden_currency_id"], -1) for job in jobs])[player_jobs]
+    if len(workable):
+        player_currencies = np.where(overridden >= 0, overridden, workable[generator.integers(len(workable), size=players)])
+    else:
+        player_currencies = np.where(overridden >= 0, overridden, generator.integers(len(currencies), size=players))
+    shifts = np.minimum(work_sessions_per_day, SECONDS_PER_DAY // np.maximum(cooldowns, 1)).astype(np.int64)
+    shift_mask = np.arange(work_sessions_per_day) < shifts[:, None]
+    player_multipliers = value_multipliers[player_currencies]
+    gamblers_currency = can_gamble[player_currencies]
+    rows = np.arange(players)
+
+    # Blackjack outcome probabilities, payouts are +1 for a win, -1 for a loss and 0 for a tie
+    started = time.perf_counter()
+    blackjack = simulate_games(blackjack_games, decks=settings.BLACKJACK_DECKS, seed=seed)
+    timings["blackjack_games"] = time.perf_counter() - started
+    outcome_probabilities = [blackjack["win_rate"], blackjack["loss_rate"], blackjack["tie_rate"]]
+    payouts = np.array([1.0, -1.0, 0.0])
+
+    initial_supply = balances.sum(axis=0)
+    initial_value = float(initial_supply @ rates)
+    daily_values: list[float] = []
+    started = time.perf_counter()
+    for _ in range(days):
+        # Work
+        step = time.perf_counter()
+        pay = calculate_work_pay(min_pay[:, None], max_pay[:, None], player_multipliers[:, None], generator=generator, size=shift_mask.shape)
+        balances[rows, player_currencies] += (pay * shift_mask).sum(axis=1)
+        timings["work"] += time.perf_counter() - step
+
+        # Gambling
+        step = time.perf_counter()
+        for _ in range(gambles_per_day):
+            gambling = gamblers_currency & (generator.random(players) < gamble_probability)
+            bets = balances[rows, player_currencies] * gamble_fraction * gambling
+            outcomes = payouts[generator.choice(3, size=players, p=outcome_probabilities)]
+            balances[rows, player_currencies] += bets * outcomes
+        timings["gambling"] += time.perf_counter() - step
+
+        # Exchange
+        step = time.perf_counter()
+        if len(exchangeable) > 1:
+            exchanging = np.flatnonzero(generator.random(players) < exchange_probability)
+            sources = player_currencies[exchanging]
+            targets = exchangeable[generator.integers(len(exchangeable), size=len(exchanging))]
+            valid = np.isin(sources, exchangeable) & (sources != targets)
+            exchanging, sources, targets = exchanging[valid], sources[valid], targets[valid]
+            amounts = balances[exchanging, sources] * exchange_fraction
+            balances[exchanging, sources] -= amounts
+            balances[exchanging, targets] += amounts * rates[sources] / rates[targets]
+        timings["exchange"] += time.perf_counter() - step
+
+        # Exchange rates
+        step = time.perf_counter()
+        for _ in range(RATE_UPDATES_PER_DAY):
+            rates = generate_exchange_rates(value_multipliers, rates, generator=generator)
+        timings["exchange_rates"] += time.perf_counter() - step
+
+        daily_values.append(float(balances.sum(axis=0) @ rates))
+    elapsed = time.perf_counter() - started
+
+    # Inflation is measured as the growth of the total value of all balances
+    final_supply = balances.sum(axis=0)
+    daily_inflation = np.diff(np.array([initial_value] + daily_values)) / np.maximum(np.array([initial_value] + daily_values[:-1]), 1e-12)
+    return {
+        "players": players,
+        "days": days,
+        "player_days": players * days,
+        "seconds": elapsed,
+        "player_days_per_second": players * days / elapsed if elapsed else 0.0,
+        "timings": timings,
+        "blackjack": blackjack,
+        "money_supply": {currency["name"]: {"initial": float(initial), "final": float(final), "growth": float(final / initial - 1) if initial else None}
+                         for currency, initial, final in zip(currencies, initial_supply, final_supply)},
+        "exchange_rates": {currency["name"]: float(rate) for currency, rate in zip(currencies, rates)},
+        "inflation": {
+            "total": daily_values[-1] / initial_value - 1 if days and initial_value else 0.0,
+            "mean_daily": float(daily_inflation.mean()) if days else 0.0,
+        },
+        "wealth": wealth_distribution(balances @ rates),
+    }
+
+# Command line
+# Run the simulation, e.g. "python -m services.simulation --players 1000000 --days 30 --parameters economy.json"
+# Parameters are read from the database when no file is given
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the economy and report inflation, wealth distribution and throughput")
+    parser.add_argument("--parameters", help="Json file of currencies and jobs, defaults to loading them from the database")
+    parser.add_argument("--save-parameters", help="Save the parameters loaded from the database to a json file and exit")
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--work-sessions-per-day", type=int, default=8)
+    parser.add_argument("--gamble-probability", type=float, default=0.3)
+    parser.add_argument("--gamble-fraction", type=float, default=0.1)
+    parser.add_argument("--gambles-per-day", type=int, default=3)
+    parser.add_argument("--exchange-probability", type=float, default=0.1)
+    parser.add_argument("--exchange-fraction", type=float, default=0.25)
+    parser.add_argument("--blackjack-games", type=int, default=100000)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.parameters:
+        with open(args.parameters) as file:
+            parameters = json.load(file)
+    else:
+        parameters = load_economy_parameters()
+    if args.save_parameters:
+        with open(args.save_parameters, "w") as file:
+            json.dump(parameters, file, indent=4)
+        raise SystemExit
+
+    report = simulate_economy(parameters,
+                              players=args.players,
+                              days=args.days,
+                              work_sessions_per_day=args.work_sessions_per_day,
+                              gamble_probability=args.gamble_probability,
+                              gamble_fraction=args.gamble_fraction,
+                              gambles_per_day=args.gambles_per_day,
+                              exchange_probability=args.exchange_probability,
+                              exchange_fraction=args.exchange_fraction,
+                              blackjack_games=args.blackjack_games,
+                              seed=args.seed)
+    print(json.dumps(report, indent=4, default=str))
@@ -1,43 +1,274 @@
 # Module Imports
 import os
 import io
-import boto3
-from botocore.exceptions import ClientError
+import shutil
+import asyncio
+import logging
+import tempfile
+import functools
+import threading
+import contextlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable
 from config import settings
+from services.metrics import instrument_boto3_client
+from services.scheduler import run_io
 
-# Setup client
-s3 = boto3.client(
-    "s3",
-    endpoint_url=settings.STORAGE_BUCKET_ENDPOINT,
-    aws_access_key_id=settings.STORAGE_BUCKET_ACCESS_KEY,
-    aws_secret_access_key=settings.STORAGE_BUCKET_SECRET_KEY,
-    region_name=settings.STORAGE_BUCKET_REGION_NAME)
+
+logger = logging.getLogger("services")
 bucket_name: str = settings.STORAGE_BUCKET_NAME
 
+# Setup client
+# boto3 takes a while to import and build a client, so it is done on first use rather than at startup
+@functools.cache
+def get_s3_client():
+    import boto3
+    s3 = boto3.client(
+        "s3",
+        endpoint_url=settings.STORAGE_BUCKET_ENDPOINT,
+        aws_access_key_id=settings.STORAGE_BUCKET_ACCESS_KEY,
+        aws_secret_access_key=settings.STORAGE_BUCKET_SECRET_KEY,
+        region_name=settings.STORAGE_BUCKET_REGION_NAME)
+    instrument_boto3_client(s3)
+    return s3
+
+# Keep services.storage.s3 working for the shell and older callers
+def __getattr__(name: str):
+    if name == "s3":
+        return get_s3_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Backends
+# Every backend stores objects by key in a single bucket, failed operations return false rather than raising
+class StorageBackend(ABC):
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    @abstractmethod
+    def create_bucket(self) -> None: ...
+
+    @abstractmethod
+    def upload(self, key: str, content: BinaryIO | bytes, content_type: str = "image/png") -> bool: ...
+
+    @abstractmethod
+    def download(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> bool: ...
+
+    # Objects are served publicly from the media url, so local backends link there directly
+    def presigned_url(self, key: str, expires_secs: int | None = None) -> str:
+        return f"{settings.STORAGE_BUCKET_MEDIA_URL}/{self.bucket}/{key}"
+
+    # Upload several objects at once, uploads run in parallel and the result is returned for each key
+    def upload_many(self, files: dict[str, BinaryIO | bytes], content_type: str = "image/png") -> dict[str, bool]:
+        if not files:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(len(files), settings.STORAGE_BULK_CONCURRENCY), thread_name_prefix="storage") as executor:
+            results = executor.map(lambda item: self.upload(item[0], item[1], content_type), files.items())
+            return dict(zip(files, results))
+
+    def delete_many(self, keys: Iterable[str]) -> dict[str, bool]:
+        return {key: self.delete(key) for key in keys}
+
+
+# S3 compatible bucket, large uploads are split into parts that are uploaded in parallel
+class S3Storage(StorageBackend):
+    def create_bucket(self) -> None:
+        from botocore.exceptions import ClientError
+        s3 = get_s3_client()
+        try:
+            s3.head_bucket(Bucket=self.bucket)
+        except ClientError:
+            s3.create_bucket(Bucket=self.bucket)
+
+    @functools.cached_property
+    def transfer_config(self):
+        from boto3.s3.transfer import TransferConfig
+        return TransferConfig(multipart_threshold=settings.STORAGE_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+                              multipart_chunksize=settings.STORAGE_MULTIPART_CHUNK_MB * 1024 * 1024)
+
+    def upload(self, key: str, content: BinaryIO | bytes, content_type: str = "image/png") -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            get_s3_client().upload_fileobj(Fileobj=io.BytesIO(content) if isinstance(content, bytes) else content,
+                                           Bucket=self.bucket,
+                                           Key=key,
+                                           ExtraArgs={"ContentType": content_type,
+                                                      "CacheControl": f"max-age={settings.STORAGE_BUCKET_CACHE_TIMEOUT}"},
+                                           Config=self.transfer_config)
+            return True
+        except ClientError:
+            logger.exception(f"Failed to upload {key} to {self.bucket}")
+            return False
+
+    def download(self, key: str) -> bytes | None:
+        from botocore.exceptions import ClientError
+        try:
+            return get_s3_client().get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except ClientError:
+            return None
+
+    def delete(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            get_s3_client().delete_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def presigned_url(self, key: str, expires_secs: int | None = None) -> str:
+        return get_s3_client().generate_presigned_url("get_object",
+                                                      Params={"Bucket": self.bucket, "Key": key},
+                                                      ExpiresIn=expires_secs or settings.STORAGE_PRESIGNED_URL_EXPIRY_SECS)
+
+    # Objects are deleted 1000 at a time, which is the most a single request accepts
+    def delete_many(self, keys: Iterable[str]) -> dict[str, bool]:
+        from botocore.exceptions import ClientError
+        keys = list(keys)
+        results = {key: True for key in keys}
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            try:
+                response = get_s3_client().delete_objects(Bucket=self.bucket, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True})
+            except ClientError:
+                results.update({key: False for key in batch})
+                continue
+            results.update({error["Key"]: False for error in response.get("Errors", [])})
+        return results
+
+
+# Directory on disk, each bucket is a folder under STORAGE_FILESYSTEM_ROOT which main serves at /media
+class FilesystemStorage(StorageBackend):
+    def __init__(self, bucket: str, root: str):
+        super().__init__(bucket)
+        self.directory = os.path.realpath(os.path.join(root, bucket))
+
+    # Keys cannot point outside the bucket's folder
+    def get_path(self, key: str) -> str:
+        path = os.path.realpath(os.path.join(self.directory, key))
+        if os.path.commonpath([path, self.directory]) != self.directory or path == self.directory:
+            raise ValueError(f"Invalid storage key {key}")
+        return path
+
+    def create_bucket(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+    # Content is copied in chunks to a temporary file which replaces the object once complete,
+    # so large files are never held in memory and readers never see a partial file
+    def upload(self, key: str, content: BinaryIO | bytes, content_type: str = "image/png") -> bool:
+        temp_path: str | None = None
+        try:
+            path = self.get_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as file:
+                temp_path = file.name
+                if isinstance(content, bytes):
+                    file.write(content)
+                else:
+                    shutil.copyfileobj(content, file, settings.STORAGE_MULTIPART_CHUNK_MB * 1024 * 1024)
+            os.replace(temp_path, path)
+            return True
+        except (OSError, ValueError):
+            logger.exception(f"Failed to upload {key} to {self.directory}")
+            # Remove the partial copy so failed uploads do not leave files behind
+            if temp_path:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+            return False
+
+    def download(self, key: str) -> bytes | None:
+        try:
+            with open(self.get_path(key), "rb") as file:
+                return file.read()
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self.get_path(key))
+            return True
+        except FileNotFoundError:
+            return True
+        except (OSError, ValueError):
+            return False
+
+
+# Objects held in a dict, for tests and running offline without a bucket
+class MemoryStorage(StorageBackend):
+    def __init__(self, bucket: str):
+        super().__init__(bucket)
+        self.objects: dict[str, tuple[bytes, str]] = {}
+        self.lock = threading.Lock()
+
+    def create_bucket(self) -> None:
+        pass
+
+    def upload(self, key: str, content: BinaryIO | bytes, content_type: str = "image/png") -> bool:
+        data = content if isinstance(content, bytes) else content.read()
+        with self.lock:
+            self.objects[key] = (data, content_type)
+        return True
+
+    def download(self, key: str) -> bytes | None:
+        with self.lock:
+            stored = self.objects.get(key)
+        return stored[0] if stored else None
+
+    def delete(self, key: str) -> bool:
+        with self.lock:
+            self.objects.pop(key, None)
+        return True
+
+
+def get_storage_backend() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "filesystem":
+        return FilesystemStorage(bucket_name, settings.STORAGE_FILESYSTEM_ROOT)
+    if settings.STORAGE_BACKEND == "memory":
+        return MemoryStorage(bucket_name)
+    return S3Storage(bucket_name)
+
+storage = get_storage_backend()
+
+# Services
 # Create bucket
 def create_bucket():
-    try:
-        s3.head_bucket(Bucket=bucket_name)
-    except ClientError:
-        s3.create_bucket(Bucket=bucket_name)
+    storage.create_bucket()
+
+# Check the bucket in the background at startup so a slow or unavailable bucket does not hold up serving requests
+# Failed attempts are retried with exponential backoff and the last failure is logged
+async def ensure_bucket() -> bool:
+    for attempt in range(1, settings.STORAGE_BUCKET_CHECK_ATTEMPTS + 1):
+        try:
+            await run_io(create_bucket)
+            logger.debug(f"Storage bucket {bucket_name} is available")
+            return True
+        except Exception:
+            if attempt == settings.STORAGE_BUCKET_CHECK_ATTEMPTS:
+                logger.exception(f"Storage bucket {bucket_name} is unavailable after {attempt} attempts")
+                return False
+            delay = settings.STORAGE_BUCKET_CHECK_BACKOFF_SECS * 2 ** (attempt - 1)
+            logger.warning(f"Storage bucket {bucket_name} check failed, retrying in {delay}s")
+            await asyncio.sleep(delay)
+    return False
 
 # Upload file
 def upload_file_to_bucket(file_content, file_name):
-    try:
-        s3.upload_fileobj(Fileobj=file_content, 
-                          Bucket=bucket_name, 
-                          Key=file_name, 
-                          ExtraArgs={"ContentType": "image/png", 
-                                     "CacheControl": f"max-age={settings.STORAGE_BUCKET_CACHE_TIMEOUT}"})
-        return True
-    except ClientError:
-        return False
+    return storage.upload(file_name, file_content)
+
+# Upload files, takes a dict of file names to contents
+def upload_files_to_bucket(files: dict[str, BinaryIO | bytes]) -> dict[str, bool]:
+    return storage.upload_many(files)
 
 # Delete file
 def delete_file_from_bucket(file_name):
-    try:
-        s3.delete_object(Bucket=bucket_name, 
-                         Key=file_name)
-        return True
-    except ClientError:
-        return False
+    return storage.delete(file_name)
+
+# Delete files
+def delete_files_from_bucket(file_names: Iterable[str]) -> dict[str, bool]:
+    return storage.delete_many(file_names)
+
+# Get a temporary link to a file
+def get_presigned_url(file_name: str, expires_secs: int | None = None) -> str:
+    return storage.presigned_url(file_name, expires_secs)
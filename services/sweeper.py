@@ -0,0 +1,62 @@
+# Module Imports
+import time
+import logging
+from sqlalchemy import delete, func
+from config import settings
+from schemas.database import engine
+from schemas.auth import RefreshToken
+from schemas.economy import Cooldown, CurrencyExchange, BlackjackGame, IdempotencyKey
+from services.metrics import SWEEPER_ROWS_DELETED, SWEEPER_DURATION, SWEEPER_FAILURES
+
+
+logger = logging.getLogger("services")
+
+# Columns that mark when a row can be removed, all times are stored as utc
+SWEPT_COLUMNS = [
+    RefreshToken.expires_at,
+    Cooldown.expires,
+    CurrencyExchange.expires,
+    BlackjackGame.expires,
+    IdempotencyKey.expires,
+]
+
+# Services
+# Delete expired rows for a single table in chunks, each chunk is its own transaction so locks are held briefly
+def sweep_expired_rows(column, chunk_size: int = None) -> int:
+    chunk_size = chunk_size or settings.SWEEPER_CHUNK_SIZE
+    table = column.table
+    query = delete(table).where(column < func.utc_timestamp()).with_dialect_options(mysql_limit=chunk_size)
+
+    started = time.perf_counter()
+    deleted: int = 0
+    while True:
+        with engine.begin() as connection:
+            rowcount = connection.execute(query).rowcount
+        deleted += rowcount
+        if rowcount < chunk_size:
+            break
+    elapsed = time.perf_counter() - started
+
+    SWEEPER_ROWS_DELETED.labels(table.name).inc(deleted)
+    SWEEPER_DURATION.labels(table.name).observe(elapsed)
+    logger.debug(f"Deleted {deleted} expired rows from {table.name} in {elapsed * 1000:.1f}ms")
+    return deleted
+
+# Delete expired rows from every swept table, a failed table does not stop the others from being swept
+# but the run still raises afterwards so it is counted as a failed job
+def sweep_all_expired_rows() -> dict[str, int]:
+    started = time.perf_counter()
+    deleted: dict[str, int] = {}
+    failed: list[str] = []
+    for column in SWEPT_COLUMNS:
+        try:
+            deleted[column.table.name] = sweep_expired_rows(column)
+        except Exception:
+            logger.exception(f"Failed to sweep expired rows from {column.table.name}")
+            SWEEPER_FAILURES.labels(column.table.name).inc()
+            failed.append(column.table.name)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Swept {sum(deleted.values())} expired rows from {len(deleted)} tables in {elapsed * 1000:.1f}ms")
+    if failed:
+        raise RuntimeError(f"Failed to sweep expired rows from {', '.join(failed)}")
+    return deleted
@@ -0,0 +1,68 @@
+# Module Imports
+import logging
+import contextlib
+from fastapi import FastAPI
+from config import settings
+from schemas.database import engine
+
+# OpenTelemetry is optional, install the tracing extra to use it
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:
+    trace = None
+
+
+logger = logging.getLogger("services")
+
+# Spans from this tracer do nothing until setup_tracing sets a tracer provider
+tracer = trace.get_tracer("services") if trace else None
+tracer_provider = None
+
+# Services
+# Start a span around work that is not traced automatically, e.g. image processing or a scheduled job
+def start_span(name: str, **attributes):
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.start_as_current_span(name, attributes=attributes or None)
+
+# "file" writes a json line per span to TRACING_FILE_PATH for testing, "otlp" sends spans to TRACING_OTLP_ENDPOINT
+def get_span_exporter() -> "SpanExporter":
+    if settings.TRACING_EXPORTER == "file":
+        return ConsoleSpanExporter(out=open(settings.TRACING_FILE_PATH, "a"), formatter=lambda span: span.to_json(indent=None) + "\n")
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+
+# Trace routes, sql statements, outbound requests and s3 calls when TRACING_ENABLED is set
+# Traces are sampled at TRACING_SAMPLE_RATE, requests from a traced caller follow the caller's sampling decision
+def setup_tracing(app: FastAPI) -> None:
+    global tracer_provider
+    if not settings.TRACING_ENABLED:
+        return
+    if trace is None:
+        logger.warning("Tracing is enabled but opentelemetry is not installed, install the tracing extra to use it")
+        return
+
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    from opentelemetry.instrumentation.requests import RequestsInstrumentor
+    from opentelemetry.instrumentation.botocore import BotocoreInstrumentor
+
+    tracer_provider = TracerProvider(resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+                                     sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATE)))
+    tracer_provider.add_span_processor(BatchSpanProcessor(get_span_exporter()))
+    trace.set_tracer_provider(tracer_provider)
+
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics,static")
+    SQLAlchemyInstrumentor().instrument(engine=engine)
+    RequestsInstrumentor().instrument()
+    BotocoreInstrumentor().instrument()
+    logger.info(f"Tracing enabled, exporting {settings.TRACING_SAMPLE_RATE:.0%} of traces with the {settings.TRACING_EXPORTER} exporter")
+
+# Export any spans that have not been sent yet
+def shutdown_tracing() -> None:
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
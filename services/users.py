@@ -3,7 +3,6 @@ import logging
 import requests
 import time
 from io import BytesIO
-from PIL import Image
 from sqlmodel import Session, select
 from config import settings
 from schemas.database import engine
@@ -11,6 +10,8 @@ from schemas.users import User, Permission, UserPermission
 from services.economy import populate_user_currencies
 from services.games import populate_user_ratings
 from services.storage import *
+from services.metrics import http_session
+from services.tracing import start_span
 
 
 logger = logging.getLogger("services")
@@ -25,7 +26,7 @@ def get_or_create_user(discord_id: str) -> User:
             db_user = User(discord_id=discord_id)
             
             # Get discord username, return none if an invalid id was provided
-            response = requests.get(f"https://discord.com/api/v10/users/{discord_id}", headers={"Authorization": f"Bot {settings.DISCORD_BOT_TOKEN}"})
+            response = http_session.get(f"https://discord.com/api/v10/users/{discord_id}", headers={"Authorization": f"Bot {settings.DISCORD_BOT_TOKEN}"})
             if response.ok:
                 db_user.username = response.json()["username"]
                 db_user.display_name = response.json()["global_name"]
@@ -64,16 +65,18 @@ def format_user_permissions(user: User) -> None:
 # Avatar Images
 # Generate an avatar image from an avatar link
 def generate_avatar_image(avatar_link: str) -> BytesIO | None:
+    from PIL import Image
     try:
         # Get image from link
-        response: requests.Response = requests.get(avatar_link, timeout=5)
-        img: Image = Image.open(BytesIO(response.content))
+        response: requests.Response = http_session.get(avatar_link, timeout=5)
+        with start_span("process avatar image", image_bytes=len(response.content)):
+            img: Image = Image.open(BytesIO(response.content))
 
-        # Return contentfile
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-        return buffer
+            # Return contentfile
+            buffer = BytesIO()
+            img.save(buffer, format="PNG")
+            buffer.seek(0)
+            return buffer
     except Exception:
         return None
     
@@ -0,0 +1,105 @@
+# Module Imports
+import os
+import sys
+import tempfile
+import contextlib
+from datetime import datetime, timedelta, timezone
+
+# Settings are read when config is imported, so the test environment is set up before any app module is imported
+# The app runs against a sqlite file and in-memory backends, and from a temporary directory holding its logs
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="api-tests-")
+os.makedirs(os.path.join(WORKDIR, "logs"))
+os.symlink(os.path.join(ROOT, "static"), os.path.join(WORKDIR, "static"))
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+TEST_ENVIRONMENT = {
+    "APP_TITLE": "api", "APP_SUMMARY": "api", "APP_VERSION": "test", "APP_RELOAD": "false", "APP_ORIGINS": '["*"]',
+    "APP_RUN_SCHEDULED_TASKS": "false", "APP_IN_PRODUCTION": "false",
+    "LOG_LEVEL_WATCHFILES": "WARNING", "LOG_LEVEL_UVICORN": "WARNING", "LOG_LEVEL_APSCHEDULER": "WARNING", "LOG_LEVEL_SERVICES": "WARNING",
+    "DB_HOST": "localhost", "DB_PORT": "3306", "DB_USERNAME": "test", "DB_PASSWORD": "test", "DB_DATABASE": "test",
+    "DB_URL": f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    "STORAGE_BACKEND": "memory", "STORAGE_BUCKET_NAME": "bucket", "STORAGE_BUCKET_CACHE_TIMEOUT": "60", "STORAGE_BUCKET_MEDIA_URL": "http://media",
+    "DOCKERLINK_URL": "http://dockerlink", "DOCKERLINK_AUTH_KEY": "key", "DOCKERLINK_ACTIVATED": "false",
+    "DISCORD_CLIENT_ID": "id", "DISCORD_CLIENT_SECRET": "secret", "DISCORD_AUTHORIZE_URL": "http://discord", "DISCORD_REDIRECT_URL": "http://discord",
+    "DISCORD_SERVER_WHITELIST": '["1"]', "DISCORD_BOT_TOKEN": "token",
+    "PTERODACTYL_DOMAIN": "http://pterodactyl", "PTERODACTYL_CLIENT_API_KEY": "key",
+    "JWT_SECRET_KEY": "test-secret-key-that-is-long-enough-for-hs256", "JWT_ALGORITHM": "HS256",
+    "JWT_ACCESS_TOKEN_EXPIRY_MINS": "15", "JWT_REFRESH_TOKEN_EXPIRY_MINS": "60",
+    "RATE_LIMIT_ENABLED": "false", "LEADER_ELECTION_BACKEND": "local", "METRICS_ENABLED": "true",
+    "MISC_PEOPLE_CONSTANT": "10",
+}
+for name, value in TEST_ENVIRONMENT.items():
+    os.environ[name] = value
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session
+from schemas.database import engine
+from schemas.economy import Currency, UserCurrency, Job, UserJob, Transaction
+from schemas.games import Game, GameRating
+from schemas.servers import Server, ServerCategory
+from schemas.users import User, Permission
+from auth.utilities import create_jwt_token
+from main import app
+
+PERMISSIONS = ["can_use_economy", "can_view_games", "can_view_servers", "can_view_users"]
+
+
+# Database
+# Count the statements sent to the database inside the block
+@contextlib.contextmanager
+def count_queries():
+    statements: list[str] = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+# Users, currencies, jobs, games and servers with several rows each, so a lazy load per row would change the query count
+def seed_database() -> None:
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        permissions = [Permission(code=code, description=code, assigned_by_default=True) for code in PERMISSIONS]
+        users = [User(id=id, discord_id=str(1000 + id), username=f"user{id}", display_name=f"User {id}", avatar_link=f"http://avatars/{id}.png",
+                      avatar_image=f"avatars/{id}.png", can_use_site=True, permissions=permissions) for id in range(1, 6)]
+        currencies = [Currency(name=f"currency{id}", display_name=f"Currency {id}", prefix="$", can_gamble=True, can_exchange=True, can_work_for=True,
+                               exchange_rate=1.0, decimal_places=2, value_multiplier=1.0, starting_value=100.0, color="#ffffff") for id in range(1, 4)]
+        jobs = [Job(name=f"job{id}", display_name=f"Job {id}", min_pay=1, max_pay=2, cooldown=60, overridden_currency=currencies[0]) for id in range(1, 4)]
+        category = ServerCategory(name="category", servers_icon="icons/category.png", is_minecraft=False)
+        games = [Game(name=f"game{id}", platform="steam", link=f"http://games/{id}", min_party_size=1, max_party_size=4, tags=[], date_added=now,
+                      servers_image=f"games/{id}.png") for id in range(1, 6)]
+        session.add_all(users + currencies + jobs + games + [category])
+        session.flush()
+        for user in users:
+            session.add_all(UserCurrency(user_id=user.id, currency_id=currency.id, balance=100.0) for currency in currencies)
+            session.add(UserJob(user_id=user.id, job_id=jobs[user.id % len(jobs)].id, currency_id=currencies[user.id % len(currencies)].id))
+            session.add_all(Transaction(user_id=user.id, currency_id=currency.id, amount=1.0, timestamp=now, note="test") for currency in currencies)
+            session.add_all(GameRating(game_id=game.id, user_id=user.id, rating=3) for game in games)
+        session.add_all(Server(name=f"server{id}", display_name=f"Server {id}", description="server", category_id=category.id, version="1.0",
+                               modloader="none", is_active=True, is_compatible=True, emoji=":server:", uuid=f"{id:08}", domain=f"server{id}.test",
+                               creation_date=now, port=25565 + id, game_id=games[id % len(games)].id) for id in range(1, 6))
+        session.commit()
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    SQLModel.metadata.create_all(engine)
+    seed_database()
+    yield engine
+    SQLModel.metadata.drop_all(engine)
+
+# App
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def auth_headers() -> dict:
+    token = create_jwt_token("1", datetime.now(timezone.utc), timedelta(hours=1))
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,109 @@
+# Module Imports
+import random
+from datetime import datetime, timedelta, timezone
+from sqlmodel import Session, select
+from schemas.database import engine
+from schemas.economy import BlackjackGame, UserCurrency, Transaction
+from auth.utilities import create_jwt_token
+from services.blackjack import BlackjackState, MemoryGameStore, start_game, save_game, claim_game, end_game
+
+# Games are played by a user the other tests do not read balances for
+USER_ID = 4
+CURRENCY_ID = 1
+BALANCE_CHANGES = {"Win": 1.0, "Lose": -1.0, "Tie": 0.0}
+
+
+def get_headers(user_id: int) -> dict:
+    token = create_jwt_token(str(user_id), datetime.now(timezone.utc), timedelta(hours=1))
+    return {"Authorization": f"Bearer {token}"}
+
+def get_balance(user_id: int) -> tuple[float, int]:
+    with Session(engine) as session:
+        balance = session.exec(select(UserCurrency.balance).where(UserCurrency.user_id == user_id, UserCurrency.currency_id == CURRENCY_ID)).one()
+        transactions = len(session.exec(select(Transaction.id).where(Transaction.user_id == user_id, Transaction.note.like("Blackjack%"))).all())
+    return balance, transactions
+
+
+# Stored games are rebuilt with the same hands and without the cards already dealt in the shoe
+def test_game_is_rebuilt_from_store():
+    game = BlackjackState(USER_ID, CURRENCY_ID, 1.0, decks=1, rng=random.Random(1))
+    game.deal()
+    game.play("Hit")
+    rebuilt = BlackjackState.loads(game.dumps(), decks=1)
+    assert rebuilt.code == game.code
+    assert rebuilt.expires.timestamp() == game.expires.timestamp()
+    assert rebuilt.user_hand.cards == game.user_hand.cards
+    assert rebuilt.user_hand.value == game.user_hand.value
+    assert rebuilt.dealer_hand.value == game.dealer_hand.value
+    assert rebuilt.shoe.remaining == 52 - len(game.user_hand.cards) - len(game.dealer_hand.cards)
+    dealt = set(game.user_hand.cards + game.dealer_hand.cards)
+    assert dealt.isdisjoint(rebuilt.shoe.cards[:rebuilt.shoe.remaining])
+
+# Only one of several requests for the same game claims it, other users cannot claim it at all
+def test_game_is_claimed_once():
+    game = start_game(USER_ID + 1, CURRENCY_ID, 1.0)
+    assert game and start_game(USER_ID + 1, CURRENCY_ID, 1.0) is None
+    save_game(game)
+
+    assert claim_game(game.code, USER_ID) is None
+    claimed = claim_game(game.code, USER_ID + 1)
+    assert claimed and claimed.user_hand.cards == game.user_hand.cards
+    assert claim_game(game.code, USER_ID + 1) is None
+
+    end_game(claimed)
+    game = start_game(USER_ID + 1, CURRENCY_ID, 1.0)
+    assert game is not None
+    end_game(game)
+
+def test_memory_store():
+    store = MemoryGameStore(maxsize=10)
+    assert store.add("key", b"one", 60) and not store.add("key", b"two", 60)
+    assert store.pop("key") == b"one" and store.pop("key") is None
+    assert not store.add("expired", b"one", 0)
+    store.set("key", b"three", 60)
+    assert store.get("key") == b"three"
+
+# A game is settled once and only written to the database when it finishes
+def test_game_is_settled_once(client):
+    headers = get_headers(USER_ID)
+    balance, transactions = get_balance(USER_ID)
+
+    response = client.post("/api/economy/gambling/blackjack", json={"currency_id": CURRENCY_ID, "bet": 1.0}, headers=headers)
+    assert response.status_code == 200, response.text
+    game = response.json()["game"]
+    if game["result"] is None:
+        with Session(engine) as session:
+            assert session.exec(select(BlackjackGame).where(BlackjackGame.code == game["code"])).first() is None
+
+        # A second game cannot be started while this one is being played
+        response = client.post("/api/economy/gambling/blackjack", json={"currency_id": CURRENCY_ID, "bet": 1.0}, headers=headers)
+        assert response.status_code == 409, response.text
+
+        response = client.post("/api/economy/gambling/blackjack", json={"code": game["code"], "action": "Stand"}, headers=headers)
+        assert response.status_code == 200, response.text
+        game = response.json()["game"]
+    assert game["result"] in BALANCE_CHANGES
+
+    # The finished game is in the database and cannot be claimed or settled again
+    with Session(engine) as session:
+        assert session.exec(select(BlackjackGame.result).where(BlackjackGame.code == game["code"])).one() == game["result"]
+    assert claim_game(game["code"], USER_ID) is None
+    response = client.post("/api/economy/gambling/blackjack", json={"code": game["code"], "action": "Stand"}, headers=headers)
+    assert response.status_code == 400, response.text
+
+    new_balance, new_transactions = get_balance(USER_ID)
+    assert new_balance == balance + BALANCE_CHANGES[game["result"]]
+    assert new_transactions == transactions + (game["result"] != "Tie")
+
+# A game taken by a request that is still playing it is reported as busy rather than missing
+def test_claimed_game_is_busy(client):
+    game = start_game(USER_ID + 1, CURRENCY_ID, 1.0)
+    save_game(game)
+    assert claim_game(game.code, USER_ID + 1)
+
+    response = client.post("/api/economy/gambling/blackjack", json={"code": game.code, "action": "Hit"}, headers=get_headers(USER_ID + 1))
+    assert response.status_code == 409, response.text
+    end_game(game)
+
+    response = client.post("/api/economy/gambling/blackjack", json={"code": game.code, "action": "Hit"}, headers=get_headers(USER_ID + 1))
+    assert response.status_code == 404, response.text
@@ -0,0 +1,61 @@
+# Module Imports
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from limits.storage import MemoryStorage
+from sqlmodel import Session
+from schemas.database import engine
+from schemas.economy import Cooldown
+from services import economy
+from services.ratelimit import CooldownStore
+
+
+# A store shared between two workers, each worker keeps its own local cache in front of it
+@pytest.fixture
+def shared_store(monkeypatch):
+    store = CooldownStore(prefix="test-cooldown", backend=MemoryStorage())
+    monkeypatch.setattr(economy, "cooldown_store", store)
+    economy.active_cooldowns.clear()
+    yield store
+    economy.active_cooldowns.clear()
+
+def later(seconds: int) -> datetime:
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).replace(microsecond=0)
+
+
+def test_cooldown_is_answered_locally(shared_store, monkeypatch):
+    expires = later(300)
+    economy.cache_cooldown(1, "work", expires)
+    assert shared_store.get(1, "work") == pytest.approx(expires.timestamp(), abs=1)
+
+    # The store is not read again while the local entry is fresh
+    monkeypatch.setattr(shared_store, "get", lambda *args: pytest.fail("cooldown store was read"))
+    assert economy.get_cooldown(1, "work") == expires
+
+def test_local_cooldown_is_capped(shared_store, monkeypatch):
+    monkeypatch.setattr(economy.settings, "ECONOMY_COOLDOWN_CACHE_SECONDS", 30)
+    economy.cache_cooldown(1, "work", later(3600))
+    _, deadline = economy.active_cooldowns._data[(1, "work")]
+    assert deadline - time.monotonic() <= 30
+
+def test_cooldown_set_by_another_worker(shared_store):
+    expires = later(300)
+    shared_store.set(2, "work", expires.timestamp())
+    # The store keeps whole seconds remaining, so the end time it reports can be off by up to a second
+    assert economy.get_cooldown(2, "work").timestamp() == pytest.approx(expires.timestamp(), abs=1)
+    assert (2, "work") in economy.active_cooldowns
+
+def test_cooldown_falls_back_to_database(shared_store):
+    expires = later(300)
+    with Session(engine) as session:
+        session.add(Cooldown(user_id=3, cooldown_type="job_change", expires=expires))
+        session.commit()
+    assert economy.get_cooldown(3, "job_change") == expires
+    assert shared_store.get(3, "job_change") == pytest.approx(expires.timestamp(), abs=1)
+
+    with Session(engine) as session:
+        economy.clear_cooldown(session, 3, "job_change")
+        session.commit()
+    assert (3, "job_change") not in economy.active_cooldowns
+    assert shared_store.get(3, "job_change") is None
+    assert economy.get_cooldown(3, "job_change") is None
@@ -0,0 +1,24 @@
+# Module Imports
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from services.economy import get_exchange_rate_range
+
+
+# Times without a timezone are utc, times with one are converted, both are returned naive
+def test_naive_times_are_utc():
+    start, end = get_exchange_rate_range(datetime(2026, 1, 1, 12), datetime(2026, 1, 1, 14, tzinfo=timezone(timedelta(hours=1))))
+    assert start == datetime(2026, 1, 1, 12)
+    assert end == datetime(2026, 1, 1, 13)
+
+def test_range_is_bounded():
+    assert get_exchange_rate_range(datetime(2026, 1, 1), datetime(2026, 1, 2), max_range=timedelta(days=1))
+    with pytest.raises(HTTPException):
+        get_exchange_rate_range(datetime(2026, 1, 1), datetime(2026, 1, 3), max_range=timedelta(days=1))
+
+# The ohlc route returns at most ECONOMY_EXCHANGE_RATE_MAX_INTERVALS intervals
+def test_ohlc_range_is_bounded(client, auth_headers):
+    response = client.get("/api/economy/currencies/1/ohlc", params={"interval": 900, "start": "2026-01-01T00:00:00", "end": "2026-01-02T00:00:00"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    response = client.get("/api/economy/currencies/1/ohlc", params={"interval": 900, "start": "2025-01-01T00:00:00", "end": "2026-01-01T00:00:00"}, headers=auth_headers)
+    assert response.status_code == 400, response.text
@@ -0,0 +1,27 @@
+# Module Imports
+import pytest
+from prometheus_client import REGISTRY
+
+
+def get_request_count(route: str, status: int) -> float:
+    return REGISTRY.get_sample_value("http_requests_total", {"method": "GET", "route": route, "status": str(status)}) or 0
+
+# Requests are labelled with the full route template including the router's prefix, and ids are not part of the label
+@pytest.mark.parametrize("path, route, status", [
+    ("/api/servers", "/api/servers", 200),
+    ("/api/servers/1", "/api/servers/{id}", 200),
+    ("/api/servers/2", "/api/servers/{id}", 200),
+    ("/api/users/1", "/api/users/{id}", 200),
+    ("/api/auth/jwks", "/api/auth/jwks", 404),
+    ("/static/missing.css", "/static/{path}", 404),
+    ("/missing", "unmatched", 404),
+])
+def test_request_route_label(client, auth_headers, path, route, status):
+    before = get_request_count(route, status)
+    response = client.get(path, headers=auth_headers)
+    assert response.status_code == status, response.text
+    assert get_request_count(route, status) == before + 1
+
+def test_server_timing_header(client, auth_headers):
+    response = client.get("/api/servers/1", headers=auth_headers)
+    assert "db;dur=" in response.headers["Server-Timing"]
@@ -0,0 +1,47 @@
+# Module Imports
+import asyncio
+from sqlalchemy import event
+from schemas.database import engine
+from services.leader import LeaderElector, LocalLeaderLock, MySQLLeaderLock, leader_only
+
+
+# When the leader stops holding the lock another replica takes over on its next check, and only the leader runs jobs
+def test_leader_failover():
+    first = LeaderElector(LocalLeaderLock("test.failover"))
+    second = LeaderElector(LocalLeaderLock("test.failover"))
+    runs: list[str] = []
+
+    async def job(name: str):
+        runs.append(name)
+
+    async def run_jobs():
+        await leader_only(job, first)("first")
+        await leader_only(job, second)("second")
+
+    assert first.check() and not second.check()
+    asyncio.run(run_jobs())
+    assert runs == ["first"]
+
+    # The leader keeps the lock on later checks
+    assert first.check() and not second.check()
+
+    # The leader's process shuts down and the other replica becomes leader
+    first.release()
+    assert not first.is_leader
+    assert second.check() and not first.check()
+    asyncio.run(run_jobs())
+    assert runs == ["first", "second"]
+
+# A connection whose lock check failed is discarded rather than returned to the pool, sqlite has no GET_LOCK so the check fails
+def test_failed_lock_connection_is_invalidated():
+    invalidated: list = []
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        invalidated.append(dbapi_connection)
+    event.listen(engine, "invalidate", on_invalidate)
+    try:
+        lock = MySQLLeaderLock(engine, "test.invalidate")
+        assert not lock.acquire()
+    finally:
+        event.remove(engine, "invalidate", on_invalidate)
+    assert lock.connection is None
+    assert len(invalidated) == 1
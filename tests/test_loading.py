@@ -0,0 +1,30 @@
+# Module Imports
+import pytest
+from services.response_cache import invalidate_responses
+from tests.conftest import count_queries
+
+# Authenticating loads the user, merges it into the request's session and loads its permissions
+AUTH_QUERIES = 3
+
+
+# Each endpoint loads the relationships its public model returns with a fixed number of queries however many rows
+# are on the page, so a relationship that is lazy loaded per row shows up as a higher count
+@pytest.mark.parametrize("path, queries", [
+    ("/api/economy/balances", 4),               # count, page, users, currencies
+    ("/api/economy/balances/cursor", 3),        # page, users, currencies
+    ("/api/economy/balances/me", 4),            # count, page, users, currencies
+    ("/api/economy/balances/1", 4),             # user, balances, users, currencies
+    ("/api/economy/transactions/me", 4),        # count, page, users, currencies
+    ("/api/economy/transactions/me/cursor", 3), # page, users, currencies
+    ("/api/economy/jobs/users", 5),             # count, page, jobs, currencies, users
+    ("/api/economy/jobs/me", 1),                # user job joined with its job, currency and user
+    ("/api/games/ratings/user", 3),             # count, page, games
+    ("/api/servers", 2),                        # count, page with category and game columns
+    ("/api/servers/1", 1),                      # server joined with its category and game
+])
+def test_list_endpoint_query_count(client, auth_headers, path, queries):
+    invalidate_responses("servers")
+    with count_queries() as statements:
+        response = client.get(path, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert len(statements) == AUTH_QUERIES + queries, "\n".join(statements)
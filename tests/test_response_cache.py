@@ -0,0 +1,20 @@
+# Module Imports
+from services.response_cache import invalidate_responses
+from tests.conftest import count_queries
+from tests.test_loading import AUTH_QUERIES
+
+
+# Server categories are cached in their own namespace, so writes to servers do not drop them
+def test_server_categories_namespace(client, auth_headers):
+    invalidate_responses("server_categories")
+    client.get("/api/servers/categories", headers=auth_headers)
+
+    invalidate_responses("servers")
+    with count_queries() as statements:
+        assert client.get("/api/servers/categories", headers=auth_headers).status_code == 200
+    assert len(statements) == AUTH_QUERIES
+
+    invalidate_responses("server_categories")
+    with count_queries() as statements:
+        assert client.get("/api/servers/categories", headers=auth_headers).status_code == 200
+    assert len(statements) > AUTH_QUERIES
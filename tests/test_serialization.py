@@ -0,0 +1,39 @@
+# Module Imports
+import math
+import pytest
+from datetime import datetime, timezone
+from fastapi_pagination import Page
+from sqlmodel import Session, select
+from schemas.database import engine
+from schemas.games import Game, GamePublic
+from schemas.servers import Server, ServerPublic
+from schemas.users import User, UserPublic
+from services.response_cache import invalidate_responses
+from routers.games import LargePage
+
+
+@pytest.fixture(scope="module", autouse=True)
+def dated_rows():
+    # Fill datetimes that have a utc field serializer, creation_date and date_added are set when seeding
+    with Session(engine) as session:
+        session.get(User, 1).first_site_login = datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+        session.get(Game, 1).last_updated = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        session.commit()
+    invalidate_responses("games", "servers")
+
+
+# Column serialized pages are the same bytes as a page of the public model dumped by pydantic
+@pytest.mark.parametrize("path, model, public_model, page_type", [
+    ("/api/servers", Server, ServerPublic, Page),
+    ("/api/users", User, UserPublic, Page),
+    ("/api/games", Game, GamePublic, LargePage),
+])
+def test_columns_match_public_model(client, auth_headers, path, model, public_model, page_type):
+    response = client.get(path, headers=auth_headers)
+    assert response.status_code == 200, response.text
+
+    with Session(engine) as session:
+        rows = session.exec(select(model).order_by(model.id)).all()
+        items = [public_model.model_validate(row) for row in rows]
+    expected = page_type[public_model](items=items, total=len(items), page=1, size=50, pages=math.ceil(len(items) / 50))
+    assert response.content == expected.model_dump_json().encode()
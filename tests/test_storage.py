@@ -0,0 +1,60 @@
+# Module Imports
+import os
+import pytest
+from io import BytesIO
+from services.storage import StorageBackend, MemoryStorage, FilesystemStorage
+
+
+# Reads part of the content and then fails, like a connection dropping during an upload
+class FailingReader:
+    def __init__(self):
+        self.calls = 0
+
+    def read(self, size: int = -1) -> bytes:
+        self.calls += 1
+        if self.calls > 1:
+            raise OSError("connection reset")
+        return b"partial"
+
+
+def test_backends_must_implement_operations():
+    with pytest.raises(TypeError):
+        StorageBackend("bucket")
+
+def test_memory_storage():
+    storage = MemoryStorage("bucket")
+    storage.create_bucket()
+    assert storage.upload("banners/1.png", b"one")
+    assert storage.upload("banners/2.png", BytesIO(b"two"), content_type="image/jpeg")
+    assert storage.download("banners/1.png") == b"one"
+    assert storage.objects["banners/2.png"] == (b"two", "image/jpeg")
+
+    files = {f"avatars/{id}.png": BytesIO(bytes([id])) if id % 2 else bytes([id]) for id in range(20)}
+    assert storage.upload_many(files) == {key: True for key in files}
+    assert all(storage.download(f"avatars/{id}.png") == bytes([id]) for id in range(20))
+
+    assert storage.delete("banners/1.png")
+    assert storage.download("banners/1.png") is None
+    assert storage.delete_many(files) == {key: True for key in files}
+    assert list(storage.objects) == ["banners/2.png"]
+    assert storage.presigned_url("banners/2.png") == "http://media/bucket/banners/2.png"
+
+def test_filesystem_storage(tmp_path):
+    storage = FilesystemStorage("bucket", str(tmp_path))
+    storage.create_bucket()
+    assert storage.upload("banners/1.png", BytesIO(b"one"))
+    assert storage.download("banners/1.png") == b"one"
+    assert storage.delete("banners/1.png") and storage.delete("banners/1.png")
+    assert storage.download("banners/1.png") is None
+
+    # Keys cannot reach outside the bucket's folder
+    assert not storage.upload("../escaped.png", b"escaped")
+    assert not os.path.exists(tmp_path / "escaped.png")
+
+# A failed upload keeps the previous object and leaves no temporary file behind
+def test_filesystem_failed_upload_is_removed(tmp_path):
+    storage = FilesystemStorage("bucket", str(tmp_path))
+    assert storage.upload("banners/1.png", b"original")
+    assert not storage.upload("banners/1.png", FailingReader())
+    assert os.listdir(tmp_path / "bucket" / "banners") == ["1.png"]
+    assert storage.download("banners/1.png") == b"original"
@@ -0,0 +1,52 @@
+# Module Imports
+import pytest
+from datetime import datetime, timedelta, timezone
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+from sqlmodel import Session, select
+from schemas.database import engine
+from schemas.economy import Cooldown
+from services.metrics import timed_job
+from services.sweeper import SWEPT_COLUMNS, sweep_expired_rows, sweep_all_expired_rows
+
+
+def sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+# sqlite has no UTC_TIMESTAMP(), connections opened inside the block are given one
+@pytest.fixture
+def utc_timestamp():
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("utc_timestamp", 0, lambda: datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f"))
+    engine.dispose()
+    event.listen(engine, "connect", on_connect)
+    yield
+    event.remove(engine, "connect", on_connect)
+    engine.dispose()
+
+
+# Every table is attempted, each failure is counted against its table and the run still fails as a job
+def test_failed_sweeps_are_counted():
+    tables = [column.table.name for column in SWEPT_COLUMNS]
+    failures = {table: sample("sweeper_failures_total", {"table": table}) for table in tables}
+    job_failures = sample("scheduler_job_failures_total", {"job": "sweep_all_expired_rows"})
+
+    with pytest.raises(RuntimeError):
+        timed_job(sweep_all_expired_rows)()
+    assert all(sample("sweeper_failures_total", {"table": table}) == failures[table] + 1 for table in tables)
+    assert sample("scheduler_job_failures_total", {"job": "sweep_all_expired_rows"}) == job_failures + 1
+
+def test_deleted_rows_are_counted(utc_timestamp):
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        session.add(Cooldown(user_id=5, cooldown_type="expired", expires=now - timedelta(minutes=1)))
+        session.add(Cooldown(user_id=5, cooldown_type="active", expires=now + timedelta(minutes=5)))
+        session.commit()
+    deleted = sample("sweeper_rows_deleted_total", {"table": "cooldowns"})
+    runs = sample("sweeper_duration_seconds_count", {"table": "cooldowns"})
+
+    assert sweep_expired_rows(Cooldown.expires) == 1
+    assert sample("sweeper_rows_deleted_total", {"table": "cooldowns"}) == deleted + 1
+    assert sample("sweeper_duration_seconds_count", {"table": "cooldowns"}) == runs + 1
+    with Session(engine) as session:
+        assert session.exec(select(Cooldown.cooldown_type).where(Cooldown.user_id == 5)).all() == ["active"]